@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# benchmarks.detector
+# Micro-benchmark of the per-file cost of mimetype detection.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Thu Dec 03 13:48:02 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: detector.py [] benjamin@bengfort.com $
+
+"""
+Micro-benchmark of the per-file cost of mimetype detection, comparing
+python-magic's module level from_file with the per-thread Detector.
+
+Usage: python benchmarks/detector.py DIRECTORY [THREADS]
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import sys
+import magic
+import threading
+
+from mosaic.path import Path, scan
+from mosaic.utils import Timer
+from mosaic.detect import Detector
+
+##########################################################################
+## Benchmark
+##########################################################################
+
+def collect(root):
+    """
+    Returns the paths of all regular files below the root.
+    """
+    return [str(path) for path in scan(Path(root)) if path.is_file()]
+
+
+def module_from_file(path):
+    return magic.from_file(path, mime=True)
+
+
+def run(detect, paths, threads=1):
+    """
+    Detects the mimetype of every path split across the threads and returns
+    the average wall clock cost per file in microseconds.
+    """
+    def work(chunk):
+        for path in chunk:
+            detect(path)
+
+    chunks  = [paths[idx::threads] for idx in range(threads)]
+    workers = [threading.Thread(target=work, args=(chunk,)) for chunk in chunks]
+
+    with Timer() as timer:
+        for worker in workers: worker.start()
+        for worker in workers: worker.join()
+
+    return timer.interval * 1e6 / len(paths)
+
+
+if __name__ == '__main__':
+    root    = sys.argv[1]
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    paths   = collect(root)
+
+    # Warm the page cache and load both libmagic databases first.
+    run(module_from_file, paths)
+    run(Detector().from_file, paths)
+
+    print "{:,d} files in {}".format(len(paths), root)
+    for nthreads in (1, threads):
+        before = run(module_from_file, paths, nthreads)
+        after  = run(Detector().from_file, paths, nthreads)
+        print (
+            "{:>2d} thread(s): magic.from_file {:8.1f} us/file, "
+            "Detector {:8.1f} us/file ({:0.2f}x)"
+        ).format(nthreads, before, after, before / after)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# benchmarks.dumps
+# Benchmark of the binary usage dump against the JSON dump.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Wed Dec 16 09:21:34 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: dumps.py [] benjamin@bengfort.com $
+
+"""
+Benchmark of the binary usage dump against the JSON dump (compact and with
+the indentation the usage command writes), on a synthetic usage with a
+directory snapshot and tree of the given number of directories.
+
+Usage: python benchmarks/dumps.py [DIRS]
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import sys
+import time
+import random
+
+from StringIO import StringIO
+from mosaic.utils import Timer
+from mosaic.binary import JSON, BINARY
+from mosaic.usage import FileUsage, FILE, DIRS
+
+##########################################################################
+## Benchmark
+##########################################################################
+
+MIMES   = ("text/plain", "image/png", "application/pdf", "video/mp4", "text/x-python")
+REPEATS = 3
+
+
+def make_usage(count, seed=42):
+    """
+    Creates a finished usage with a snapshot and tree of count directories,
+    each with a few files of random mimetypes.
+    """
+    rand  = random.Random(seed)
+    usage = FileUsage("/data", snapshot=True, tree=True)
+    usage.start()
+
+    paths = []
+    for idx in range(count):
+        path = "/data"
+        if paths:
+            path = os.path.join(rand.choice(paths), "dir{}".format(idx))
+        paths.append(path)
+
+        stat   = os.stat_result((0, idx, 0, 0, 0, 0, 0, 0, time.time(), time.time()))
+        record = usage.snapshot.record(path, stat)
+        for _ in range(rand.randint(1, 8)):
+            mimetype = rand.choice(MIMES)
+            size     = rand.randint(0, 1 << 20)
+            record.add(FILE, mimetype, size, size + 4096)
+            usage.nodes[FILE] += 1
+            usage.mimes[mimetype] += 1
+            usage.store[mimetype] += size
+
+        record.add(DIRS)
+        usage.nodes[DIRS] += 1
+        usage.tree.add(path, record)
+
+    usage.finish()
+    return usage
+
+
+def run(usage, fmt, **kwargs):
+    """
+    Returns the best dump and load times over the repeats and the size.
+    """
+    dumps = loads = None
+    for _ in range(REPEATS):
+        fobj = StringIO()
+        with Timer() as timer:
+            usage.dump(fobj, fmt, **kwargs)
+        dumps = timer.interval if dumps is None else min(dumps, timer.interval)
+
+        fobj.seek(0)
+        with Timer() as timer:
+            FileUsage.load(fobj)
+        loads = timer.interval if loads is None else min(loads, timer.interval)
+
+    return dumps, loads, len(fobj.getvalue())
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    usage = make_usage(count)
+
+    formats = (
+        ("json indent", JSON, {'indent': 2}),
+        ("json compact", JSON, {}),
+        ("binary", BINARY, {}),
+    )
+
+    for name, fmt, kwargs in formats:
+        dumps, loads, size = run(usage, fmt, **kwargs)
+        print "{}: dump {:0.3f}s, load {:0.3f}s, {:,d} bytes".format(
+            name, dumps, loads, size
+        )
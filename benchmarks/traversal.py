@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# benchmarks.traversal
+# Benchmark of the explicit stack scan against the recursive generator.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Fri Dec 04 10:07:55 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: traversal.py [] benjamin@bengfort.com $
+
+"""
+Benchmark of the explicit stack scan against the recursive generator it
+replaced, on a synthetic tree of chains that are 20 directories deep.
+
+Usage: python benchmarks/traversal.py [CHAINS] [FILES]
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+
+from mosaic.utils import Timer
+from mosaic.path import Path, scan, DFS, BFS
+
+##########################################################################
+## Benchmark
+##########################################################################
+
+DEPTH   = 20
+REPEATS = 5
+
+
+def recursive_scan(path, include_hidden=False):
+    """
+    The recursive generator that scan used to be, kept for comparison.
+    """
+    for subpath in path.list():
+        if not include_hidden and subpath.is_hidden():
+            continue
+
+        yield subpath
+
+        try:
+            if subpath.is_dir():
+                for child in recursive_scan(subpath, include_hidden):
+                    yield child
+        except OSError:
+            continue
+
+
+def make_tree(root, chains, files, depth=DEPTH):
+    """
+    Creates the chains below the root, with files at every level.
+    """
+    for chain in range(chains):
+        dirpath = os.path.join(root, "chain{}".format(chain))
+        for level in range(depth):
+            dirpath = os.path.join(dirpath, "level{}".format(level))
+            os.makedirs(dirpath)
+            for idx in range(files):
+                open(os.path.join(dirpath, "file{}".format(idx)), 'w').close()
+
+
+def run(scanner, root):
+    """
+    Returns the best time of the scanner over the repeats and its count.
+    """
+    best = None
+    for _ in range(REPEATS):
+        with Timer() as timer:
+            count = sum(1 for _ in scanner(root))
+        best = timer.interval if best is None else min(best, timer.interval)
+    return best, count
+
+
+if __name__ == '__main__':
+    chains = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    files  = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    tmpdir = tempfile.mkdtemp(prefix="mosaic-bench-")
+
+    try:
+        make_tree(tmpdir, chains, files)
+        root = Path(tmpdir)
+
+        scanners = (
+            ("recursive", recursive_scan),
+            ("stack dfs", lambda path: scan(path, order=DFS)),
+            ("queue bfs", lambda path: scan(path, order=BFS)),
+        )
+
+        baseline = None
+        for name, scanner in scanners:
+            elapsed, count = run(scanner, root)
+            baseline = baseline or elapsed
+            print "{}: {:,d} paths in {:0.3f} seconds ({:0.2f}x)".format(
+                name, count, elapsed, baseline / elapsed
+            )
+    finally:
+        shutil.rmtree(tmpdir)
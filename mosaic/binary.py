@@ -0,0 +1,389 @@
+# mosaic.binary
+# Compact versioned binary format for file usage dumps.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Tue Dec 15 14:08:51 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: binary.py [] benjamin@bengfort.com $
+
+"""
+Compact versioned binary format for file usage dumps.
+
+A dump starts with the MAGIC bytes and a little endian uint16 version,
+followed by length-prefixed sections: a 4 byte tag and a uint64 length.
+The string table (STRS) comes first; every mimetype, path and counter key
+in the other sections is an index into it. Counters (CNTR), the directory
+snapshot (DIRS) and the directory tree (TREE) are written as fixed-width
+little endian integer arrays (of the narrowest of 1, 2, 4 or 8 bytes that
+fits their values) and float64 arrays; everything else in the serialized
+usage goes into a small JSON section (META). Readers skip unknown tags.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import sys
+import json
+import struct
+
+from array import array
+from collections import Counter
+
+from mosaic.tree import DirTree
+from mosaic.utils import MosaicEncoder
+from mosaic.snapshot import Snapshot, DirRecord
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+MAGIC   = "\x89MOSAIC\n"
+VERSION = 1
+
+# Dump formats
+JSON    = "json"
+BINARY  = "binary"
+FORMATS = (JSON, BINARY)
+
+HEADER  = struct.Struct("<H")
+SECTION = struct.Struct("<4sQ")
+UINT64  = struct.Struct("<Q")
+
+STRS = "STRS"
+META = "META"
+CNTR = "CNTR"
+DIRS = "DIRS"
+TREE = "TREE"
+
+# Local contributions of the directory records
+RECORD_FIELDS = ('nodes', 'mimes', 'store', 'alloc')
+
+# Integer arrays are stored in the narrowest signed width that fits them,
+# with native arrays of that itemsize if there are any (struct otherwise).
+WIDTHS  = (
+    (1, 'b', -(1 << 7),  (1 << 7) - 1),
+    (2, 'h', -(1 << 15), (1 << 15) - 1),
+    (4, 'i', -(1 << 31), (1 << 31) - 1),
+    (8, 'q', -(1 << 63), (1 << 63) - 1),
+)
+
+TYPECODES = {}
+for typecode in ('b', 'h', 'i', 'l'):
+    TYPECODES.setdefault(array(typecode).itemsize, typecode)
+
+WIDTH   = struct.Struct("<B")
+SWAP    = sys.byteorder != 'little'
+
+##########################################################################
+## Fixed-width arrays
+##########################################################################
+
+def pack_ints(values):
+    """
+    Returns the width byte and the packed values in the narrowest width.
+    """
+    low, high = (min(values), max(values)) if len(values) else (0, 0)
+    for width, code, minimum, maximum in WIDTHS:
+        if minimum <= low and high <= maximum:
+            break
+
+    if width not in TYPECODES:
+        return WIDTH.pack(width) + struct.pack("<{}{}".format(len(values), code), *values)
+
+    values = array(TYPECODES[width], values)
+    if SWAP: values.byteswap()
+    return WIDTH.pack(width) + values.tostring()
+
+
+def unpack_ints(data, offset, count):
+    """
+    Returns the values packed at the offset and the number of bytes read.
+    """
+    width, = WIDTH.unpack_from(data, offset)
+    offset += WIDTH.size
+    size    = WIDTH.size + width * count
+
+    if width not in TYPECODES:
+        code = dict((width, code) for width, code, _, _ in WIDTHS)[width]
+        return list(struct.unpack_from("<{}{}".format(count, code), data, offset)), size
+
+    values = array(TYPECODES[width])
+    values.fromstring(data[offset:offset + width * count])
+    if SWAP: values.byteswap()
+    return values, size
+
+
+def pack_floats(values):
+    values = array('d', values)
+    if SWAP: values.byteswap()
+    return values.tostring()
+
+
+def unpack_floats(data, offset, count):
+    values = array('d')
+    values.fromstring(data[offset:offset + 8 * count])
+    if SWAP: values.byteswap()
+    return values
+
+
+##########################################################################
+## Section Writer and Reader
+##########################################################################
+
+class Writer(object):
+    """
+    Builds the payload of a section, interning strings into the table.
+    """
+
+    def __init__(self, strings):
+        self.strings = strings
+        self.chunks  = []
+
+    def sid(self, value):
+        value = str(value)
+        if value not in self.strings:
+            self.strings[value] = len(self.strings)
+        return self.strings[value]
+
+    def int(self, value):
+        self.chunks.append(UINT64.pack(value))
+
+    def ints(self, values):
+        self.int(len(values))
+        self.chunks.append(pack_ints(values))
+
+    def floats(self, values):
+        self.int(len(values))
+        self.chunks.append(pack_floats(values))
+
+    def sids(self, values):
+        self.ints([self.sid(value) for value in values])
+
+    def getvalue(self):
+        return "".join(self.chunks)
+
+
+class Reader(object):
+    """
+    Reads the payload of a section, resolving strings from the table.
+    """
+
+    def __init__(self, data, strings, offset=0):
+        self.data    = data
+        self.strings = strings
+        self.offset  = offset
+
+    def int(self):
+        value, = UINT64.unpack_from(self.data, self.offset)
+        self.offset += UINT64.size
+        return value
+
+    def ints(self):
+        count  = self.int()
+        values, size = unpack_ints(self.data, self.offset, count)
+        self.offset += size
+        return values
+
+    def floats(self):
+        count  = self.int()
+        values = unpack_floats(self.data, self.offset, count)
+        self.offset += 8 * count
+        return values
+
+    def sid(self):
+        return self.strings[self.int()]
+
+    def sids(self):
+        strings = self.strings
+        return [strings[sid] for sid in self.ints()]
+
+
+##########################################################################
+## Section encoders
+##########################################################################
+
+def encode_counters(writer, counters):
+    writer.int(len(counters))
+    for name, counter in counters:
+        items = counter.items()
+        writer.int(writer.sid(name))
+        writer.sids([key for key, _ in items])
+        writer.ints([value for _, value in items])
+
+
+def decode_counters(reader, data):
+    for _ in xrange(reader.int()):
+        name   = reader.sid()
+        keys   = reader.sids()
+        values = reader.ints()
+        data[name] = Counter(dict(zip(keys, values)))
+
+
+def encode_snapshot(writer, snapshot):
+    paths   = list(snapshot.records.keys())
+    records = [snapshot.records[path] for path in paths]
+
+    writer.sids(paths)
+    writer.floats([record.mtime for record in records])
+    writer.floats([record.ctime for record in records])
+
+    # Every local contribution as sparse (directory, key, value) triples.
+    for field in RECORD_FIELDS:
+        dirids, keys, values = [], [], []
+        for dirid, record in enumerate(records):
+            for key, value in getattr(record, field).items():
+                dirids.append(dirid)
+                keys.append(key)
+                values.append(value)
+
+        writer.ints(dirids)
+        writer.sids(keys)
+        writer.ints(values)
+
+
+def decode_snapshot(reader):
+    paths  = reader.sids()
+    mtimes = reader.floats()
+    ctimes = reader.floats()
+
+    records = [DirRecord(mtime, ctime) for mtime, ctime in zip(mtimes, ctimes)]
+    for field in RECORD_FIELDS:
+        dirids = reader.ints()
+        keys   = reader.sids()
+        values = reader.ints()
+        for dirid, key, value in zip(dirids, keys, values):
+            getattr(records[dirid], field)[key] = value
+
+    return Snapshot(zip(paths, records))
+
+
+def encode_tree(writer, tree):
+    writer.int(writer.sid(tree.root))
+    writer.sids(tree.mimes)
+    writer.sids(tree.paths)
+    for field in ('parents', 'files', 'bytes', 'tops', 'topbytes'):
+        writer.ints(getattr(tree, field))
+
+
+def decode_tree(reader):
+    tree = DirTree(reader.sid())
+    tree.mimes.extend(reader.sids())
+    tree.mimeids.update((mime, idx) for idx, mime in enumerate(tree.mimes))
+
+    tree.paths.extend(reader.sids())
+    tree.index.update((path, idx) for idx, path in enumerate(tree.paths))
+    tree.depths.extend(tree.depth(path) for path in tree.paths)
+
+    for field in ('parents', 'files', 'bytes', 'tops', 'topbytes'):
+        setattr(tree, field, array(getattr(tree, field).typecode, reader.ints()))
+    return tree
+
+
+##########################################################################
+## Dump and Load
+##########################################################################
+
+def dumps(data):
+    """
+    Returns the binary dump of a serialized usage (FileUsage.serialize).
+    """
+    strings  = {}
+    sections = []
+    meta     = {}
+    counters = []
+
+    for key, value in data.items():
+        if isinstance(value, Counter):
+            counters.append((key, value))
+        elif key == 'dirs' and isinstance(value, Snapshot):
+            writer = Writer(strings)
+            encode_snapshot(writer, value)
+            sections.append((DIRS, writer.getvalue()))
+        elif key == 'tree' and isinstance(value, DirTree):
+            writer = Writer(strings)
+            encode_tree(writer, value)
+            sections.append((TREE, writer.getvalue()))
+        else:
+            meta[key] = value
+
+    writer = Writer(strings)
+    encode_counters(writer, counters)
+    sections.insert(0, (CNTR, writer.getvalue()))
+    sections.insert(0, (META, json.dumps(meta, cls=MosaicEncoder)))
+
+    # The string table is written first so readers can resolve the rest.
+    table = sorted(strings, key=strings.get)
+    sections.insert(0, (STRS, "".join((
+        UINT64.pack(len(table)),
+        pack_ints([len(value) for value in table]),
+        "".join(table),
+    ))))
+
+    chunks = [MAGIC, HEADER.pack(VERSION)]
+    for tag, payload in sections:
+        chunks.append(SECTION.pack(tag, len(payload)))
+        chunks.append(payload)
+    return "".join(chunks)
+
+
+def loads(data):
+    """
+    Returns the serialized usage (as FileUsage.deserialize expects) of a
+    binary dump, with the snapshot and tree loaded as objects.
+    """
+    if not data.startswith(MAGIC):
+        raise ValueError("Not a binary mosaic dump")
+
+    offset = len(MAGIC)
+    version, = HEADER.unpack_from(data, offset)
+    offset  += HEADER.size
+    if version > VERSION:
+        raise ValueError(
+            "Binary dump version {} is newer than version {}".format(version, VERSION)
+        )
+
+    result  = {}
+    strings = []
+    while offset < len(data):
+        tag, length = SECTION.unpack_from(data, offset)
+        offset += SECTION.size
+        reader  = Reader(data, strings, offset)
+
+        if tag == STRS:
+            sizes = reader.ints()
+            start = reader.offset
+            for size in sizes:
+                strings.append(data[start:start + size])
+                start += size
+
+        elif tag == META:
+            result.update(json.loads(data[offset:offset + length]))
+        elif tag == CNTR:
+            decode_counters(reader, result)
+        elif tag == DIRS:
+            result['dirs'] = decode_snapshot(reader)
+        elif tag == TREE:
+            result['tree'] = decode_tree(reader)
+
+        offset += length
+
+    return result
+
+
+def dump(data, fobj):
+    fobj.write(dumps(data))
+
+
+def load(fobj):
+    """
+    Reads a serialized usage from a binary dump or a JSON dump, detecting
+    the format by the magic bytes.
+    """
+    data = fobj.read()
+    if data.startswith(MAGIC):
+        return loads(data)
+    return json.loads(data)
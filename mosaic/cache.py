@@ -0,0 +1,191 @@
+# mosaic.cache
+# Persistent mimetype cache keyed by inode identity.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Tue Dec 01 09:14:22 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: cache.py [] benjamin@bengfort.com $
+
+"""
+Persistent mimetype cache keyed by inode identity.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import time
+import sqlite3
+
+from mosaic.path import Path
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+CACHE_PATH = os.path.join("~", ".mosaic", "mimetypes.db")
+CACHE_SIZE = 10000000  # Maximum number of cached mimetypes
+BATCH_SIZE = 5000      # Number of writes to buffer before a commit
+INT64_MAX  = (1 << 63) - 1
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS mimetypes ("
+    "  dev INTEGER NOT NULL,"
+    "  ino INTEGER NOT NULL,"
+    "  size INTEGER NOT NULL,"
+    "  mtime REAL NOT NULL,"
+    "  mimetype TEXT NOT NULL,"
+    "  seen REAL NOT NULL,"
+    "  PRIMARY KEY (dev, ino)"
+    ")",
+    "CREATE INDEX IF NOT EXISTS mimetypes_seen ON mimetypes (seen)",
+)
+
+##########################################################################
+## Helper functions
+##########################################################################
+
+def int64(value):
+    """
+    SQLite only stores signed 64 bit integers, so wrap large device and
+    inode numbers around rather than overflowing.
+    """
+    if value > INT64_MAX:
+        return value - (1 << 64)
+    return value
+
+
+##########################################################################
+## Mimetype Cache
+##########################################################################
+
+class MimeCache(object):
+    """
+    An on-disk SQLite cache of mimetypes keyed by (st_dev, st_ino, st_size,
+    st_mtime) so that re-scans only sniff files whose metadata has changed.
+    The device and inode are the primary key, therefore a changed file
+    replaces its stale entry rather than accumulating. When the cache grows
+    beyond its maximum size, evict deletes the least recently seen entries.
+
+    The connection is opened lazily and belongs to the thread that first
+    uses the cache; each worker should therefore have its own cache object.
+    """
+
+    def __init__(self, path=CACHE_PATH, maxsize=CACHE_SIZE):
+        self.path    = Path(path)
+        self.maxsize = maxsize
+        self.started = time.time()
+
+        self._conn    = None
+        self._writes  = []  # Buffered inserts of newly sniffed mimetypes
+        self._touches = []  # Buffered keys of cache hits to mark as seen
+
+    @property
+    def conn(self):
+        """
+        Opens the database, creating the cache directory and schema as needed.
+        """
+        if self._conn is None:
+            dirname = os.path.dirname(str(self.path))
+            if dirname and not os.path.exists(dirname):
+                try:
+                    os.makedirs(dirname)
+                except OSError:
+                    # Another worker may have created it concurrently.
+                    if not os.path.isdir(dirname): raise
+
+            self._conn = sqlite3.connect(str(self.path), timeout=60)
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+
+        return self._conn
+
+    def __len__(self):
+        self.flush()
+        return self.conn.execute("SELECT COUNT(*) FROM mimetypes").fetchone()[0]
+
+    def get(self, stat):
+        """
+        Returns the cached mimetype for the stat result or None on a miss.
+        """
+        dev, ino = int64(stat.st_dev), int64(stat.st_ino)
+        row = self.conn.execute(
+            "SELECT mimetype FROM mimetypes "
+            "WHERE dev=? AND ino=? AND size=? AND mtime=?",
+            (dev, ino, stat.st_size, stat.st_mtime)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        self._touches.append((self.started, dev, ino))
+        if len(self._touches) >= BATCH_SIZE:
+            self.flush()
+
+        return row[0]
+
+    def put(self, stat, mimetype):
+        """
+        Buffers the mimetype for the stat result to be written to the cache.
+        """
+        self._writes.append((
+            int64(stat.st_dev), int64(stat.st_ino), stat.st_size,
+            stat.st_mtime, mimetype, self.started,
+        ))
+
+        if len(self._writes) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered inserts and hits to the database in one commit.
+        """
+        if not self._writes and not self._touches:
+            return
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO mimetypes "
+                "(dev, ino, size, mtime, mimetype, seen) "
+                "VALUES (?, ?, ?, ?, ?, ?)", self._writes
+            )
+            self.conn.executemany(
+                "UPDATE mimetypes SET seen=? WHERE dev=? AND ino=?",
+                self._touches
+            )
+
+        self._writes  = []
+        self._touches = []
+
+    def evict(self):
+        """
+        Deletes the least recently seen entries beyond the maximum size.
+        Returns the number of entries that were evicted.
+        """
+        excess = len(self) - self.maxsize
+        if excess <= 0:
+            return 0
+
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM mimetypes WHERE rowid IN ("
+                "SELECT rowid FROM mimetypes ORDER BY seen ASC LIMIT ?)",
+                (excess,)
+            )
+        return excess
+
+    def close(self):
+        """
+        Flushes the cache, then closes the database connection.
+        """
+        if self._conn is None:
+            return
+
+        self.flush()
+        self._conn.close()
+        self._conn = None
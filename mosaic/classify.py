@@ -0,0 +1,104 @@
+# mosaic.classify
+# Metadata based mimetype classification by file extension.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Wed Dec 02 14:36:10 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: classify.py [] benjamin@bengfort.com $
+
+"""
+Metadata based mimetype classification by file extension.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import mimetypes
+
+from mosaic.path import EMPTYNODE
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+# Classification strategies (and the tiers that resolve a mimetype)
+MAGIC     = "magic"      # Content sniffing of every file with libmagic
+EXTENSION = "extension"  # Metadata only, never opens a file
+HYBRID    = "hybrid"     # Extension lookup, libmagic on unknown extensions
+CACHE     = "cache"      # Tier of mimetypes resolved by the MimeCache
+
+STRATEGIES = (MAGIC, EXTENSION, HYBRID)
+
+# Mimetype of files whose extension is not in the table
+UNKNOWN = "application/octet-stream"
+
+# libmagic's mimetypes for the compressed encodings known to mimetypes
+ENCODINGS = {
+    'gzip':     "application/gzip",
+    'bzip2':    "application/x-bzip2",
+    'xz':       "application/x-xz",
+    'compress': "application/x-compress",
+}
+
+# Extensions whose contents vary too much for the extension to decide
+AMBIGUOUS = frozenset((
+    '.bin', '.dat', '.data', '.raw', '.img', '.out', '.log',
+    '.tmp', '.bak', '.old', '.doc', '.xls', '.ppt',
+))
+
+##########################################################################
+## Extension table
+##########################################################################
+
+def load_extensions():
+    """
+    Builds a lower case extension to mimetype table from the system mime
+    types registry, including the compressed suffixes like .tgz.
+    """
+    mimetypes.init()
+
+    table = {}
+    table.update((ext.lower(), mime) for ext, mime in mimetypes.common_types.items())
+    table.update((ext.lower(), mime) for ext, mime in mimetypes.types_map.items())
+
+    for ext, encoding in mimetypes.encodings_map.items():
+        if encoding in ENCODINGS:
+            table[ext.lower()] = ENCODINGS[encoding]
+
+    for ext, suffix in mimetypes.suffix_map.items():
+        suffix = os.path.splitext(suffix)[1]
+        if suffix in table:
+            table[ext.lower()] = table[suffix]
+
+    return table
+
+EXTENSIONS = load_extensions()
+
+##########################################################################
+## Classification
+##########################################################################
+
+def guess_type(path, ambiguous=True):
+    """
+    Returns the mimetype of a path from its metadata alone: empty files are
+    reported like libmagic does and everything else by extension. Returns
+    None if the extension is unknown, or if it is ambiguous (e.g. a generic
+    .bin or .dat file) and ambiguous guesses are not allowed.
+    """
+    if path.filesize == 0:
+        return EMPTYNODE
+
+    ext = os.path.splitext(str(path))[1].lower()
+    if not ambiguous and ext in AMBIGUOUS:
+        return None
+
+    mimetype = EXTENSIONS.get(ext)
+    if not ambiguous and mimetype == UNKNOWN:
+        return None
+
+    return mimetype
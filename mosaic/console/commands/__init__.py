@@ -19,3 +19,6 @@ A module containing all the Mosaic commands
 
 ## Make sure all commands in this directory are imported!
 from .usage import UsageCommand
+from .watch import WatchCommand
+from .merge import MergeCommand
+from .diff import DiffCommand
@@ -0,0 +1,76 @@
+# mosaic.console.commands.diff
+# Reports the changes in usage between two snapshots.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Thu Dec 17 11:40:26 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: diff.py [] benjamin@bengfort.com $
+
+"""
+Reports the changes in usage between two snapshots.
+"""
+
+##########################################################################
+# Imports
+##########################################################################
+
+import json
+
+from mosaic.usage import FileUsage
+from mosaic.utils import MosaicEncoder
+from mosaic.console.commands.base import Command
+
+##########################################################################
+# Command
+##########################################################################
+
+class DiffCommand(Command):
+
+    name = "diff"
+    help = "reports the changes in usage between two snapshots."
+
+    args = {
+        ('-d', '--depth'): {
+            'metavar': 'D',
+            'type': int,
+            'default': 1,
+            'help': 'depth below the root of the growing subtrees to report',
+        },
+        '-n': {
+            'metavar': 'N',
+            'type': int,
+            'default': 10,
+            'help': 'number of growing subtrees to report',
+        },
+        ('-o', '--output'): {
+            'metavar': 'PTH',
+            'default': None,
+            'help': 'path to write the changes to as JSON',
+        },
+        # A single positional so the order of OLD and NEW is kept.
+        'snapshots': {
+            'nargs': 2,
+            'help': 'paths of the old and new usage snapshots (in that order)',
+        },
+    }
+
+    def handle(self, args):
+        """
+        Handle command line arguments
+        """
+        usages = []
+        for path in args.snapshots:
+            with open(path, 'rb') as f:
+                usages.append(FileUsage.load(f))
+
+        old, new = usages
+        diff = old.diff(new)
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(diff.serialize(args.depth, args.n), f, cls=MosaicEncoder, indent=2)
+
+        return diff.report(args.depth, args.n)
@@ -0,0 +1,76 @@
+# mosaic.console.commands.merge
+# Combines many usage snapshots into a single usage.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Wed Dec 16 11:02:37 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: merge.py [] benjamin@bengfort.com $
+
+"""
+Combines many usage snapshots into a single usage.
+"""
+
+##########################################################################
+# Imports
+##########################################################################
+
+from mosaic.merge import merge, FANOUT
+from mosaic.binary import FORMATS, JSON, BINARY
+from mosaic.console.commands.base import Command
+from mosaic.console.commands.usage import path
+
+##########################################################################
+# Command
+##########################################################################
+
+class MergeCommand(Command):
+
+    name = "merge"
+    help = "combines many usage snapshots (e.g. of several hosts) into one."
+
+    args = {
+        ('-w', '--workers'): {
+            'metavar': 'N',
+            'type': int,
+            'default': None,
+            'help': 'number of processes to merge with (default one per cpu)',
+        },
+        '--fanout': {
+            'metavar': 'K',
+            'type': int,
+            'default': FANOUT,
+            'help': 'number of snapshots each worker merges at once',
+        },
+        ('-f', '--format'): {
+            'choices': FORMATS,
+            'default': JSON,
+            'help': 'format of the merged usage',
+        },
+        ('-o', '--output'): {
+             'metavar': 'PTH',
+             'type': path,
+             'default': '.',
+             'help': 'path or directory to write the merged usage to',
+        },
+        'snapshots': {
+            'nargs': '+',
+            'help': 'paths of the usage snapshots (JSON or binary) to merge',
+        }
+    }
+
+    def handle(self, args):
+        """
+        Handle command line arguments
+        """
+        usage = merge(args.snapshots, args.workers, args.fanout)
+
+        with open(args.output, 'wb') as f:
+            if args.format == BINARY:
+                usage.dump(f, BINARY)
+            else:
+                usage.dump(f, indent=2)
+
+        return str(usage)
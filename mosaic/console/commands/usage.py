@@ -20,7 +20,12 @@ Performs file system usage analysis on a given directory.
 import time
 
 from mosaic.path import Path
-from mosaic.usage import analyze
+from mosaic.usage import analyze, resume, THREAD, PROCESS, CHECKPOINT_INTERVAL
+from mosaic.cache import CACHE_PATH, CACHE_SIZE
+from mosaic.largest import TOP
+from mosaic.progress import Progress, INTERVAL
+from mosaic.binary import FORMATS, JSON, BINARY
+from mosaic.classify import STRATEGIES, MAGIC
 from mosaic.console.commands.base import Command
 
 ##########################################################################
@@ -47,6 +52,138 @@ class UsageCommand(Command):
             'action': 'store_true',
             'help': 'include hidden files and directories',
         },
+        ('-w', '--workers'): {
+            'metavar': 'N',
+            'type': int,
+            'default': None,
+            'help': 'number of workers to traverse the directory with',
+        },
+        ('-b', '--backend'): {
+            'choices': (THREAD, PROCESS),
+            'default': THREAD,
+            'help': 'run the workers as threads or as a process pool',
+        },
+        ('-s', '--strategy'): {
+            'choices': STRATEGIES,
+            'default': MAGIC,
+            'help': 'classify mimetypes by content, extension, or both',
+        },
+        ('-c', '--cache'): {
+            'metavar': 'DB',
+            'nargs': '?',
+            'const': CACHE_PATH,
+            'default': None,
+            'help': 'reuse mimetypes from a persistent cache (default {})'.format(CACHE_PATH),
+        },
+        '--cache-size': {
+            'metavar': 'N',
+            'type': int,
+            'default': CACHE_SIZE,
+            'help': 'maximum number of entries to keep in the mimetype cache',
+        },
+        '--snapshot': {
+            'action': 'store_true',
+            'help': 'include a per-directory snapshot in the output',
+        },
+        '--incremental': {
+            'metavar': 'PREVIOUS',
+            'default': None,
+            'help': 'reuse unchanged directories from a previous snapshot (not with --largest, --histograms, --ages or --sample)',
+        },
+        '--tree': {
+            'action': 'store_true',
+            'help': 'include the usage of every directory rolled up like du',
+        },
+        '--histograms': {
+            'action': 'store_true',
+            'help': 'include log2 file size histograms of every mimetype (requires numpy)',
+        },
+        '--ages': {
+            'action': 'store_true',
+            'help': 'include age by size histograms of every mimetype (requires numpy)',
+        },
+        '--largest': {
+            'metavar': 'N',
+            'type': int,
+            'nargs': '?',
+            'const': TOP,
+            'default': None,
+            'help': 'include the N largest files and directories (default {})'.format(TOP),
+        },
+        '--sample': {
+            'metavar': 'RATE',
+            'type': float,
+            'default': None,
+            'help': 'classify and stat a reproducible sample of the files and extrapolate',
+        },
+        '--seed': {
+            'metavar': 'N',
+            'type': int,
+            'default': 0,
+            'help': 'seed of the sample (the same seed takes the same sample)',
+        },
+        '--stratified': {
+            'action': 'store_true',
+            'help': 'sample whole directories rather than single files',
+        },
+        '--max-iops': {
+            'metavar': 'N',
+            'type': float,
+            'default': None,
+            'help': 'limit the I/O operations (scandir, stat and reads) per second',
+        },
+        '--max-read-bps': {
+            'metavar': 'B',
+            'type': float,
+            'default': None,
+            'help': 'limit the bytes read per second to sniff mimetypes',
+        },
+        '--adaptive': {
+            'action': 'store_true',
+            'help': 'back off from the I/O limits when the latency of the I/O rises',
+        },
+        '--profile': {
+            'action': 'store_true',
+            'help': 'time the phases of the scan loop and the latency of stat and magic',
+        },
+        '--progress': {
+            'metavar': 'SEC',
+            'type': float,
+            'nargs': '?',
+            'const': INTERVAL,
+            'default': None,
+            'help': 'report the progress to stderr every SEC seconds (default {:g})'.format(INTERVAL),
+        },
+        '--hardlinks': {
+            'action': 'store_true',
+            'help': 'count the bytes of hard linked files once as unique bytes',
+        },
+        '--records': {
+            'metavar': 'NDJSON',
+            'default': None,
+            'help': 'stream a record of every node to a .ndjson or .ndjson.gz file',
+        },
+        '--checkpoint': {
+            'metavar': 'PTH',
+            'default': None,
+            'help': 'periodically save the partial analysis to resume from',
+        },
+        '--checkpoint-interval': {
+            'metavar': 'SEC',
+            'type': float,
+            'default': CHECKPOINT_INTERVAL,
+            'help': 'seconds between checkpoints of the analysis',
+        },
+        '--resume': {
+            'metavar': 'CHECKPOINT',
+            'default': None,
+            'help': 'resume the analysis (root and options) of a checkpoint',
+        },
+        ('-f', '--format'): {
+            'choices': FORMATS,
+            'default': JSON,
+            'help': 'write the output (and checkpoints) as JSON or compact binary',
+        },
         ('-o', '--output'): {
              'metavar': 'PTH',
              'type': path,
@@ -54,8 +191,8 @@ class UsageCommand(Command):
              'help': 'path or directory to write output to',
         },
         'path': {
-            'nargs': 1,
-            'help': 'path of directory to inspect',
+            'nargs': '?',
+            'help': 'path of directory to inspect (unless resuming)',
         }
     }
 
@@ -63,8 +200,30 @@ class UsageCommand(Command):
         """
         Handle command line arguments
         """
-        usage = analyze(args.path[0], args.include_hidden)
-        with open(args.output, 'w') as f:
-            usage.dump(f, indent=2)
+        progress = Progress(interval=args.progress) if args.progress else None
+
+        if args.resume:
+            usage = resume(args.resume, args.workers, args.backend, progress)
+
+        elif args.path is None:
+            raise ValueError("A path to inspect is required unless resuming")
+
+        else:
+            usage = analyze(
+                args.path, args.include_hidden, args.workers, args.backend, progress,
+                strategy=args.strategy, cache=args.cache, cache_size=args.cache_size,
+                snapshot=args.snapshot, incremental=args.incremental,
+                tree=args.tree, histograms=args.histograms, ages=args.ages, largest=args.largest,
+                sample=args.sample, seed=args.seed, stratified=args.stratified,
+                max_iops=args.max_iops, max_read_bps=args.max_read_bps, adaptive=args.adaptive,
+                profile=args.profile, hardlinks=args.hardlinks, records=args.records, checkpoint=args.checkpoint,
+                checkpoint_interval=args.checkpoint_interval, format=args.format,
+            )
+
+        with open(args.output, 'wb') as f:
+            if args.format == BINARY:
+                usage.dump(f, BINARY)
+            else:
+                usage.dump(f, indent=2)
 
         return str(usage)
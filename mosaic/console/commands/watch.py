@@ -0,0 +1,103 @@
+# mosaic.console.commands.watch
+# Keeps a file system usage analysis of a directory up to date.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Wed Dec 09 16:05:12 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: watch.py [] benjamin@bengfort.com $
+
+"""
+Keeps a file system usage analysis of a directory up to date.
+"""
+
+##########################################################################
+# Imports
+##########################################################################
+
+from mosaic.cache import CACHE_PATH
+from mosaic.classify import STRATEGIES, HYBRID
+from mosaic.watch import Watcher, LATENCY, MAX_LATENCY, CHECKPOINT
+from mosaic.console.commands.base import Command
+from mosaic.console.commands.usage import path
+
+##########################################################################
+# Command
+##########################################################################
+
+class WatchCommand(Command):
+
+    name = "watch"
+    help = "analyzes a directory then keeps the usage up to date from inotify."
+
+    args = {
+        ('-I', '--include-hidden'): {
+            'action': 'store_true',
+            'help': 'include hidden files and directories',
+        },
+        ('-w', '--workers'): {
+            'metavar': 'N',
+            'type': int,
+            'default': None,
+            'help': 'number of threads to perform the initial analysis with',
+        },
+        ('-s', '--strategy'): {
+            'choices': STRATEGIES,
+            'default': HYBRID,
+            'help': 'classify mimetypes by content, extension, or both',
+        },
+        ('-c', '--cache'): {
+            'metavar': 'DB',
+            'nargs': '?',
+            'const': CACHE_PATH,
+            'default': None,
+            'help': 'reuse mimetypes from a persistent cache (default {})'.format(CACHE_PATH),
+        },
+        '--latency': {
+            'metavar': 'SEC',
+            'type': float,
+            'default': LATENCY,
+            'help': 'seconds without events before changes are applied',
+        },
+        '--max-latency': {
+            'metavar': 'SEC',
+            'type': float,
+            'default': MAX_LATENCY,
+            'help': 'seconds continuous events may delay applying changes at most',
+        },
+        '--interval': {
+            'metavar': 'SEC',
+            'type': float,
+            'default': CHECKPOINT,
+            'help': 'seconds between checkpoints of the usage to the output',
+        },
+        ('-o', '--output'): {
+             'metavar': 'PTH',
+             'type': path,
+             'default': '.',
+             'help': 'path or directory to checkpoint the usage to',
+        },
+        'path': {
+            'nargs': 1,
+            'help': 'path of directory to watch',
+        }
+    }
+
+    def handle(self, args):
+        """
+        Handle command line arguments
+        """
+        watcher = Watcher(
+            args.path[0], args.output, args.latency, args.interval, args.max_latency,
+            include_hidden=args.include_hidden, workers=args.workers,
+            strategy=args.strategy, cache=args.cache,
+        )
+
+        try:
+            usage = watcher.run()
+        finally:
+            watcher.close()
+
+        return str(usage)
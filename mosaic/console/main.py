@@ -30,6 +30,9 @@ DESCRIPTION = "Inspects the mimetype distribution of a directory."
 EPILOG      = "Created for scientific purposes and not diagnostic ones."
 COMMANDS    = [
     UsageCommand,
+    WatchCommand,
+    MergeCommand,
+    DiffCommand,
 ]
 
 ##########################################################################
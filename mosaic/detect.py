@@ -0,0 +1,107 @@
+# mosaic.detect
+# Content based mimetype detection with reusable libmagic handles.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Thu Dec 03 11:21:37 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: detect.py [] benjamin@bengfort.com $
+
+"""
+Content based mimetype detection with reusable libmagic handles.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import stat
+import errno
+import magic
+import threading
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+HEADER_SIZE = 1048576  # Bytes read to sniff (libmagic's default bytes_max)
+ELF_MAGIC   = "\x7fELF"  # ELF types depend on sections beyond the header
+EMPTY_MIME  = "inode/x-empty"  # libmagic's mimetype for empty files
+
+# Open for reading without blocking on special files or updating the atime.
+O_NOATIME  = getattr(os, 'O_NOATIME', 0)
+READ_FLAGS = os.O_RDONLY | getattr(os, 'O_NONBLOCK', 0)
+
+##########################################################################
+## Detector
+##########################################################################
+
+class Detector(threading.local):
+    """
+    Holds one libmagic handle per thread (and therefore per process), rather
+    than sharing python-magic's module level instance and its lock. Regular
+    files are sniffed from a bounded header buffer read with a single
+    os.read; anything else is handed to libmagic by name, as are ELF binaries
+    since libmagic has to seek to their dynamic section (e.g. to detect PIE).
+    """
+
+    def __init__(self, header=HEADER_SIZE):
+        self.header = header
+        self._magic = None
+
+    @property
+    def magic(self):
+        """
+        The libmagic handle of the current thread, loaded on first use.
+        """
+        if self._magic is None:
+            self._magic = magic.Magic(mime=True)
+        return self._magic
+
+    def from_buffer(self, buf):
+        """
+        Returns the mimetype of the contents of the buffer.
+        """
+        return self.magic.from_buffer(buf)
+
+    def from_file(self, path):
+        """
+        Returns the mimetype of the file at the path.
+        """
+        path = str(path)
+        try:
+            fd = os.open(path, READ_FLAGS | O_NOATIME)
+        except OSError as e:
+            # O_NOATIME is only permitted for the owner of the file.
+            if e.errno != errno.EPERM or not O_NOATIME: raise
+            fd = os.open(path, READ_FLAGS)
+
+        try:
+            info = os.fstat(fd)
+            if not stat.S_ISREG(info.st_mode):
+                return self.magic.from_file(path)
+
+            if info.st_size == 0:
+                return EMPTY_MIME
+
+            header = os.read(fd, self.header)
+        finally:
+            os.close(fd)
+
+        if header.startswith(ELF_MAGIC):
+            return self.magic.from_file(path)
+        return self.from_buffer(header)
+
+
+# Default detector used for path mimetypes.
+detector = Detector()
+
+
+def from_file(path):
+    """
+    Returns the mimetype of the file at the path using the default detector.
+    """
+    return detector.from_file(path)
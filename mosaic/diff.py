@@ -0,0 +1,201 @@
+# mosaic.diff
+# Computes the changes in usage between two analyses.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Thu Dec 17 10:14:52 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: diff.py [] benjamin@bengfort.com $
+
+"""
+Computes the changes in usage between two analyses.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import heapq
+
+from mosaic.tree import DirTree
+from mosaic.usage import utctime
+from mosaic.utils import humanize_bytes
+
+##########################################################################
+## Helper functions
+##########################################################################
+
+def delta(old, new):
+    """
+    Returns the nonzero changes of every key from the old to the new counts.
+    """
+    changes = {}
+    for key in set(old) | set(new):
+        change = new.get(key, 0) - old.get(key, 0)
+        if change:
+            changes[key] = change
+    return changes
+
+
+def signed_bytes(bytesize):
+    """
+    Humanizes a change in bytes with its sign.
+    """
+    return ("-" if bytesize < 0 else "+") + humanize_bytes(abs(bytesize))
+
+
+def directory_tree(usage):
+    """
+    Returns the directory tree of the usage, building it from the snapshot
+    if the analysis did not keep one, or None without per-directory data.
+    """
+    if usage.tree is not None:
+        return usage.tree
+
+    if usage.snapshot is None:
+        return None
+
+    # Parents that are added after their children are resolved by rollup.
+    tree = DirTree(usage.root)
+    for path, record in usage.snapshot.records.iteritems():
+        tree.add(path, record)
+    return tree
+
+
+##########################################################################
+## Usage Diff
+##########################################################################
+
+class UsageDiff(object):
+    """
+    The changes from an old to a new usage: the deltas of the node types,
+    mimetype counts, apparent and allocated bytes and, if both analyses
+    kept per-directory data (a tree or a snapshot), the deltas of every
+    subtree. Each subtree of the new usage is looked up in the old one by
+    path, and vanished ones count as shrinking to nothing, so the diff is
+    linear in the number of directories.
+    """
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+
+        self.nodes     = delta(old.nodes, new.nodes)
+        self.mimes     = delta(old.mimes, new.mimes)
+        self.store     = delta(old.store, new.store)
+        self.allocated = delta(old.allocated, new.allocated)
+
+        self.subtrees  = self.compare(directory_tree(old), directory_tree(new))
+
+    @property
+    def size(self):
+        """
+        The change of the total apparent size (in bytes).
+        """
+        return sum(self.store.values())
+
+    @property
+    def allocated_size(self):
+        """
+        The change of the total allocated size (in bytes).
+        """
+        return sum(self.allocated.values())
+
+    def compare(self, old, new):
+        """
+        Returns the changes of files and bytes of every subtree by path, or
+        None if either usage has no per-directory data.
+        """
+        if old is None or new is None:
+            return None
+
+        ofiles, osizes = old.rollup()[:2]
+        nfiles, nsizes = new.rollup()[:2]
+        subtrees = {}
+
+        for dirid, path in enumerate(new.paths):
+            idx = old.index.get(path)
+            if idx is None:
+                subtrees[path] = (nfiles[dirid], nsizes[dirid], new.depths[dirid])
+            else:
+                subtrees[path] = (
+                    nfiles[dirid] - ofiles[idx], nsizes[dirid] - osizes[idx],
+                    new.depths[dirid],
+                )
+
+        for idx, path in enumerate(old.paths):
+            if path not in new.index:
+                subtrees[path] = (-ofiles[idx], -osizes[idx], old.depths[idx])
+
+        return subtrees
+
+    def growing(self, depth=1, n=10):
+        """
+        Returns the path and the changes of files and bytes of the n subtrees
+        at the depth that grew the most (by bytes).
+        """
+        if self.subtrees is None:
+            return []
+
+        changes = (
+            (path, files, size) for path, (files, size, level) in self.subtrees.iteritems()
+            if level == depth and size > 0
+        )
+        return heapq.nlargest(n, changes, key=lambda change: change[2])
+
+    def __str__(self):
+        return self.report()
+
+    def report(self, depth=1, n=5):
+        """
+        Reports the changes with the n growing subtrees at the depth.
+        """
+        output = (
+            "Changes from {} to {}: {} apparent and {} allocated"
+            .format(
+                self.old.root, self.new.root,
+                signed_bytes(self.size), signed_bytes(self.allocated_size),
+            )
+        )
+
+        output += "\nNodes: " + (", ".join(
+            "{:+,d} {}".format(count, node) for node, count in sorted(self.nodes.items())
+        ) or "no changes")
+
+        if self.store:
+            output += "\nMimetypes:"
+            top = heapq.nlargest(10, self.store.items(), key=lambda item: abs(item[1]))
+            for mimetype, size in top:
+                output += (
+                    "\n  {}: {} in {:+,d} files"
+                    .format(mimetype, signed_bytes(size), self.mimes.get(mimetype, 0))
+                )
+
+        if self.subtrees is not None:
+            output += "\nGrowing subtrees:"
+            for path, files, size in self.growing(depth, n):
+                output += "\n  {}: {} in {:+,d} files".format(path, signed_bytes(size), files)
+
+        return output
+
+    def serialize(self, depth=1, n=10):
+        data = {
+            'old': {'root': self.old.root, 'started': utctime(self.old.started)},
+            'new': {'root': self.new.root, 'started': utctime(self.new.started)},
+            'nodes': self.nodes,
+            'mimes': self.mimes,
+            'store': self.store,
+            'allocated': self.allocated,
+            'size': self.size,
+            'allocated_size': self.allocated_size,
+        }
+
+        if self.subtrees is not None:
+            data['growing'] = [
+                {'path': path, 'files': files, 'size': size}
+                for path, files, size in self.growing(depth, n)
+            ]
+
+        return data
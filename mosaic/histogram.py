@@ -0,0 +1,304 @@
+# mosaic.histogram
+# Size and age distributions per mimetype binned with NumPy.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Fri Dec 18 09:26:40 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: histogram.py [] benjamin@bengfort.com $
+
+"""
+Size and age distributions per mimetype binned with NumPy.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import time
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+BINS     = 65     # Bin 0 holds empty sizes, bin k sizes in [2**(k-1), 2**k)
+BATCH    = 65536  # Sizes buffered per mimetype before they are binned
+TYPECODE = 'L'    # Unsigned long, 8 bytes on 64-bit platforms
+
+# Age bins (by the lower bound in seconds) for tiering decisions
+DAY  = 86400
+AGES = (
+    0, DAY, 7 * DAY, 30 * DAY, 90 * DAY, 180 * DAY, 365 * DAY, 730 * DAY, 1825 * DAY,
+)
+
+# Timestamps that ages are computed from
+MTIME = "mtime"
+ATIME = "atime"
+TIMES = (MTIME, ATIME)
+
+##########################################################################
+## Helper functions
+##########################################################################
+
+def size_bins(sizes):
+    """
+    Returns the log2 bin of every size in the NumPy array.
+    """
+    edges = np.array([1 << k for k in xrange(BINS - 1)], dtype=np.uint64)
+    return np.searchsorted(edges, sizes, side='right')
+
+
+def age_bins(ages):
+    """
+    Returns the age bin of every age (in seconds) in the NumPy array; ages
+    in the future (clock skew) fall into the first bin.
+    """
+    edges = np.array(AGES[1:], dtype=np.float64)
+    return np.searchsorted(edges, ages, side='right')
+
+
+##########################################################################
+## Size Histograms
+##########################################################################
+
+class SizeHistograms(object):
+    """
+    File size histograms of every mimetype with log2 bins. Adding a size
+    only appends it to the compact batch of its mimetype; full batches are
+    binned at once with NumPy (a searchsorted of the bin edges and a
+    bincount), so the per-file work stays a single array append. Pending
+    batches are binned before the histograms are merged or serialized.
+    """
+
+    @classmethod
+    def deserialize(klass, data):
+        histograms = klass()
+        for mimetype, counts in data.items():
+            histograms.counts[mimetype] = klass.zeros()
+            histograms.counts[mimetype][:len(counts)] = counts
+        return histograms
+
+    @staticmethod
+    def zeros():
+        return np.zeros(BINS, dtype=np.int64)
+
+    def __init__(self):
+        if np is None:
+            raise ImportError("Size histograms require NumPy (pip install numpy)")
+
+        self.counts  = {}  # mimetype -> counts of each bin
+        self.batches = {}  # mimetype -> sizes that are not yet binned
+
+    def __iadd__(self, other):
+        """
+        Merges the counts of another set of histograms, e.g. of a shard.
+        """
+        other.flush()
+        self.flush()
+
+        for mimetype, counts in other.counts.items():
+            if mimetype not in self.counts:
+                self.counts[mimetype] = self.zeros()
+            self.counts[mimetype] += counts
+        return self
+
+    def add(self, mimetype, size):
+        batch = self.batches.get(mimetype)
+        if batch is None:
+            batch = self.batches[mimetype] = array(TYPECODE)
+
+        batch.append(size)
+        if len(batch) >= BATCH:
+            self.bin(mimetype, batch)
+            del self.batches[mimetype]
+
+    def bin(self, mimetype, batch):
+        """
+        Adds the sizes of the batch to the bins of the mimetype.
+        """
+        sizes = np.frombuffer(batch, dtype="<u{}".format(batch.itemsize))
+        bins  = size_bins(sizes)
+
+        if mimetype not in self.counts:
+            self.counts[mimetype] = self.zeros()
+        self.counts[mimetype] += np.bincount(bins, minlength=BINS)
+
+    def flush(self):
+        """
+        Bins the pending batches of every mimetype.
+        """
+        for mimetype, batch in self.batches.items():
+            self.bin(mimetype, batch)
+        self.batches.clear()
+
+    def histogram(self, mimetype):
+        """
+        Returns the (lower bound, upper bound, count) of the nonempty bins of
+        the mimetype; the bounds of the first bin (empty files) are 0.
+        """
+        self.flush()
+        counts = self.counts.get(mimetype)
+        if counts is None:
+            return []
+
+        return [
+            (1 << (k - 1) if k else 0, 1 << k if k else 0, int(counts[k]))
+            for k in np.flatnonzero(counts).tolist()
+        ]
+
+    def serialize(self):
+        """
+        Returns the counts of every mimetype without the trailing empty bins.
+        """
+        self.flush()
+        data = {}
+        for mimetype, counts in self.counts.items():
+            nonzero = np.flatnonzero(counts)
+            size = int(nonzero[-1]) + 1 if len(nonzero) else 0
+            data[mimetype] = counts[:size].tolist()
+        return data
+
+
+##########################################################################
+## Age Histograms
+##########################################################################
+
+class AgeHistograms(object):
+    """
+    Two dimensional (age bin by log2 size bin) histograms of the files of
+    every mimetype, by modification and by access time, counting both the
+    files and their bytes so that the data a cold tier would take is known.
+    Ages are relative to the time the histograms were created (the start of
+    the analysis); merged histograms keep the time of the first.
+
+    Like the size histograms, adding a file appends its size and times to
+    the batch of its mimetype, and full batches are binned with NumPy.
+    """
+
+    @classmethod
+    def deserialize(klass, data):
+        histograms = klass(data['now'])
+        for mimetype, times in data['mimes'].items():
+            counts = histograms.zeros()
+            for kind, cells in times.items():
+                for age, size, files, nbytes in cells:
+                    counts[kind][0, age, size] = files
+                    counts[kind][1, age, size] = nbytes
+            histograms.counts[mimetype] = counts
+        return histograms
+
+    @staticmethod
+    def zeros():
+        return dict((kind, np.zeros((2, len(AGES), BINS), dtype=np.int64)) for kind in TIMES)
+
+    def __init__(self, now=None):
+        if np is None:
+            raise ImportError("Age histograms require NumPy (pip install numpy)")
+
+        self.now     = now or time.time()
+        self.counts  = {}  # mimetype -> time -> (files, bytes) of each (age, size) bin
+        self.batches = {}  # mimetype -> (sizes, mtimes, atimes) not yet binned
+
+    def __iadd__(self, other):
+        """
+        Merges the counts of another set of histograms, e.g. of a shard.
+        """
+        other.flush()
+        self.flush()
+
+        for mimetype, counts in other.counts.items():
+            if mimetype not in self.counts:
+                self.counts[mimetype] = self.zeros()
+            for kind in TIMES:
+                self.counts[mimetype][kind] += counts[kind]
+        return self
+
+    def add(self, mimetype, size, mtime, atime):
+        batch = self.batches.get(mimetype)
+        if batch is None:
+            batch = self.batches[mimetype] = (array(TYPECODE), array('d'), array('d'))
+
+        sizes, mtimes, atimes = batch
+        sizes.append(size)
+        mtimes.append(mtime)
+        atimes.append(atime)
+
+        if len(sizes) >= BATCH:
+            self.bin(mimetype, batch)
+            del self.batches[mimetype]
+
+    def bin(self, mimetype, batch):
+        """
+        Adds the files of the batch to the bins of the mimetype.
+        """
+        sizes, mtimes, atimes = batch
+        sizes = np.frombuffer(sizes, dtype="<u{}".format(sizes.itemsize))
+        cells = len(AGES) * BINS
+        sbins = size_bins(sizes)
+        weights = sizes.astype(np.float64)
+
+        if mimetype not in self.counts:
+            self.counts[mimetype] = self.zeros()
+
+        for kind, times in ((MTIME, mtimes), (ATIME, atimes)):
+            ages = self.now - np.frombuffer(times, dtype=np.float64)
+            flat = age_bins(ages) * BINS + sbins
+
+            counts = self.counts[mimetype][kind]
+            counts[0] += np.bincount(flat, minlength=cells).reshape(len(AGES), BINS)
+            counts[1] += np.rint(
+                np.bincount(flat, weights=weights, minlength=cells)
+            ).astype(np.int64).reshape(len(AGES), BINS)
+
+    def flush(self):
+        """
+        Bins the pending batches of every mimetype.
+        """
+        for mimetype, batch in self.batches.items():
+            self.bin(mimetype, batch)
+        self.batches.clear()
+
+    def older(self, age, kind=ATIME):
+        """
+        Returns the files and bytes of every mimetype in the age bins that
+        are at least age seconds old (by access or modification time); the
+        age is rounded up to the bin edges.
+        """
+        self.flush()
+        first = int(np.searchsorted(np.array(AGES, dtype=np.float64), age, side='left'))
+
+        result = {}
+        for mimetype, counts in self.counts.items():
+            files, nbytes = counts[kind][:, first:, :].sum(axis=(1, 2)).tolist()
+            if files:
+                result[mimetype] = (files, nbytes)
+        return result
+
+    def serialize(self):
+        """
+        Returns the time the ages are relative to, the lower bounds of the
+        age bins and the nonzero (age, size, files, bytes) cells of every
+        mimetype by time.
+        """
+        self.flush()
+        data = {'now': self.now, 'ages': list(AGES), 'mimes': {}}
+
+        for mimetype, counts in self.counts.items():
+            data['mimes'][mimetype] = times = {}
+            for kind in TIMES:
+                files, nbytes = counts[kind].tolist()
+                times[kind] = [
+                    [age, size, files[age][size], nbytes[age][size]]
+                    for age, size in np.transpose(np.nonzero(counts[kind][0])).tolist()
+                ]
+
+        return data
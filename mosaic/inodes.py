@@ -0,0 +1,148 @@
+# mosaic.inodes
+# Memory compact set of the inodes of hard linked files.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Fri Dec 11 11:24:09 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: inodes.py [] benjamin@bengfort.com $
+
+"""
+Memory compact set of the inodes of hard linked files.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import bisect
+import threading
+
+from array import array
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+TYPECODE   = 'L'      # Unsigned long, 8 bytes on 64-bit platforms
+BUFFER     = 4096     # Inodes kept in a Python set before they are sorted
+CHUNK      = 65536    # Inodes of each block merged at a time
+
+##########################################################################
+## Helper functions
+##########################################################################
+
+def merge(first, second, chunk=CHUNK):
+    """
+    Merges two sorted arrays into a new array a chunk at a time: the values
+    of both up to the smaller end of their next chunks are sorted together
+    (timsort merges the two runs), so only up to 2 * chunk inodes are ever
+    held as Python ints, however large the blocks are.
+    """
+    merged = array(TYPECODE)
+    i, j = 0, 0
+    while i < len(first) and j < len(second):
+        upto = min(
+            first[min(i + chunk, len(first)) - 1], second[min(j + chunk, len(second)) - 1]
+        )
+        inext = bisect.bisect_right(first, upto, i)
+        jnext = bisect.bisect_right(second, upto, j)
+        merged.extend(sorted(first[i:inext] + second[j:jnext]))
+        i, j = inext, jnext
+
+    merged.extend(first[i:])
+    merged.extend(second[j:])
+    return merged
+
+##########################################################################
+## Inode Blocks
+##########################################################################
+
+class InodeBlocks(object):
+    """
+    A set of the inode numbers of one device kept in sorted array blocks,
+    so that every inode costs 8 bytes rather than the 50 or more bytes of
+    an int in a Python set. New inodes are buffered in a small set; when it
+    is full it is sorted into a block, and blocks of similar size are merged
+    (like a log-structured merge tree) until every block is more than twice
+    the size of the next, so there are at most log2(n / BUFFER) + 1 blocks
+    to bisect, however many inodes are added.
+    """
+
+    def __init__(self):
+        self.blocks = []     # sorted arrays, largest first
+        self.buffer = set()  # recently added inodes
+
+    def __len__(self):
+        return len(self.buffer) + sum(len(block) for block in self.blocks)
+
+    def __contains__(self, ino):
+        if ino in self.buffer:
+            return True
+
+        for block in self.blocks:
+            if block[0] <= ino <= block[-1]:
+                idx = bisect.bisect_left(block, ino)
+                if block[idx] == ino:
+                    return True
+        return False
+
+    def add(self, ino):
+        """
+        Adds the inode, returning False if it was already in the set.
+        """
+        if ino in self:
+            return False
+
+        self.buffer.add(ino)
+        if len(self.buffer) >= BUFFER:
+            self.compact()
+        return True
+
+    def compact(self):
+        """
+        Sorts the buffer into a block, merging it with the smaller blocks.
+        """
+        if not self.buffer:
+            return
+
+        block = array(TYPECODE, sorted(self.buffer))
+        self.buffer = set()
+
+        while self.blocks and len(self.blocks[-1]) <= 2 * len(block):
+            block = merge(self.blocks.pop(), block)
+
+        self.blocks.append(block)
+
+
+##########################################################################
+## Inode Set
+##########################################################################
+
+class InodeSet(object):
+    """
+    A thread-safe set of (st_dev, st_ino) pairs with a block set per device.
+    """
+
+    def __init__(self):
+        self.devices = {}
+        self.lock    = threading.Lock()
+
+    def __len__(self):
+        return sum(len(blocks) for blocks in self.devices.values())
+
+    def __contains__(self, key):
+        dev, ino = key
+        blocks = self.devices.get(dev)
+        return blocks is not None and ino in blocks
+
+    def add(self, dev, ino):
+        """
+        Adds the inode of the device, returning False if it was already seen.
+        """
+        with self.lock:
+            if dev not in self.devices:
+                self.devices[dev] = InodeBlocks()
+            return self.devices[dev].add(ino)
@@ -0,0 +1,157 @@
+# mosaic.largest
+# Bounded heaps of the largest files and directories of an analysis.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Sat Dec 19 10:02:18 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: largest.py [] benjamin@bengfort.com $
+
+"""
+Bounded heaps of the largest files and directories of an analysis.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import heapq
+
+from mosaic.path import escape_path, unescape_path
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+TOP = 10  # Default number of the largest files and directories kept
+
+# Bytes the largest directories are ranked by
+LOCAL   = "local"    # the files directly in the directory
+SUBTREE = "subtree"  # every file of the subtree, rolled up by a DirTree
+
+##########################################################################
+## Top N
+##########################################################################
+
+class TopN(object):
+    """
+    A min-heap of the n largest (size, path) items pushed onto it, so the
+    smallest of them is at the top and most items are rejected with a
+    single comparison against it.
+    """
+
+    def __init__(self, n=TOP, items=()):
+        self.n    = n
+        self.heap = []
+        for path, size in items:
+            self.push(size, unescape_path(path))
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, size, path):
+        heap = self.heap
+        if len(heap) < self.n:
+            heapq.heappush(heap, (size, str(path)))
+        elif size > heap[0][0]:
+            heapq.heapreplace(heap, (size, str(path)))
+
+    def __iadd__(self, other):
+        for size, path in other.heap:
+            self.push(size, path)
+        return self
+
+    def items(self):
+        """
+        Returns the (path, size) items from the largest to the smallest.
+        """
+        return [(path, size) for size, path in sorted(self.heap, reverse=True)]
+
+    def serialize(self):
+        return [(escape_path(path), size) for path, size in self.items()]
+
+
+##########################################################################
+## Largest
+##########################################################################
+
+class Largest(object):
+    """
+    The n largest files (globally and of every mimetype) and directories
+    (by the bytes of the files directly in them) of an analysis, in memory
+    proportional to n and the number of mimetypes rather than the tree.
+
+    The bytes of a subtree are only known once the whole tree is scanned,
+    so if the analysis kept a DirTree the directories are serialized by
+    the rolled up bytes of their subtrees instead; the ranking key of the
+    serialized data says which of the two the directories are ranked by.
+    """
+
+    @classmethod
+    def deserialize(klass, data):
+        largest = klass(data['n'])
+        largest.ranking = data.get('ranking', LOCAL)
+        largest.files = TopN(largest.n, data['files'])
+        largest.dirs  = TopN(largest.n, data['dirs'])
+        for mimetype, items in data['mimes'].items():
+            largest.mimes[mimetype] = TopN(largest.n, items)
+        return largest
+
+    def __init__(self, n=TOP):
+        self.n     = n
+        self.files = TopN(n)
+        self.dirs  = TopN(n)
+        self.mimes = {}
+        self.ranking = LOCAL
+
+    def __iadd__(self, other):
+        """
+        Merges the largest files and directories of another collector.
+        """
+        self.files += other.files
+        self.dirs  += other.dirs
+        for mimetype, top in other.mimes.items():
+            if mimetype not in self.mimes:
+                self.mimes[mimetype] = TopN(self.n)
+            self.mimes[mimetype] += top
+        return self
+
+    def file(self, path, mimetype, size):
+        self.files.push(size, path)
+
+        top = self.mimes.get(mimetype)
+        if top is None:
+            top = self.mimes[mimetype] = TopN(self.n)
+        top.push(size, path)
+
+    def directory(self, path, size):
+        self.dirs.push(size, path)
+
+    def subtrees(self, tree):
+        """
+        Returns the n largest subtrees of the tree (below its root) by the
+        rolled up bytes of every file in them.
+        """
+        sizes = tree.rollup()[1]
+        top   = TopN(self.n)
+        for dirid, depth in enumerate(tree.depths):
+            if depth > 0:
+                top.push(sizes[dirid], tree.paths[dirid])
+        return top
+
+    def serialize(self, tree=None):
+        dirs, ranking = self.dirs, self.ranking
+        if tree is not None:
+            dirs, ranking = self.subtrees(tree), SUBTREE
+
+        return {
+            'n':     self.n,
+            'files': self.files.serialize(),
+            'dirs':  dirs.serialize(),
+            'ranking': ranking,
+            'mimes': dict(
+                (mimetype, top.serialize()) for mimetype, top in self.mimes.items()
+            ),
+        }
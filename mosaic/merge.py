@@ -0,0 +1,192 @@
+# mosaic.merge
+# Combines many usage dumps into one by a parallel tree reduction.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Wed Dec 16 09:47:13 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: merge.py [] benjamin@bengfort.com $
+
+"""
+Combines many usage dumps into one by a parallel tree reduction.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+from mosaic.path import Path
+from mosaic.usage import FileUsage
+from mosaic.binary import BINARY
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+FANOUT = 8  # Number of dumps reduced into one by a worker at every level
+
+##########################################################################
+## Helper functions
+##########################################################################
+
+def common_root(*roots):
+    """
+    Returns the deepest directory that all of the roots are in.
+    """
+    parts  = [str(root).rstrip(os.sep).split(os.sep) for root in roots]
+    common = os.path.commonprefix(parts)
+    return Path(os.sep.join(common) or os.sep)
+
+
+def overlaps(root, other):
+    """
+    Returns True if one of the roots is (or is inside) the other.
+    """
+    root, other = str(root).rstrip(os.sep), str(other).rstrip(os.sep)
+    return (
+        root == other or
+        root.startswith(other + os.sep) or
+        other.startswith(root + os.sep)
+    )
+
+
+def load(path):
+    """
+    Loads the usage dump at the path, recording it as the source of the
+    usage unless it is itself a merge of other dumps.
+    """
+    with open(path, 'rb') as f:
+        usage = FileUsage.load(f)
+
+    if usage.sources is None:
+        usage.sources = [usage.source(str(path))]
+    return usage
+
+
+def combine(usage, other):
+    """
+    Adds the other usage to the usage, moving the root up to the common root
+    of both. The roots of the two usages must not overlap (e.g. the same
+    export scanned on two hosts), since their files would be counted twice.
+    The directory snapshots and trees are only kept while every merged
+    usage has them.
+
+    Hard links are only deduplicated within each dump (the seen inodes are
+    not dumped), so an inode linked from two dumps would be counted twice
+    in the unique bytes; a merge of several dumps drops them instead.
+    """
+    for source in usage.sources or ():
+        for theirs in other.sources or ():
+            if overlaps(source['root'], theirs['root']):
+                raise ValueError(
+                    "Cannot merge the usage of {} and {}, their roots overlap"
+                    .format(source['path'], theirs['path'])
+                )
+
+    for attr in ('snapshot', 'tree'):
+        missing = usage.sources and getattr(usage, attr) is None
+        if missing or getattr(other, attr) is None:
+            setattr(usage, attr, None)
+            setattr(other, attr, None)
+
+    if usage.sources:
+        usage.unique.clear()
+        other.unique.clear()
+
+    usage.root = common_root(usage.root, other.root)
+    if usage.tree is not None:
+        usage.tree.rebase(usage.root)
+
+    usage += other
+    return usage
+
+
+##########################################################################
+## Tree Reduction
+##########################################################################
+
+def reduce_dumps(paths, output=None, fmt=BINARY):
+    """
+    Merges the dumps at the paths one at a time, so only the merged usage
+    and a single input are in memory, and either returns the merged usage
+    or saves it to the output path and returns the path.
+    """
+    usage = None
+    for path in paths:
+        other = load(path)
+        if usage is None:
+            # Start from an empty usage so the options of the input are not
+            # carried over (e.g. its cache or records paths).
+            usage = FileUsage(other.root)
+        combine(usage, other)
+
+    if output is None:
+        return usage
+
+    usage.save(output, fmt=fmt)
+    return output
+
+
+def merge(paths, workers=None, fanout=FANOUT, tmpdir=None):
+    """
+    Merges the usage dumps (JSON or binary) at the paths in a tree reduction:
+    at every level the dumps are split into batches of fanout, which a pool
+    of worker processes reduce into intermediate binary dumps, until a single
+    batch is left to reduce into the returned usage. Each worker streams its
+    batch, so memory is bounded by the workers rather than the inputs.
+
+    The merged usage spans the common root of the inputs and keeps the root,
+    dump path, totals and timing of every input in its sources.
+    """
+    paths = [str(path) for path in paths]
+    if not paths:
+        raise ValueError("At least one usage dump is required to merge.")
+
+    if fanout < 2:
+        raise ValueError("The fanout of the merge must be at least 2.")
+
+    workers = workers or multiprocessing.cpu_count()
+    workdir = tempfile.mkdtemp(prefix="mosaic-merge-", dir=tmpdir)
+    pool    = multiprocessing.Pool(workers) if workers > 1 and len(paths) > fanout else None
+
+    try:
+        level = 0
+        while len(paths) > fanout:
+            tasks = []
+            for idx in xrange(0, len(paths), fanout):
+                output = os.path.join(workdir, "level{}-{}.mosaic".format(level, idx // fanout))
+                batch  = paths[idx:idx + fanout]
+                if pool is not None:
+                    tasks.append(pool.apply_async(reduce_dumps, (batch, output)))
+                else:
+                    tasks.append(reduce_dumps(batch, output))
+
+            outputs = [task.get() if pool is not None else task for task in tasks]
+
+            # Intermediate dumps of the level below are no longer needed.
+            for path in paths:
+                if path.startswith(workdir):
+                    os.remove(path)
+
+            paths  = outputs
+            level += 1
+
+        if pool is not None:
+            pool.close()
+
+        return reduce_dumps(paths)
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.join()
+        shutil.rmtree(workdir, ignore_errors=True)
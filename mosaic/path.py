@@ -18,9 +18,12 @@ Wrapper for common path based operations
 ##########################################################################
 
 import os
-import magic
+import re
 import scandir
 
+from collections import deque
+
+from mosaic.detect import detector
 from mosaic.utils import memoized
 
 ##########################################################################
@@ -32,6 +35,51 @@ FILENODE  = "inode/file"
 LINKNODE  = "inode/symlink"
 EMPTYNODE = "inode/x-empty"
 
+# Traversal orders
+DFS    = "dfs"
+BFS    = "bfs"
+ORDERS = (DFS, BFS)
+
+# Escaped bytes (U+DC80 to U+DCFF) that are not the low half of a surrogate pair
+ESCAPED = re.compile(u'(?<![\ud800-\udbff])[\udc80-\udcff]')
+
+##########################################################################
+## Escaping
+##########################################################################
+
+def escape_path(path):
+    """
+    Returns a path that JSON can encode and unescape_path reverses exactly,
+    so that the paths in dumps (snapshots, trees, the largest files and the
+    records) may contain any bytes. Paths are bytes on Linux: valid UTF-8 is
+    returned as is, otherwise every non-ASCII byte is escaped to a lone
+    surrogate (like Python 3's surrogateescape), which no path that is
+    returned as is contains.
+    """
+    path = str(path)
+    try:
+        text = path.decode('utf-8')
+        if text.encode('utf-8') == path and not ESCAPED.search(text):
+            return path
+    except UnicodeDecodeError:
+        pass
+
+    return u"".join(unichr(0xdc00 + ord(c)) if c >= '\x80' else unicode(c) for c in path)
+
+
+def unescape_path(path):
+    """
+    Returns the bytes of a path escaped by escape_path (e.g. loaded from JSON).
+    """
+    if isinstance(path, str):
+        return path
+
+    if not ESCAPED.search(path):
+        return path.encode('utf-8')
+
+    return "".join(chr(ord(c) & 0xff) for c in path)
+
+
 ##########################################################################
 ## Walking
 ##########################################################################
@@ -53,29 +101,46 @@ def walk(path, include_hidden=False):
         yield name, dirs, files, path.relative_depth(name)
 
 
-def scan(path, include_hidden=False, onerror=None):
+def scan(path, include_hidden=False, onerror=None, order=DFS):
     """
     Scan a directory, excluding hidden directories. Yields paths.
     This method captures any OSErrors, passing them to the onerror function if
     one is passed to the scanner; otherwise it simply ignores them.
-    """
 
-    # Do not capture errors at the top level, only for subpaths.
-    for subpath in path.list():
-        if not include_hidden and subpath.is_hidden():
-            continue
+    Rather than recursing into nested generators, the scan keeps an explicit
+    stack (depth first, the default) or queue (breadth first) of directories,
+    so every path is yielded exactly once whatever its depth and deep trees
+    cannot hit the recursion limit. The entries of a directory are yielded
+    together and only one directory listing is held open at a time.
+    """
+    if order not in ORDERS:
+        raise ValueError("Unknown traversal order '{}'".format(order))
 
-        yield subpath
+    pending = deque([path])
+    while pending:
+        # Depth first takes the newest directory, breadth first the oldest.
+        dirpath = pending.pop() if order == DFS else pending.popleft()
+        subdirs = []
 
         try:
-            # Recursively call scan on subdirectories.
-            # Ignore errors on recursive calls unless there is a handler.
-            if subpath.is_dir():
-                for child in scan(subpath):
-                    yield child
+            for subpath in dirpath.list():
+                if not include_hidden and subpath.is_hidden():
+                    continue
+
+                yield subpath
+
+                if subpath.is_dir():
+                    subdirs.append(subpath)
+
         except OSError as e:
+            # Do not capture errors at the top level, only for subpaths.
+            if dirpath is path: raise
             if onerror is not None: onerror(e)
-            continue
+
+        # Reverse the stack push so subdirectories are visited in order.
+        if order == DFS:
+            subdirs.reverse()
+        pending.extend(subdirs)
 
 
 ##########################################################################
@@ -108,37 +173,36 @@ def get_tree_size(path):
 class Path(object):
     """
     Wraps a path string and performs common operations on it.
-    Note that the string is automatically expanded from user and env vars.
+    Note that the string is automatically expanded from user and env vars,
+    unless it is a literal path (e.g. one read from the file system).
     """
 
     @classmethod
     def from_entry(klass, entry):
         """
-        Creates a path from a scandir DirEntry.
+        Creates a path from a scandir DirEntry. Because there is one for every
+        entry in the tree, this is a compact Node record rather than a Path.
         """
-        # Initialize the path with various attributes.
-        path = klass(entry.path, inode=entry.inode())
-        path._nodestat = entry.stat(follow_symlinks=False)
+        return Node(entry)
 
-        # Set the nodetype on the path
-        if entry.is_dir(follow_symlinks=False):
-            path._nodetype = DIRNODE
-        elif entry.is_file(follow_symlinks=False):
-            path._nodetype = FILENODE
-        elif entry.is_symlink():
-            path._nodetype = LINKNODE
-        else:
-            path._nodetype = None
-
-        return path
+    @classmethod
+    def literal(klass, path):
+        """
+        Creates a path without expanding it, e.g. a directory named '$HOME'
+        or '~x' that was listed on the file system or saved in a dump.
+        """
+        return klass(path, expand=False)
 
-    def __init__(self, path, **kwargs):
-        # Copy from another path if passed in
-        if isinstance(path, Path):
-            path = path._path
+    def __init__(self, path, expand=True, **kwargs):
+        # Copy from another path (or scanned node) if passed in; its path
+        # has already been expanded (or is literal), so it is not again.
+        if isinstance(path, (Path, Node)):
+            path   = path._path
+            expand = False
 
         # Perform default Path manipulations
-        path = os.path.expandvars(os.path.expanduser(path))
+        if expand:
+            path = os.path.expandvars(os.path.expanduser(path))
         path = os.path.normpath(path)
 
         # Set various path information
@@ -160,21 +224,26 @@ class Path(object):
             return self._path == other._path
         return self._path == other
 
-    @memoized
-    def inode(self):
+    def __ne__(self, other):
+        return not self == other
+
+    @property
+    def stat(self):
         if self._nodestat is None:
             self._nodestat = os.stat(self._path)
-        return self._nodestat.st_ino
+        return self._nodestat
+
+    @memoized
+    def inode(self):
+        return self.stat.st_ino
 
     @memoized
     def mimetype(self):
-        return magic.from_file(self._path, mime=True)
+        return detector.from_file(self._path)
 
     @memoized
     def filesize(self):
-        if self._nodestat is None:
-            self._nodestat = os.stat(self._path)
-        return self._nodestat.st_size
+        return self.stat.st_size
 
     def exists(self):
         return os.path.exists(self._path)
@@ -236,3 +305,98 @@ class Path(object):
 
         depth = self._path.count(os.sep)
         return subpath._path.count(os.sep) - depth
+
+
+##########################################################################
+## Node record
+##########################################################################
+
+class Node(object):
+    """
+    A compact record of a directory entry created while scanning. Unlike a
+    Path, the entry path is used as is (scandir joins it to an already
+    normalized directory), the entry is only stat'd when its size or stat is
+    requested, and values are cached in slots rather than an instance dict.
+    """
+
+    __slots__ = ('_path', '_name', '_entry', '_nodetype', '_nodestat', '_mimetype')
+
+    def __init__(self, entry):
+        self._path     = entry.path
+        self._name     = entry.name
+        self._entry    = entry
+        self._nodestat = None
+        self._mimetype = None
+
+        # Set the nodetype on the node
+        if entry.is_dir(follow_symlinks=False):
+            self._nodetype = DIRNODE
+        elif entry.is_file(follow_symlinks=False):
+            self._nodetype = FILENODE
+        elif entry.is_symlink():
+            self._nodetype = LINKNODE
+        else:
+            self._nodetype = None
+
+    def __str__(self):
+        return self._path
+
+    def __repr__(self):
+        return "<{}: {}>".format(self.__class__.__name__, str(self))
+
+    def __eq__(self, other):
+        return self._path == str(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    @property
+    def stat(self):
+        if self._nodestat is None:
+            self._nodestat = self._entry.stat(follow_symlinks=False)
+        return self._nodestat
+
+    @property
+    def inode(self):
+        return self._entry.inode()
+
+    @property
+    def mimetype(self):
+        if self._mimetype is None:
+            self._mimetype = detector.from_file(self._path)
+        return self._mimetype
+
+    @property
+    def filesize(self):
+        return self.stat.st_size
+
+    def is_symlink(self):
+        return self._nodetype == LINKNODE
+
+    def is_dir(self):
+        return self._nodetype == DIRNODE
+
+    def is_file(self):
+        return self._nodetype == FILENODE
+
+    def is_empty(self):
+        return self._nodetype == EMPTYNODE
+
+    def is_hidden(self):
+        """
+        Returns if the node is hidden or not.
+        """
+        return self._name[0] in {'.', '~'}
+
+    def join(self, *subpath):
+        """
+        Joins another path and returns a new (full) Path.
+        """
+        return Path(self).join(*subpath)
+
+    def list(self):
+        """
+        Returns a generator of the nodes inside of a directory node.
+        """
+        for entry in scandir.scandir(self._path):
+            yield Node(entry)
@@ -0,0 +1,248 @@
+# mosaic.profiling
+# Per-phase timing of the scan loop of an analysis.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Wed Dec 23 09:12:44 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: profiling.py [] benjamin@bengfort.com $
+
+"""
+Per-phase timing of the scan loop of an analysis.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import math
+import scandir
+
+from math import frexp
+from mosaic.path import Path
+from mosaic.utils import Timer
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+# Phases of the scan loop
+SCANDIR = "scandir"  # listing the entries of directories
+NODES   = "nodes"    # constructing the nodes of the entries
+STAT    = "stat"     # stat'ing files
+MAGIC   = "magic"    # sniffing the mimetypes of files
+COUNT   = "count"    # updating the counters and collectors (the rest of the loop)
+PHASES  = (SCANDIR, NODES, STAT, MAGIC, COUNT)
+
+# Latency bins per power of two, from 2**MIN_EXPONENT to 2**MAX_EXPONENT seconds
+SUBBINS      = 4
+MIN_EXPONENT = -30
+MAX_EXPONENT = 64
+MIN_LATENCY  = 2.0 ** MIN_EXPONENT
+LATENCY_BINS = (MAX_EXPONENT - MIN_EXPONENT) * SUBBINS
+PERCENTILES  = (50, 90, 99, 99.9)
+
+##########################################################################
+## Helper functions
+##########################################################################
+
+def latency_bin(seconds):
+    """
+    Returns the index of the log-linear bin of a latency: SUBBINS bins per
+    power of two, so the bounds of a bin are within 1 / (2 * SUBBINS) of each
+    other. Latencies below MIN_LATENCY (or negative) fall into the first bin.
+    """
+    mantissa, exponent = frexp(seconds if seconds > MIN_LATENCY else MIN_LATENCY)
+    return (exponent - MIN_EXPONENT - 2) * SUBBINS + int(mantissa * 2 * SUBBINS)
+
+
+def latency_bounds(index):
+    """
+    Returns the lower and upper bounds in seconds of a latency bin.
+    """
+    exponent, sub = divmod(index, SUBBINS)
+    exponent += MIN_EXPONENT + 1
+    lower = math.ldexp(0.5 + sub / (2.0 * SUBBINS), exponent)
+    upper = math.ldexp(0.5 + (sub + 1) / (2.0 * SUBBINS), exponent)
+    return lower, upper
+
+
+##########################################################################
+## Phase
+##########################################################################
+
+class Phase(Timer):
+    """
+    A reusable Timer that accumulates the calls and seconds of every block
+    it times and, if it keeps latencies, a histogram of their durations.
+    Exiting a block runs for every stat and magic call, so it is inlined and
+    the histogram is a flat list of counts indexed by latency_bin.
+    """
+
+    def __init__(self, latencies=False):
+        super(Phase, self).__init__(wall_clock=True)
+        self.calls     = 0
+        self.seconds   = 0.0
+        self.latencies = [0] * LATENCY_BINS if latencies else None
+
+    def __exit__(self, type, value, tb):
+        self.interval = interval = self.time() - self.start
+        self.calls   += 1
+        self.seconds += interval
+        if self.latencies is not None:
+            mantissa, exponent = frexp(interval if interval > MIN_LATENCY else MIN_LATENCY)
+            self.latencies[
+                (exponent - MIN_EXPONENT - 2) * SUBBINS + int(mantissa * 2 * SUBBINS)
+            ] += 1
+
+    def __iadd__(self, other):
+        self.calls   += other.calls
+        self.seconds += other.seconds
+        if self.latencies is not None and other.latencies is not None:
+            for index, count in enumerate(other.latencies):
+                self.latencies[index] += count
+        return self
+
+    def add(self, seconds, calls=1):
+        """
+        Adds the seconds of calls that were timed outside of the phase.
+        """
+        self.calls   += calls
+        self.seconds += seconds
+        if self.latencies is not None:
+            self.latencies[latency_bin(seconds)] += 1
+
+    def percentile(self, q):
+        """
+        Returns the upper bound of the latency bin of the qth percentile.
+        """
+        total = sum(self.latencies)
+        if not total:
+            return None
+
+        rank = q / 100.0 * total
+        seen = 0
+        for index, count in enumerate(self.latencies):
+            seen += count
+            if count and seen >= rank:
+                return latency_bounds(index)[1]
+
+    def serialize(self):
+        data = {'calls': self.calls, 'seconds': self.seconds}
+        if self.latencies is not None:
+            data['latency'] = dict(
+                ("p{:g}".format(q), self.percentile(q)) for q in PERCENTILES
+            )
+            data['latency']['bins'] = [
+                [index, count] for index, count in enumerate(self.latencies) if count
+            ]
+        return data
+
+
+##########################################################################
+## Profiler
+##########################################################################
+
+class Profiler(object):
+    """
+    Cumulative seconds and calls of the phases of the scan loop: listing
+    directories, constructing their nodes, stat'ing files, sniffing their
+    mimetypes and the rest of the loop (updating the counters, classifying
+    by extension and the optional collectors), with latency percentiles of
+    the stat and magic calls.
+
+    Listing and constructing nodes are timed per entry as the directory is
+    iterated, but counted as one listing per directory; stat and magic are
+    timed per call, which is small next to the system calls they make. The
+    count phase is the time of the loop over the entries less the other
+    phases in it, so it also holds any time spent waiting on a throttle.
+    """
+
+    @classmethod
+    def deserialize(klass, data):
+        profiler = klass()
+        for name in (SCANDIR, NODES, STAT, MAGIC):
+            phase = getattr(profiler, name)
+            phase.calls   = data[name]['calls']
+            phase.seconds = data[name]['seconds']
+            if phase.latencies is not None:
+                for index, count in data[name]['latency']['bins']:
+                    phase.latencies[index] = count
+
+        # The loop is serialized as the count phase, which excludes the others.
+        profiler.loop.calls   = data[COUNT]['calls']
+        profiler.loop.seconds = sum(data[name]['seconds'] for name in PHASES)
+        return profiler
+
+    def __init__(self):
+        self.scandir = Phase()
+        self.nodes   = Phase()
+        self.stat    = Phase(latencies=True)
+        self.magic   = Phase(latencies=True)
+        self.loop    = Phase()  # the loop over the entries of directories
+
+    @property
+    def count(self):
+        """
+        The loop less the other phases in it.
+        """
+        count = Phase()
+        count.calls   = self.loop.calls
+        count.seconds = max(0.0, self.loop.seconds - sum(
+            phase.seconds for phase in (self.scandir, self.nodes, self.stat, self.magic)
+        ))
+        return count
+
+    @property
+    def phases(self):
+        return dict(zip(PHASES, (self.scandir, self.nodes, self.stat, self.magic, self.count)))
+
+    def __iadd__(self, other):
+        self.scandir += other.scandir
+        self.nodes   += other.nodes
+        self.stat    += other.stat
+        self.magic   += other.magic
+        self.loop    += other.loop
+        return self
+
+    def list(self, dirpath):
+        """
+        Yields the nodes of a directory, timing the listing and the nodes of
+        every entry as well as the loop over them, once it is done.
+        """
+        clock   = self.loop.time
+        started = clock()
+        listing = nodes = 0.0
+        count   = 0
+
+        try:
+            entries  = scandir.scandir(str(dirpath))
+            listing += clock() - started
+
+            while True:
+                before = clock()
+                try:
+                    entry = next(entries)
+                except StopIteration:
+                    listing += clock() - before
+                    break
+
+                built = clock()
+                node  = Path.from_entry(entry)
+                after = clock()
+
+                listing += built - before
+                nodes   += after - built
+                count   += 1
+                yield node
+        finally:
+            self.scandir.add(listing)
+            self.nodes.add(nodes, count)
+            self.loop.add(clock() - started)
+
+    def serialize(self):
+        return dict(
+            (name, phase.serialize()) for name, phase in self.phases.items()
+        )
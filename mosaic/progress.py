@@ -0,0 +1,208 @@
+# mosaic.progress
+# Periodic progress and throughput reports of a running analysis.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Tue Dec 22 10:18:37 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: progress.py [] benjamin@bengfort.com $
+
+"""
+Periodic progress and throughput reports of a running analysis.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import sys
+import time
+import threading
+
+from mosaic.utils import humanize_bytes
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+INTERVAL = 5.0  # Default seconds between progress reports
+CHECKS   = 10   # Clock checks per interval the stride between checks aims for
+
+##########################################################################
+## Helper functions
+##########################################################################
+
+def humanize_seconds(seconds):
+    """
+    Formats a duration in seconds as hours, minutes and seconds.
+    """
+    if seconds is None:
+        return "unknown"
+
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{:d}:{:02d}:{:02d}".format(hours, minutes, seconds)
+
+
+def write_report(stats, stream=None):
+    """
+    Writes a progress report as a line to the stream (stderr by default).
+    """
+    stream = stream or sys.stderr
+    stream.write(
+        "[{}] {:,d} dirs ({:,d} pending, depth {:d}), {:,d} entries at {:,.0f}/s, "
+        "{} at {}/s, ETA {}\n".format(
+            humanize_seconds(stats['elapsed']), stats['dirs'], stats['pending'],
+            stats['depth'], stats['entries'], stats['entries_per_sec'],
+            humanize_bytes(stats['bytes']), humanize_bytes(int(stats['bytes_per_sec'])),
+            humanize_seconds(stats['eta']),
+        )
+    )
+    stream.flush()
+
+
+##########################################################################
+## Progress
+##########################################################################
+
+class Progress(object):
+    """
+    Reports the progress of an analysis every interval seconds to a callback
+    (which writes a line to stderr by default) with a dictionary of stats:
+    the directories scanned and pending, the depth of the last directory,
+    the entries and bytes classified with their rates per second, and the
+    ETA from the rate of directories and the directories still pending
+    (a lower bound, since pending directories hold undiscovered ones).
+
+    Scanners call scanned once per directory, which only counts it; the
+    clock is checked every stride directories, where the stride adapts to
+    the rate of directories so that it is checked a few times per interval.
+    A watchdog thread forces a check once every interval of wall time, so
+    a stride adapted to a fast part of the tree cannot delay the reports
+    of a slow part. Entries and bytes are only summed from the tracked
+    usages (e.g. the shards of a parallel analysis) when a report is due.
+    """
+
+    def __init__(self, callback=None, interval=INTERVAL, clock=time.time):
+        self.callback = callback or write_report
+        self.interval = interval
+        self.clock    = clock
+        self.usages   = []
+        self.pending  = None  # callable returning the number of pending directories
+        self.root     = None
+        self.last     = None  # the last directory scanned
+        self.lock     = threading.Lock()
+        self.mutex    = threading.Lock()  # guards the count of directories
+        self.stopped  = False
+
+        self.dirs     = 0
+        self.stride   = 1
+        self.check    = 1  # directories at the next clock check
+        self.started  = None
+        self.checked  = None
+        self.reported = None
+        self.stats    = None
+
+    def start(self, root, pending=None):
+        """
+        Starts timing the analysis of the root.
+        """
+        self.root     = str(root).rstrip(os.sep)
+        self.pending  = pending
+        self.started  = self.checked = self.reported = self.clock()
+
+        watchdog = threading.Thread(target=self.watch)
+        watchdog.daemon = True
+        watchdog.start()
+        return self
+
+    def watch(self, sleep=time.sleep):
+        """
+        Forces a clock check at the next scanned directory every interval
+        (of wall time) until the analysis is finished. Sleep is bound here
+        so that the watchdog of a failed analysis, which is never finished,
+        does not look up module globals during interpreter shutdown.
+        """
+        while True:
+            sleep(self.interval)
+            if self.stopped:
+                return
+            self.check = 0
+
+    def track(self, *usages):
+        """
+        Adds usages whose entries and bytes are counted in the reports.
+        """
+        self.usages.extend(usages)
+
+    def scanned(self, dirpath, count=1):
+        """
+        Counts the scanned directories, reporting if the next report is due.
+        """
+        with self.mutex:
+            self.dirs += count
+        self.last = dirpath
+        if self.dirs >= self.check:
+            self.tick()
+
+    def tick(self):
+        """
+        Checks the clock, adapts the stride and reports if it is due.
+        """
+        if not self.lock.acquire(False):
+            return
+
+        try:
+            now = self.clock()
+            self.stride = max(1, int(
+                self.stride * self.interval / CHECKS / max(now - self.checked, 1e-3)
+            ))
+            self.check   = self.dirs + self.stride
+            self.checked = now
+
+            if now - self.reported >= self.interval:
+                self.report(now)
+        finally:
+            self.lock.release()
+
+    def report(self, now=None):
+        """
+        Computes the stats of the analysis and passes them to the callback.
+        """
+        now     = now or self.clock()
+        elapsed = max(now - self.started, 1e-6)
+        pending = self.pending() if self.pending is not None else 0
+        entries = sum(usage.items for usage in self.usages)
+        nbytes  = sum(usage.size for usage in self.usages)
+
+        depth = 0
+        if self.last is not None:
+            depth = str(self.last).count(os.sep) - self.root.count(os.sep)
+
+        rate = self.dirs / elapsed
+        self.stats = {
+            'elapsed': elapsed,
+            'dirs': self.dirs,
+            'pending': pending,
+            'depth': depth,
+            'entries': entries,
+            'entries_per_sec': entries / elapsed,
+            'bytes': nbytes,
+            'bytes_per_sec': nbytes / elapsed,
+            'eta': pending / rate if rate > 0 else None,
+        }
+
+        self.reported = now
+        self.callback(self.stats)
+        return self.stats
+
+    def finish(self):
+        """
+        Reports the final stats of the analysis.
+        """
+        self.stopped = True
+        with self.lock:
+            return self.report()
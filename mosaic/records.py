@@ -0,0 +1,154 @@
+# mosaic.records
+# Streams a compact record of every scanned node as newline delimited JSON.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Thu Dec 10 09:12:36 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: records.py [] benjamin@bengfort.com $
+
+"""
+Streams a compact record of every scanned node as newline delimited JSON.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import zlib
+import tempfile
+import threading
+
+from mosaic.path import escape_path
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+BUFFER_SIZE = 1048576  # Bytes of records buffered before they are written
+GZIP_WBITS  = 16 + zlib.MAX_WBITS
+
+# Compact separators for one record per line
+SEPARATORS  = (',', ':')
+
+##########################################################################
+## Record Writer
+##########################################################################
+
+def truncate(path, size=0):
+    """
+    Creates (or empties) the records file before an analysis appends to it,
+    or cuts it back to size bytes, e.g. its size at a checkpoint.
+    """
+    with open(path, 'ab') as f:
+        f.truncate(size)
+
+
+def spool(path):
+    """
+    Creates an empty temporary records file next to the records path (and
+    compressed like it) for a process shard to write its records to.
+    """
+    fd, name = tempfile.mkstemp(
+        prefix=".records-", suffix=".gz" if path.endswith('.gz') else "",
+        dir=os.path.dirname(os.path.abspath(path)),
+    )
+    os.close(fd)
+    return name
+
+
+class RecordWriter(object):
+    """
+    Buffers the records of scanned nodes and appends them to the path in
+    chunks of buffer_size bytes, so memory is bounded whatever the size of
+    the tree and consumers can read the file while the scan is running.
+
+    Every chunk is written with a single append-only write, so any number
+    of threads and processes can each hold a writer on the same path; with
+    a .gz path every chunk is written as a complete gzip member, which gzip
+    readers decompress as one concatenated stream.
+
+    Paths that are not valid UTF-8 are written with their non-ASCII bytes
+    escaped to lone surrogates (see mosaic.path.escape_path), which
+    unescape_path turns back into the exact bytes of the path.
+    """
+
+    def __init__(self, path, buffer_size=BUFFER_SIZE):
+        self.path   = path
+        self.gzip   = path.endswith('.gz')
+        self.limit  = buffer_size
+        self.buffer = []
+        self.size   = 0
+        self.count  = 0
+        self.lock   = threading.Lock()
+        self.fd     = None
+
+    def write(self, path, node, mimetype, size, inode, mtime):
+        """
+        Buffers the record of a node, writing the buffer when it is full.
+        """
+        line = json.dumps({
+            'path':  escape_path(path),
+            'type':  node,
+            'mime':  mimetype,
+            'size':  size,
+            'inode': inode,
+            'mtime': mtime,
+        }, separators=SEPARATORS) + "\n"
+
+        with self.lock:
+            self.buffer.append(line)
+            self.size  += len(line)
+            self.count += 1
+
+            if self.size >= self.limit:
+                self._flush()
+
+    def append(self, path):
+        """
+        Writes the buffered records and then the records file at the path
+        (e.g. spooled by a shard) in chunks of buffer_size, removing it.
+        """
+        with self.lock:
+            self._flush()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.limit), ""):
+                    self._write(chunk)
+            os.remove(path)
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+
+        chunk = "".join(self.buffer)
+        if self.gzip:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, GZIP_WBITS)
+            chunk = compressor.compress(chunk) + compressor.flush()
+
+        self._write(chunk)
+        self.buffer = []
+        self.size   = 0
+
+    def _write(self, chunk):
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0644)
+
+        # Loop for short writes, e.g. when interrupted by a signal.
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
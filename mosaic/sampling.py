@@ -0,0 +1,187 @@
+# mosaic.sampling
+# Reproducible sampling of files and estimates of the full usage.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Sun Dec 20 14:21:09 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: sampling.py [] benjamin@bengfort.com $
+
+"""
+Reproducible sampling of files and estimates of the full usage.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import math
+import struct
+import hashlib
+
+from collections import Counter
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+Z95   = 1.959964  # Standard normal quantile of a 95% confidence interval
+TOTAL = "*"       # Key of the totals over every mimetype
+
+# Unsigned 32 bit integer of the first bytes of the keyed digest of a path
+UINT32 = struct.Struct(">I")
+
+##########################################################################
+## Sampler
+##########################################################################
+
+class Sampler(object):
+    """
+    Decides which files of an analysis are classified and stat'd, and
+    estimates the mimes and store counters of the whole tree from them.
+
+    Every unit (a file, or with the stratified option a directory and all
+    of its files) is included when the first 4 bytes of the SHA1 digest of
+    the seed and its path relative to the root fall below rate * 2**32. The
+    sample only depends on the relative paths and the seed, so it is the
+    same on every run, on every backend and wherever the tree is mounted,
+    while the samples of different seeds are independent.
+    Directories are still listed to find the rest of the tree, but the
+    files of unsampled units cost nothing beyond their directory entry.
+
+    Sampling by directory keeps the files of a directory together (every
+    directory is a cluster), which is cheaper per file sampled but gives
+    wider intervals when directories differ a lot.
+
+    Totals are estimated as sampled / rate (Horvitz-Thompson) with the
+    variance (1 - rate) / rate**2 * sum(y**2) over the sampled units, for
+    which the sum of the squares of their files and bytes are kept.
+    """
+
+    @classmethod
+    def deserialize(klass, data):
+        sampler = klass(data['rate'], data['seed'], data['stratified'])
+        sampler.units.update(data['units'])
+        sampler.files.update(data['squares']['files'])
+        sampler.bytes.update(data['squares']['bytes'])
+        return sampler
+
+    def __init__(self, rate, seed=0, stratified=False, root=None):
+        if not 0 < rate <= 1:
+            raise ValueError("The sample rate must be in (0, 1], not {}".format(rate))
+
+        self.rate       = rate
+        self.seed       = seed
+        self.stratified = stratified
+        self.threshold  = int(rate * (1 << 32))
+        self.key        = "{:d}:".format(seed)
+        self.root       = root
+        self.prefix     = str(root).rstrip(os.sep) + os.sep if root is not None else ""
+        self.current    = True  # If the directory being scanned is sampled
+
+        self.units = Counter()  # sampled and skipped units
+        self.files = Counter()  # sum of the squared files of the units by mimetype
+        self.bytes = Counter()  # sum of the squared bytes of the units by mimetype
+
+    def __iadd__(self, other):
+        """
+        Merges the sums of another sampler with the same rate, e.g. a shard.
+        """
+        if (other.rate, other.seed, other.stratified) != (self.rate, self.seed, self.stratified):
+            raise ValueError("Cannot merge samples with different rates or seeds")
+
+        self.units.update(other.units)
+        self.files.update(other.files)
+        self.bytes.update(other.bytes)
+        return self
+
+    def includes(self, path):
+        """
+        Returns True if the unit at the path is in the sample.
+        """
+        path = str(path)
+        path = path[len(self.prefix):] if path.startswith(self.prefix) else ""
+        digest = hashlib.sha1(self.key + path).digest()
+        return UINT32.unpack_from(digest)[0] < self.threshold
+
+    def enter(self, dirpath):
+        """
+        Called when a directory is scanned; decides if its files are sampled.
+        """
+        if self.stratified:
+            self.current = self.includes(dirpath)
+            self.units['sampled' if self.current else 'skipped'] += 1
+
+    def selects(self, path):
+        """
+        Returns True if the file is sampled, counting it either way.
+        """
+        if self.stratified:
+            return self.current
+
+        if self.includes(path):
+            self.units['sampled'] += 1
+            return True
+
+        self.units['skipped'] += 1
+        return False
+
+    def file(self, mimetype, size):
+        """
+        Adds a sampled file, which is a unit of its own unless stratified.
+        """
+        if not self.stratified:
+            for key in (mimetype, TOTAL):
+                self.files[key] += 1
+                self.bytes[key] += size * size
+
+    def directory(self, record):
+        """
+        Adds the local contribution of a sampled directory, if stratified.
+        """
+        if self.stratified and self.current:
+            for mimetype, count in record.mimes.items():
+                self.files[mimetype] += count * count
+                self.bytes[mimetype] += record.store[mimetype] ** 2
+
+            self.files[TOTAL] += sum(record.mimes.values()) ** 2
+            self.bytes[TOTAL] += sum(record.store.values()) ** 2
+
+    def interval(self, total, squares, z=Z95):
+        """
+        Returns the estimate and the lower and upper bounds of its confidence
+        interval from the sampled total and sum of squares.
+        """
+        estimate = total / self.rate
+        error = z * math.sqrt((1 - self.rate) / self.rate ** 2 * squares)
+        return estimate, max(estimate - error, total), estimate + error
+
+    def estimate(self, mimes, store, z=Z95):
+        """
+        Returns the estimated files and bytes of every mimetype (and of all
+        of them) with their confidence intervals from the sampled counters.
+        """
+        estimates = {}
+        for mimetype in mimes:
+            estimates[mimetype] = {
+                'files': self.interval(mimes[mimetype], self.files[mimetype], z),
+                'bytes': self.interval(store[mimetype], self.bytes[mimetype], z),
+            }
+
+        estimates[TOTAL] = {
+            'files': self.interval(sum(mimes.values()), self.files[TOTAL], z),
+            'bytes': self.interval(sum(store.values()), self.bytes[TOTAL], z),
+        }
+        return estimates
+
+    def serialize(self):
+        return {
+            'rate': self.rate,
+            'seed': self.seed,
+            'stratified': self.stratified,
+            'units': self.units,
+            'squares': {'files': self.files, 'bytes': self.bytes},
+        }
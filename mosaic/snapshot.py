@@ -0,0 +1,219 @@
+# mosaic.snapshot
+# Per-directory snapshots of an analysis for incremental re-scans.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Mon Dec 07 09:41:16 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: snapshot.py [] benjamin@bengfort.com $
+
+"""
+Per-directory snapshots of an analysis for incremental re-scans.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import threading
+
+from collections import defaultdict
+from mosaic.path import escape_path, unescape_path
+
+##########################################################################
+## Directory Record
+##########################################################################
+
+class DirRecord(object):
+    """
+    The modification and change times of a directory along with its local
+    contribution (its direct entries only) to the nodes, mimes, store and
+    allocated counters of the analysis.
+    """
+
+    __slots__ = ('mtime', 'ctime', 'nodes', 'mimes', 'store', 'alloc')
+
+    @classmethod
+    def deserialize(klass, data):
+        return klass(
+            data['mtime'], data['ctime'], data['nodes'], data['mimes'],
+            data['store'], data.get('alloc'),
+        )
+
+    def __init__(self, mtime, ctime, nodes=None, mimes=None, store=None, alloc=None):
+        self.mtime = mtime
+        self.ctime = ctime
+        self.nodes = nodes or {}
+        self.mimes = mimes or {}
+        self.store = store or {}
+        self.alloc = alloc or {}
+
+    def add(self, node, mimetype=None, size=0, allocated=0):
+        """
+        Adds an entry of the directory to the local contribution.
+        """
+        self.nodes[node] = self.nodes.get(node, 0) + 1
+        if mimetype is not None:
+            self.mimes[mimetype] = self.mimes.get(mimetype, 0) + 1
+            self.store[mimetype] = self.store.get(mimetype, 0) + size
+            self.alloc[mimetype] = self.alloc.get(mimetype, 0) + allocated
+
+    def unchanged(self, stat):
+        """
+        Returns True if the stat of the directory matches the snapshot, e.g.
+        no entries have been created, deleted or renamed in the directory.
+        """
+        return self.mtime == stat.st_mtime and self.ctime == stat.st_ctime
+
+    def serialize(self):
+        return {
+            'mtime': self.mtime,
+            'ctime': self.ctime,
+            'nodes': self.nodes,
+            'mimes': self.mimes,
+            'store': self.store,
+            'alloc': self.alloc,
+        }
+
+
+##########################################################################
+## Snapshot
+##########################################################################
+
+class Snapshot(object):
+    """
+    The directory records of an analysis keyed by the directory path.
+    """
+
+    @classmethod
+    def deserialize(klass, data):
+        return klass(
+            (unescape_path(path), DirRecord.deserialize(record))
+            for path, record in data.items()
+        )
+
+    def __init__(self, records=None):
+        self.records   = dict(records or {})
+        self._children = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, path):
+        return str(path) in self.records
+
+    def __iadd__(self, other):
+        """
+        Merges the (disjoint) records of another snapshot, e.g. of a shard.
+        """
+        self.records.update(other.records)
+        self._children = None
+        return self
+
+    def get(self, path):
+        return self.records.get(str(path))
+
+    def record(self, path, stat):
+        """
+        Creates and stores an empty record for the directory and its stat,
+        replacing any existing record of the directory.
+        """
+        path = str(path)
+        if path not in self.records and self._children is not None:
+            parent = os.path.dirname(path)
+            if parent != path:
+                self._children[parent].append(path)
+
+        record = DirRecord(stat.st_mtime, stat.st_ctime)
+        self.records[path] = record
+        return record
+
+    def remove(self, path):
+        """
+        Removes the records of the directory and all of its subdirectories,
+        returning the removed records keyed by their path.
+        """
+        removed = {}
+        for subpath in list(self.subtree(path)):
+            removed[subpath] = self.records.pop(subpath)
+            self._children.pop(subpath, None)
+
+        parent = self._children.get(os.path.dirname(str(path)))
+        if parent is not None and str(path) in parent:
+            parent.remove(str(path))
+
+        return removed
+
+    def children(self, path):
+        """
+        Returns the paths of the scanned subdirectories of the directory.
+        """
+        if self._children is None:
+            children = defaultdict(list)
+            for child in self.records:
+                # The file system root is its own dirname, not its own child.
+                parent = os.path.dirname(child)
+                if parent != child:
+                    children[parent].append(child)
+            self._children = children
+
+        return self._children.get(str(path), [])
+
+    def subtree(self, path):
+        """
+        Yields the paths of the directory and all of its subdirectories that
+        are in the snapshot.
+        """
+        stack = [str(path)] if str(path) in self.records else []
+        while stack:
+            path = stack.pop()
+            yield path
+            stack.extend(self.children(path))
+
+    def serialize(self):
+        return dict(
+            (escape_path(path), record) for path, record in self.records.items()
+        )
+
+
+##########################################################################
+## Loading
+##########################################################################
+
+_snapshots = {}
+_snaplock  = threading.Lock()
+
+
+def load_snapshot(path):
+    """
+    Loads the snapshot and the options of the usage dump at the path. The
+    result is cached so threads, and processes forked after the first load,
+    share one copy of the previous snapshot. Returns (root, options, snapshot).
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    stat = os.stat(path)
+    key  = (path, stat.st_mtime, stat.st_size)
+
+    with _snaplock:
+        if key not in _snapshots:
+            # Imported here as the binary format depends on the snapshot.
+            from mosaic import binary
+
+            with open(path, 'rb') as f:
+                data = binary.load(f)
+
+            if 'dirs' not in data:
+                raise ValueError(
+                    "{} does not contain a directory snapshot".format(path)
+                )
+
+            snapshot = data['dirs']
+            if not isinstance(snapshot, Snapshot):
+                snapshot = Snapshot.deserialize(snapshot)
+            snapshot.children(data['root'])  # Build the index before sharing
+            _snapshots[key] = (data['root'], data['options'], snapshot)
+
+        return _snapshots[key]
@@ -0,0 +1,197 @@
+# mosaic.throttle
+# Rate limits the I/O of an analysis with token buckets.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Mon Dec 21 09:44:26 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: throttle.py [] benjamin@bengfort.com $
+
+"""
+Rate limits the I/O of an analysis with token buckets.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import time
+import threading
+
+from contextlib import contextmanager
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+WINDOW    = 1.0   # Seconds between adjustments of the adaptive throttle
+ALPHA     = 0.2   # Weight of a window in the moving average of latencies
+SLOWDOWN  = 2.0   # Latency (relative to the baseline) that causes a backoff
+BACKOFF   = 0.5   # Factor the rates are multiplied by on a backoff
+RECOVERY  = 0.1   # Fraction of the rates that is restored every window
+MIN_SCALE = 0.05  # Lowest fraction of the rates the throttle backs off to
+DRIFT     = 1.01  # Growth per window of the baseline, so it can track change
+
+##########################################################################
+## Token Bucket
+##########################################################################
+
+class TokenBucket(object):
+    """
+    A thread-safe token bucket that refills at rate tokens per second up to
+    a burst of one second. Acquiring more tokens than are available takes
+    them anyway (the bucket goes into debt) and returns how long to sleep
+    until the debt is repaid, so concurrent callers are served in order and
+    a single large request (e.g. a read above the rate) is still allowed.
+    """
+
+    def __init__(self, rate, clock=time.time):
+        if rate <= 0:
+            raise ValueError("The rate of a token bucket must be positive")
+
+        self.rate   = float(rate)
+        self.scale  = 1.0
+        self.clock  = clock
+        self.tokens = self.rate
+        self.stamp  = clock()
+        self.lock   = threading.Lock()
+
+    @property
+    def burst(self):
+        return self.rate * self.scale
+
+    def acquire(self, tokens=1):
+        """
+        Takes the tokens and returns the seconds to wait before using them.
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.stamp) * self.rate * self.scale
+            )
+            self.stamp   = now
+            self.tokens -= tokens
+
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / (self.rate * self.scale)
+
+
+##########################################################################
+## Throttle
+##########################################################################
+
+class Throttle(object):
+    """
+    Limits the I/O operations per second (scandir, stat and the reads that
+    sniff mimetypes) and the bytes read per second of an analysis. Threads
+    that share a throttle share its budget.
+
+    In adaptive mode, the latency of the throttled operations is averaged
+    over every window and compared to a baseline (the lowest average seen,
+    which slowly drifts up): when the storage slows down past the baseline
+    the rates are halved, and otherwise they are restored gradually (AIMD,
+    like TCP congestion control) to the configured limits.
+    """
+
+    def __init__(self, max_iops=None, max_read_bps=None, adaptive=False,
+                 clock=time.time, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.ops   = TokenBucket(max_iops, clock) if max_iops else None
+        self.bytes = TokenBucket(max_read_bps, clock) if max_read_bps else None
+
+        if self.ops is None and self.bytes is None:
+            raise ValueError("A throttle requires a maximum of operations or bytes per second")
+
+        # Adaptive backoff state
+        self.adaptive = adaptive
+        self.scale    = 1.0
+        self.baseline = None
+        self.average  = None
+        self.latency  = [0.0, 0]  # total latency and operations in the window
+        self.window   = clock()
+        self.lock     = threading.Lock()
+        self.stats    = {'waited': 0.0, 'backoffs': 0}
+
+    def acquire(self, ops=1, nbytes=0):
+        """
+        Blocks until the operations and bytes are within the rates.
+        """
+        wait = 0.0
+        if self.ops is not None and ops:
+            wait = max(wait, self.ops.acquire(ops))
+        if self.bytes is not None and nbytes:
+            wait = max(wait, self.bytes.acquire(nbytes))
+
+        if wait > 0:
+            with self.lock:
+                self.stats['waited'] += wait
+            self.sleep(wait)
+
+    @contextmanager
+    def io(self, ops=1, nbytes=0):
+        """
+        Throttles the I/O performed in the block and, if adaptive, times it.
+        """
+        self.acquire(ops, nbytes)
+        if not self.adaptive:
+            yield
+            return
+
+        started = self.clock()
+        yield
+        self.observe(self.clock() - started, ops)
+
+    def observe(self, latency, ops=1):
+        """
+        Adds the latency of operations and adjusts the rates every window.
+        """
+        with self.lock:
+            self.latency[0] += latency
+            self.latency[1] += ops
+
+            now = self.clock()
+            if now - self.window < WINDOW:
+                return
+
+            total, count = self.latency
+            self.latency = [0.0, 0]
+            self.window  = now
+
+            mean = total / max(count, 1)
+            self.average = mean if self.average is None else (
+                ALPHA * mean + (1 - ALPHA) * self.average
+            )
+
+            if self.baseline is None or self.average < self.baseline:
+                self.baseline = self.average
+            else:
+                self.baseline *= DRIFT
+
+            if self.average > SLOWDOWN * self.baseline:
+                self.scale = max(MIN_SCALE, self.scale * BACKOFF)
+                self.stats['backoffs'] += 1
+            else:
+                self.scale = min(1.0, self.scale + RECOVERY)
+
+            for bucket in (self.ops, self.bytes):
+                if bucket is not None:
+                    bucket.scale = self.scale
+
+
+class Unthrottled(object):
+    """
+    The context of I/O that is not throttled (and costs next to nothing).
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+UNTHROTTLED = Unthrottled()
@@ -0,0 +1,259 @@
+# mosaic.tree
+# Per-directory usage tree rolled up to ancestors (like du).
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Mon Dec 14 10:36:22 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: tree.py [] benjamin@bengfort.com $
+
+"""
+Per-directory usage tree rolled up to ancestors (like du).
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import heapq
+
+from array import array
+from collections import defaultdict
+from mosaic.path import escape_path, unescape_path
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+FILE = "files"  # Node key of files in the directory records
+TOPK = 3        # Number of top mimetypes kept for every directory
+
+##########################################################################
+## Directory Tree
+##########################################################################
+
+class DirTree(object):
+    """
+    The usage of every directory of an analysis in parallel arrays indexed
+    by a directory id: the parent id, depth, and the local (direct entries)
+    files, bytes and top mimetypes by bytes. Directories are added from the
+    local contribution of their DirRecord as they are scanned; rollup then
+    adds every subtree to its ancestors in a single bottom up pass and
+    buckets the ids by depth, so subtree sizes are array lookups and the
+    biggest subtrees at a depth only look at the directories at that depth.
+
+    Mimetypes are interned to ids. The top mimetypes of a subtree are the
+    top of its own and its children's top mimetypes, so beyond the first
+    they are approximate when a mimetype is spread thinly over many dirs.
+    """
+
+    @classmethod
+    def deserialize(klass, data):
+        tree = klass(unescape_path(data['root']))
+        tree.mimes.extend(data['mimes'])
+        tree.mimeids.update((mime, idx) for idx, mime in enumerate(tree.mimes))
+
+        for path in data['paths']:
+            path = unescape_path(path)
+            tree.index[path] = len(tree.paths)
+            tree.paths.append(path)
+            tree.depths.append(tree.depth(path))
+
+        tree.parents.extend(data['parents'])
+        tree.files.extend(data['files'])
+        tree.bytes.extend(data['bytes'])
+        tree.tops.extend(data['tops'])
+        tree.topbytes.extend(data['topbytes'])
+        return tree
+
+    def __init__(self, root):
+        self.root  = str(root)
+        self.paths = []  # directory paths by id
+        self.index = {}  # directory path to id
+
+        # Interned mimetypes
+        self.mimes   = []
+        self.mimeids = {}
+
+        # Local usage of every directory
+        self.parents  = array('l')
+        self.depths   = array('l')
+        self.files    = array('L')
+        self.bytes    = array('L')
+        self.tops     = array('l')  # TOPK mimetype ids per directory (-1 if none)
+        self.topbytes = array('L')  # TOPK bytes per directory
+
+        # Subtree usage (computed by rollup)
+        self.totals = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, path):
+        return str(path) in self.index
+
+    def __iadd__(self, other):
+        """
+        Appends the directories of another tree, e.g. of a shard. The parents
+        of its top level directories are resolved by path on the next rollup.
+        """
+        offset  = len(self)
+        mimeids = [self.intern(mime) for mime in other.mimes]
+
+        for idx, path in enumerate(other.paths):
+            self.index[path] = offset + idx
+            self.paths.append(path)
+            self.depths.append(self.depth(path))
+
+            parent = other.parents[idx]
+            self.parents.append(parent + offset if parent >= 0 else -1)
+
+        self.files.extend(other.files)
+        self.bytes.extend(other.bytes)
+        self.tops.extend(mimeids[mime] if mime >= 0 else -1 for mime in other.tops)
+        self.topbytes.extend(other.topbytes)
+
+        self.totals = None
+        return self
+
+    def depth(self, path):
+        """
+        Returns the depth of the directory path below the root (stripped of
+        any trailing separator, so '/a' is a level below the root '/').
+        """
+        return path.rstrip(os.sep).count(os.sep) - self.root.rstrip(os.sep).count(os.sep)
+
+    def rebase(self, root):
+        """
+        Moves the root of the tree up to an ancestor of the directories, e.g.
+        to merge the trees of several roots, recomputing their depths.
+        """
+        self.root   = str(root)
+        self.depths = array('l', (self.depth(path) for path in self.paths))
+        self.totals = None
+
+    def intern(self, mimetype):
+        if mimetype not in self.mimeids:
+            self.mimeids[mimetype] = len(self.mimes)
+            self.mimes.append(mimetype)
+        return self.mimeids[mimetype]
+
+    def add(self, path, record):
+        """
+        Adds the directory with the local contribution of its DirRecord and
+        returns its id.
+        """
+        path   = str(path)
+        dirid  = len(self.paths)
+        parent = os.path.dirname(path)
+
+        # The file system root is its own dirname but never its own parent.
+        self.parents.append(self.index.get(parent, -1) if parent != path else -1)
+        self.index[path] = dirid
+        self.paths.append(path)
+        self.depths.append(self.depth(path))
+        self.files.append(record.nodes.get(FILE, 0))
+        self.bytes.append(sum(record.store.values()))
+
+        top = heapq.nlargest(TOPK, record.store.items(), key=lambda item: item[1])
+        top += [(None, 0)] * (TOPK - len(top))
+        for mimetype, size in top:
+            self.tops.append(self.intern(mimetype) if mimetype is not None else -1)
+            self.topbytes.append(size)
+
+        self.totals = None
+        return dirid
+
+    def rollup(self):
+        """
+        Computes the usage of every subtree by adding the directories to
+        their parents from the deepest level up, and buckets ids by depth.
+        """
+        if self.totals is not None:
+            return self.totals
+
+        levels = defaultdict(lambda: array('l'))
+        for dirid, depth in enumerate(self.depths):
+            levels[depth].append(dirid)
+
+            # Resolve the parents of the top level directories of shards.
+            if self.parents[dirid] < 0 and depth > 0:
+                parent = self.index.get(os.path.dirname(self.paths[dirid]), -1)
+                self.parents[dirid] = parent
+
+        files    = array('L', self.files)
+        sizes    = array('L', self.bytes)
+        tops     = array('l', self.tops)
+        topbytes = array('L', self.topbytes)
+
+        # Mimetype bytes the children added to the parents of this level
+        pending  = {}
+
+        for depth in sorted(levels, reverse=True):
+            for dirid in levels[depth]:
+                # The subtree is complete, store its top mimetypes.
+                subtree = pending.pop(dirid, {})
+                for idx in xrange(dirid * TOPK, (dirid + 1) * TOPK):
+                    mime = self.tops[idx]
+                    if mime >= 0:
+                        subtree[mime] = subtree.get(mime, 0) + self.topbytes[idx]
+
+                top = heapq.nlargest(TOPK, subtree.items(), key=lambda item: item[1])
+                top += [(-1, 0)] * (TOPK - len(top))
+                for idx, (mime, size) in enumerate(top):
+                    tops[dirid * TOPK + idx]     = mime
+                    topbytes[dirid * TOPK + idx] = size
+
+                parent = self.parents[dirid]
+                if parent >= 0:
+                    files[parent] += files[dirid]
+                    sizes[parent] += sizes[dirid]
+
+                    merged = pending.setdefault(parent, {})
+                    for mime, size in top:
+                        if mime >= 0:
+                            merged[mime] = merged.get(mime, 0) + size
+
+        # A plain dict of the levels keeps the rolled up tree picklable.
+        self.totals = (files, sizes, tops, topbytes, dict(levels))
+        return self.totals
+
+    def usage(self, dirid):
+        """
+        Returns the path, files, bytes and top mimetypes of the subtree.
+        """
+        files, sizes, tops, topbytes, _ = self.rollup()
+        top = zip(tops[dirid*TOPK:(dirid+1)*TOPK], topbytes[dirid*TOPK:(dirid+1)*TOPK])
+        return (
+            self.paths[dirid], files[dirid], sizes[dirid],
+            [(self.mimes[mime], size) for mime, size in top if mime >= 0],
+        )
+
+    def subtree(self, path):
+        """
+        Returns the usage of the subtree rooted at the directory path.
+        """
+        return self.usage(self.index[str(path)])
+
+    def biggest(self, depth=1, n=10):
+        """
+        Returns the usage of the n biggest subtrees (by bytes) at the depth.
+        """
+        _, sizes, _, _, levels = self.rollup()
+        dirids = heapq.nlargest(n, levels.get(depth, ()), key=sizes.__getitem__)
+        return [self.usage(dirid) for dirid in dirids]
+
+    def serialize(self):
+        return {
+            'root':     escape_path(self.root),
+            'mimes':    self.mimes,
+            'paths':    [escape_path(path) for path in self.paths],
+            'parents':  self.parents.tolist(),
+            'files':    self.files.tolist(),
+            'bytes':    self.bytes.tolist(),
+            'tops':     self.tops.tolist(),
+            'topbytes': self.topbytes.tolist(),
+        }
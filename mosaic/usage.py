@@ -17,15 +17,34 @@ Performs analysis of a file system usage.
 ## Imports
 ##########################################################################
 
+import os
+import sys
 import json
 import time
+import Queue
 import mosaic
+import threading
+import multiprocessing
 
 from datetime import datetime
 from collections import Counter
-from mosaic.path import Path, scan
+from mosaic import binary
+from mosaic.path import Path
+from mosaic.cache import MimeCache, CACHE_SIZE
+from mosaic.inodes import InodeSet
+from mosaic.histogram import SizeHistograms, AgeHistograms, DAY
+from mosaic.largest import Largest
+from mosaic.sampling import Sampler, TOTAL
+from mosaic.throttle import Throttle, UNTHROTTLED
+from mosaic.profiling import Profiler
+from mosaic.detect import HEADER_SIZE
+from mosaic.records import RecordWriter, truncate, spool
+from mosaic.tree import DirTree
+from mosaic.snapshot import Snapshot, DirRecord, load_snapshot
+from mosaic.classify import guess_type, UNKNOWN
+from mosaic.classify import STRATEGIES, MAGIC, EXTENSION, CACHE
 from mosaic.utils import MosaicEncoder
-from mosaic.utils import humanize_bytes
+from mosaic.utils import epochtime, humanize_bytes
 
 ##########################################################################
 ## Module Constants
@@ -43,32 +62,504 @@ LINK = "links"
 EMTY = "empty"
 UNKN = "unknown"
 
+# System calls counted by the analysis
+SCANDIR = "scandir"
+STAT    = "stat"
+READ    = "read"
+
+# Size of the blocks counted by st_blocks (see stat(2))
+BLOCK_SIZE = 512
+
+# Parallel backends
+THREAD  = "thread"
+PROCESS = "process"
+
+# Maximum number of directories a process scans before splitting its shard
+SHARD_SPLIT = 1000
+
+# Default seconds between checkpoints and seconds the workers wait on queues
+CHECKPOINT_INTERVAL = 300
+POLL = 0.1
+
+# Options (and their defaults) a snapshot is only reused with if they match
+SNAPSHOT_OPTIONS = (
+    ('include_hidden', False), ('strategy', MAGIC),
+    ('sample', None), ('seed', 0), ('stratified', False),
+)
+
+# Options that need every file, which reused directories do not replay
+PER_FILE_OPTIONS = ('largest', 'histograms', 'ages', 'sample')
+
+# Throttles of a worker process by their rates
+THROTTLES = {}
+
 
 ##########################################################################
 ## Sequential analysis
 ##########################################################################
 
-def analyze(root, include_hidden=False):
+def scan_directory(usage, dirpath, include_hidden=False):
     """
-    Sequential mimetype frequency and space consumption analysis
+    Updates the usage with every entry directly inside of the directory and
+    returns a list of the subdirectories that still have to be scanned.
+    Errors raised by listing the directory are left to the caller.
+
+    If the usage keeps a directory snapshot, the directory is stat'd first
+    and, when it is unchanged since the previous snapshot, the contribution
+    of its entries is reused and its subdirectories are taken from the
+    previous snapshot rather than listing and sniffing the directory again.
+
+    If the usage builds a directory tree, the local contribution of the
+    directory is added to it from its (possibly transient) record; so are
+    the bytes of the directory to the largest directories, if kept.
+    """
+    if usage.progress is not None:
+        usage.progress.scanned(dirpath)
+
+    record = None
+    if usage.snapshot is not None:
+        # Use lstat for sub-second times (scandir's stat truncates them).
+        with usage.io():
+            stat = os.lstat(str(dirpath))
+        usage.syscalls[STAT] += 1
+
+        if usage.previous is not None:
+            previous = usage.previous.get(dirpath)
+            if previous is not None and previous.unchanged(stat):
+                usage.reuse(dirpath, previous)
+                return [Path.literal(child) for child in usage.previous.children(dirpath)]
+
+        record = usage.snapshot.record(dirpath, stat)
+        usage.incremental['rescanned'] += 1
+
+    elif usage.tree is not None or usage.largest is not None or usage.stratified:
+        record = DirRecord(None, None)
+
+    if usage.sampler is not None:
+        usage.sampler.enter(dirpath)
+
+    # Listings are charged as one operation but not timed (they are lazy).
+    if usage.throttle is not None:
+        usage.throttle.acquire()
+    usage.syscalls[SCANDIR] += 1
+
+    # The profiler times the listing and the loop over it as it is iterated.
+    paths   = dirpath.list() if usage.profiler is None else usage.profiler.list(dirpath)
+    subdirs = []
+    for path in paths:
+        if not include_hidden and path.is_hidden():
+            continue
+
+        try:
+            usage.update(path, record)
+        except EnvironmentError:
+            continue
+
+        if path.is_dir():
+            subdirs.append(path)
+
+    if usage.tree is not None:
+        usage.tree.add(dirpath, record)
+
+    if usage.largest is not None:
+        usage.largest.directory(dirpath, sum(record.store.values()))
+
+    if usage.stratified:
+        usage.sampler.directory(record)
+
+    return subdirs
+
+
+def analyze(root, include_hidden=False, workers=None, backend=THREAD, progress=None,
+            restored=None, **options):
+    """
+    Sequential mimetype frequency and space consumption analysis. If more
+    than one worker is specified, the analysis is handed off to either the
+    multi-threaded traversal engine or the process pool, depending on the
+    backend that is passed in. Any other options are passed through to the
+    FileUsage; a resumed analysis passes the data of its checkpoint as
+    restored, and a Progress passed in reports while the analysis runs.
     """
 
     root  = Path(root)  # pathify the root path.
-    usage = FileUsage(root, include_hidden=include_hidden)
 
     if not root.is_dir():
         raise TypeError("The root path must be a directory.")
 
+    if options.get('incremental'):
+        for key in PER_FILE_OPTIONS:
+            if options.get(key):
+                raise ValueError(
+                    "The {} option cannot be combined with an incremental analysis"
+                    .format(key)
+                )
+
+    # Every shard measures the ages of files against the same time.
+    if options.get('ages'):
+        options.setdefault('now', time.time())
+
+    # Records of a resumed analysis are appended to those of the checkpoint.
+    if options.get('records') and not options.get('resume'):
+        truncate(options['records'])
+
+    if workers is not None and workers > 1:
+        if backend == PROCESS:
+            usage = process_analyze(
+                root, include_hidden, workers, progress=progress, restored=restored, **options
+            )
+        elif backend == THREAD:
+            usage = threaded_analyze(
+                root, include_hidden, workers, progress=progress, restored=restored, **options
+            )
+        else:
+            raise ValueError("Unknown analysis backend '{}'".format(backend))
+
+    else:
+        usage = FileUsage(root, include_hidden=include_hidden, **options)
+        if progress is not None:
+            usage.progress = progress.start(root)
+            progress.track(usage)
+
+        frontier = begin(usage, root, include_hidden, restored)
+        scan_frontier(usage, frontier, include_hidden)
+        usage.finish()
+
+        if progress is not None:
+            progress.finish()
+
+    # The shards only flush the mimetype cache, it is evicted once if it grew.
+    if usage.mimecache is not None and usage.cache['misses']:
+        usage.mimecache.evict()
+        usage.mimecache.close()
+
+    return usage
+
+
+def resume(checkpoint, workers=None, backend=THREAD, progress=None):
+    """
+    Resumes the analysis saved to the checkpoint path with its root and
+    options, only scanning the directories that were pending.
+    """
+    with open(checkpoint, 'rb') as f:
+        data = binary.load(f)
+
+    if 'frontier' not in data:
+        raise ValueError("{} is not a checkpoint of an analysis".format(checkpoint))
+
+    options = dict(data['options'])
+    include_hidden = options.pop('include_hidden', False)
+    for key in ('workers', 'backend', 'resume'):
+        options.pop(key, None)
+
+    return analyze(
+        Path.literal(data['root']), include_hidden, workers, backend, progress=progress,
+        restored=data, resume=checkpoint, **options
+    )
+
+
+def begin(usage, root, include_hidden=False, restored=None):
+    """
+    Starts the analysis tracked by the usage and returns the directories to
+    scan: the subdirectories of the root, which is scanned in the calling
+    thread so top level errors are raised, or the frontier of the checkpoint
+    named by the resume option (or already restored), whose partial usage
+    is restored.
+    """
+    if usage.options.get('resume'):
+        return usage.restore(usage.options['resume'], restored)
+
     usage.start()
-    for path in scan(root, include_hidden):
+    return scan_directory(usage, root, include_hidden)
+
+
+def scan_tree(usage, root, include_hidden=False):
+    """
+    Updates the usage with the entire tree below the root directory.
+    """
+    subdirs = scan_directory(usage, root, include_hidden)
+    scan_frontier(usage, subdirs, include_hidden)
+
+
+def scan_frontier(usage, frontier, include_hidden=False):
+    """
+    Updates the usage with the trees below the directories of the frontier
+    using a depth first traversal with an explicit stack of directories,
+    checkpointing the stack when a checkpoint is due.
+    """
+    stack = list(reversed(frontier))
+    if usage.progress is not None:
+        usage.progress.pending = stack.__len__
+
+    while stack:
+        if usage.due():
+            usage.checkpoint(reversed(stack))
+
+        dirpath = stack.pop()
 
         try:
-            usage.update(path)
-        except OSError:
-            print str(e)
+            subdirs = scan_directory(usage, dirpath, include_hidden)
+        except EnvironmentError:
+            # Ignore errors on subdirectories, the root was already scanned.
             continue
 
+        stack.extend(reversed(subdirs))
+
+
+##########################################################################
+## Parallel analysis
+##########################################################################
+
+def threaded_analyze(root, include_hidden=False, workers=4, progress=None, restored=None,
+                     **options):
+    """
+    Multi-threaded analysis backed by a work queue of directories. Each
+    worker pulls a directory from the queue, counts its entries into its own
+    FileUsage and pushes the subdirectories it finds back onto the queue.
+    The per-worker usages are merged when the queue has been exhausted.
+
+    Workers hold a lock while they take and scan a directory, so that to
+    checkpoint, the main thread takes every lock and saves the queued
+    directories with the merged usages of a consistent moment.
+
+    Errors other than I/O errors on subdirectories stop the workers and are
+    raised again in the calling thread.
+    """
+
+    root  = Path(root)  # pathify the root path.
+    options['include_hidden'] = include_hidden
+    if options.get('ages'):
+        options.setdefault('now', time.time())
+    if options.get('sample'):
+        options.setdefault('sample_root', str(root))
+    usage = FileUsage(root, workers=workers, **options)
+    queue = Queue.Queue()
+    errors = []
+
+    if progress is not None:
+        usage.progress = progress.start(root, queue.qsize)
+        progress.track(usage)
+
+    if not root.is_dir():
+        raise TypeError("The root path must be a directory.")
+
+    def work(shard, lock):
+        shard.start()
+        while True:
+            with lock:
+                try:
+                    dirpath = queue.get(timeout=POLL)
+                except Queue.Empty:
+                    continue
+
+                try:
+                    if dirpath is None or errors: return shard.finish()
+                    for subdir in scan_directory(shard, dirpath, include_hidden):
+                        queue.put(subdir)
+                except EnvironmentError:
+                    # Ignore errors on subdirectories like the sequential scan.
+                    continue
+                except Exception:
+                    # Hand any other error to the main thread to raise.
+                    errors.append(sys.exc_info())
+                    return
+                finally:
+                    queue.task_done()
+
+    for subdir in begin(usage, root, include_hidden, restored):
+        queue.put(subdir)
+
+    shards  = [FileUsage(root, **options) for _ in range(workers)]
+    locks   = [threading.Lock() for _ in range(workers)]
+
+    # Share the hard link inodes so that each is counted by one worker only,
+    # and the throttle so that the workers share its rates (and the progress).
+    for shard in shards:
+        shard.inodes   = usage.inodes
+        shard.throttle = usage.throttle
+        shard.progress = usage.progress
+
+    if progress is not None:
+        progress.track(*shards)
+
+    threads = [
+        threading.Thread(target=work, args=args) for args in zip(shards, locks)
+    ]
+
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    # Wait for the queue to drain (or a worker to fail), checkpointing while it does.
+    while not errors:
+        with queue.all_tasks_done:
+            if not queue.unfinished_tasks: break
+            queue.all_tasks_done.wait(POLL)
+
+        if usage.due():
+            for lock in locks: lock.acquire()
+            try:
+                with queue.mutex:
+                    frontier = list(queue.queue)
+                usage.checkpoint(frontier, *shards)
+            finally:
+                for lock in locks: lock.release()
+
+    # Signal the workers to stop.
+    for thread in threads:
+        queue.put(None)
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        exc_type, exc_value, exc_tb = errors[0]
+        raise exc_type, exc_value, exc_tb
+
+    # Report before the shards are merged, while their counts are separate.
+    if progress is not None:
+        progress.finish()
+
+    for shard in shards:
+        usage += shard
+
+    usage.finish()
+    return usage
+
+
+def analyze_shard(dirpath, options, split=SHARD_SPLIT):
+    """
+    Process pool worker that scans the subtree rooted at the directory path.
+    Once split directories have been scanned the directories still on the
+    stack are handed back to the parent to be distributed to other workers,
+    so big subtrees found along the way do not serialize the analysis.
+    Returns the serialized usage of the shard, the unscanned directories
+    and, when checkpointing, the file its records were spooled to, which
+    the parent appends when it merges the shard so that checkpoints never
+    hold records of shards that are still pending.
+    """
+    include_hidden = options.get('include_hidden', False)
+    usage = FileUsage(Path.literal(dirpath), **options)
+    stack = [usage.root]
+
+    # Keep the hard links the shard counted so the parent can dedup them.
+    if usage.inodes is not None:
+        usage.linked = []
+
+    # Spool the records of the shard for the parent to append (if checkpointing).
+    spooled = None
+    if usage.records is not None and options.get('checkpoint'):
+        spooled = spool(usage.records.path)
+        usage.records = RecordWriter(spooled)
+
+    # Keep one throttle per worker process, rather than a full burst per shard.
+    if usage.throttle is not None:
+        key = tuple(options.get(name) for name in ('max_iops', 'max_read_bps', 'adaptive'))
+        usage.throttle = THROTTLES.setdefault(key, usage.throttle)
+
+    try:
+        usage.start()
+        while stack and split > 0:
+            dirpath = stack.pop()
+            split  -= 1
+
+            try:
+                stack.extend(scan_directory(usage, dirpath, include_hidden))
+            except EnvironmentError:
+                continue
+
+        usage.finish()
+    except:
+        if spooled is not None:
+            os.remove(spooled)
+        raise
+
+    return usage.serialize(), [str(subdir) for subdir in stack], spooled
+
+
+def process_analyze(root, include_hidden=False, workers=4, split=SHARD_SPLIT,
+                    progress=None, restored=None, **options):
+    """
+    Multi-process analysis that shards the top level subtrees of the root
+    across a pool of worker processes. Each worker sends back a serialized
+    FileUsage (and any subtrees too big to finish) and the parent merges them.
+    Checkpoints save the merged usage with the shards that are still out.
+
+    Progress is counted by the parent as shards come back, so the pending
+    directories it reports are the shards that are still out.
+    """
+
+    root  = Path(root)  # pathify the root path.
+    options['include_hidden'] = include_hidden
+    if options.get('ages'):
+        options.setdefault('now', time.time())
+    if options.get('sample'):
+        options.setdefault('sample_root', str(root))
+    usage = FileUsage(root, workers=workers, backend=PROCESS, **options)
+
+    if not root.is_dir():
+        raise TypeError("The root path must be a directory.")
+
+    results = Queue.Queue()
+    pending = Counter()
+    tasks   = []
+
+    if progress is not None:
+        usage.progress = progress.start(root, lambda: sum(pending.values()))
+        progress.track(usage)
+
+    # Every worker process throttles itself to an equal share of the rates.
+    shard_options = dict(options)
+    for key in ('max_iops', 'max_read_bps'):
+        if shard_options.get(key):
+            shard_options[key] = shard_options[key] / float(workers)
+
+    def submit(dirpath):
+        pending[str(dirpath)] += 1
+        tasks.append(pool.apply_async(
+            analyze_shard, (str(dirpath), shard_options, split), callback=results.put
+        ))
+
+    shards = begin(usage, root, include_hidden, restored)
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        for shard in shards:
+            submit(shard)
+
+        while sum(pending.values()) > 0:
+            if usage.due():
+                usage.checkpoint(pending.elements())
+
+            try:
+                data, frontier, spooled = results.get(timeout=1)
+            except Queue.Empty:
+                # Raise the exception of any shard that failed in the pool.
+                for task in tasks:
+                    if task.ready() and not task.successful():
+                        task.get()
+                tasks[:] = [task for task in tasks if not task.ready()]
+                continue
+
+            usage += FileUsage.deserialize(data)
+            pending[str(data['root'])] -= 1
+            if spooled is not None:
+                usage.records.append(spooled)
+
+            if progress is not None:
+                progress.scanned(data['root'], data['syscalls'].get(SCANDIR, 0))
+
+            for shard in frontier:
+                submit(shard)
+
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
     usage.finish()
+    if progress is not None:
+        progress.finish()
     return usage
 
 
@@ -76,29 +567,112 @@ def analyze(root, include_hidden=False):
 ## File Usage Data Structure
 ##########################################################################
 
+def utctime(timestamp):
+    """
+    Converts an epoch timestamp to a datetime, passing through None.
+    """
+    if timestamp is None: return None
+    return datetime.utcfromtimestamp(timestamp)
+
+
 class FileUsage(object):
     """
     Basically a wrapper for a series of counter objects, this class
     provides an on update method of tracking the statistics that we're
     looking for, as well as combining them in a meaningful way.
+
+    The keyword options enable the optional collectors and limits of the
+    analysis; each is described where it is handled in the constructor.
     """
 
+    # Names of the counters that are merged, serialized and loaded.
+    COUNTERS = (
+        'nodes', 'mimes', 'store', 'allocated', 'unique', 'hardlinks', 'cache',
+        'tiers', 'syscalls', 'incremental',
+    )
+
     @classmethod
     def load(klass, fobj):
         """
-        Loads a FileUsage data structure from a file-like object.
+        Loads a FileUsage data structure from a file-like object with either
+        a JSON or a binary dump, detected by the magic bytes of the latter.
+        """
+        return klass.deserialize(binary.load(fobj))
+
+    @classmethod
+    def deserialize(klass, data):
+        """
+        Creates a FileUsage data structure from the dictionary returned by the
+        serialize method (or its JSON representation).
         """
-        data  = json.load(fobj)
-        usage = klass(data['root'], **data['options'])
+        usage = klass(Path.literal(data['root']), **data['options'])
 
         # Update the counters
-        for key in ('nodes', 'mimes', 'store'):
+        for key in klass.COUNTERS:
             hist = getattr(usage, key)
-            hist.update(data[key])
+            hist.update(data.get(key, {}))
+
+        # Update the hard links counted by a shard
+        if data.get('linked') is not None:
+            usage.linked = [tuple(link) for link in data['linked']]
+
+        # Update the size histograms
+        if data.get('histograms') is not None:
+            histograms = data['histograms']
+            if not isinstance(histograms, SizeHistograms):
+                histograms = SizeHistograms.deserialize(histograms)
+            usage.histograms = histograms
+
+        # Update the largest files and directories
+        if data.get('largest') is not None:
+            largest = data['largest']
+            if not isinstance(largest, Largest):
+                largest = Largest.deserialize(largest)
+            usage.largest = largest
+
+        # Update the sums of the sample
+        if data.get('sample') is not None:
+            sampler = data['sample']
+            if not isinstance(sampler, Sampler):
+                sampler = Sampler.deserialize(sampler)
+            usage.sampler = sampler
+
+        # Update the age histograms
+        if data.get('ages') is not None:
+            ages = data['ages']
+            if not isinstance(ages, AgeHistograms):
+                ages = AgeHistograms.deserialize(ages)
+            usage.ages = ages
+
+        # Update the provenance of merged usages
+        if data.get('sources') is not None:
+            usage.sources = list(data['sources'])
+
+        # Update the directory tree
+        if data.get('tree') is not None:
+            tree = data['tree']
+            if not isinstance(tree, DirTree):
+                tree = DirTree.deserialize(tree)
+            usage.tree = tree
+
+        # Update the directory snapshot
+        if data.get('dirs') is not None:
+            dirs = data['dirs']
+            if not isinstance(dirs, Snapshot):
+                dirs = Snapshot.deserialize(dirs)
+            usage.snapshot = dirs
 
         # Update the analysis metrics
-        for key in ('started', 'finished', 'elapsed'):
-            setattr(usage, key, data['timer'][key])
+        for key in ('started', 'finished'):
+            setattr(usage, key, epochtime(data['timer'][key]))
+        usage.elapsed = data['timer']['elapsed']
+
+        # Update the phases of the profiled scan loop
+        if data['timer'].get('profile') is not None:
+            profiler = data['timer']['profile']
+            if not isinstance(profiler, Profiler):
+                profiler = Profiler.deserialize(profiler)
+            usage.profiler = profiler
 
         # Update the analysis status
         if usage.finished is not None:
@@ -117,6 +691,92 @@ class FileUsage(object):
         self.nodes = Counter()
         self.mimes = Counter()
         self.store = Counter()
+        self.allocated = Counter()
+        self.unique = Counter()
+        self.hardlinks = Counter()
+        self.cache = Counter()
+        self.tiers = Counter()
+        self.syscalls = Counter()
+        self.incremental = Counter()
+
+        # Per-directory snapshot and the previous one, loaded when needed from
+        # the incremental dump, whose unchanged directories are reused.
+        self.snapshot  = None
+        self._previous = None
+        if kwargs.get('snapshot') or kwargs.get('incremental'):
+            self.snapshot = Snapshot()
+
+        # Mimetype classification strategy: content sniffing (magic), the
+        # extension only or the extension with sniffing of unknown ones
+        # (hybrid); the tiers counter tracks which tier resolved each file.
+        self.strategy = kwargs.get('strategy', MAGIC)
+        if self.strategy not in STRATEGIES:
+            raise ValueError("Unknown classification strategy '{}'".format(self.strategy))
+
+        # Persistent mimetype cache (opened lazily when first used)
+        self.mimecache = None
+        if kwargs.get('cache'):
+            self.mimecache = MimeCache(
+                kwargs['cache'], kwargs.get('cache_size', CACHE_SIZE)
+            )
+
+        # Per-directory usage tree, rolling subtrees up to their ancestors
+        self.tree = DirTree(self.root) if kwargs.get('tree') else None
+
+        # Log2 size distributions of every mimetype (requires NumPy) and the
+        # (age by size) distributions by modification and access time, with
+        # ages relative to the now option that every shard shares.
+        self.histograms = SizeHistograms() if kwargs.get('histograms') else None
+        self.ages = AgeHistograms(kwargs.get('now')) if kwargs.get('ages') else None
+
+        # Reproducible sample of the files (or stratified, of directories)
+        # that are classified and stat'd, by their paths relative to the root
+        # of the analysis (sample_root for shards); estimate extrapolates it.
+        self.sampler = None
+        if kwargs.get('sample'):
+            self.sampler = Sampler(
+                kwargs['sample'], kwargs.get('seed', 0), kwargs.get('stratified', False),
+                kwargs.get('sample_root', self.root)
+            )
+
+        # Rate limits of the I/O of the analysis (shared by thread shards);
+        # adaptive throttles also back off when the latency of the I/O rises.
+        self.throttle = None
+        if kwargs.get('max_iops') or kwargs.get('max_read_bps'):
+            self.throttle = Throttle(
+                kwargs.get('max_iops'), kwargs.get('max_read_bps'), kwargs.get('adaptive', False)
+            )
+        elif kwargs.get('adaptive'):
+            raise ValueError("Adaptive throttling requires a maximum of operations or bytes per second")
+
+        # Cumulative timing and latencies of the phases of the scan loop
+        self.profiler = Profiler() if kwargs.get('profile') else None
+
+        # Periodic progress reports of the analysis (not serialized)
+        self.progress = None
+
+        # Bounded heaps of the largest files (globally and by mimetype) and
+        # directories (by their own bytes or, with a tree, their subtrees)
+        self.largest = Largest(kwargs['largest']) if kwargs.get('largest') else None
+
+        # Seen hard links and, for shards, the links counted as unique. Links
+        # are counted in the store every time but only once in unique; the
+        # seen inodes are not dumped, so resumed or reused directories are
+        # not deduplicated against the links that were counted before.
+        self.inodes = InodeSet() if kwargs.get('hardlinks') else None
+        self.linked = None
+
+        # Streaming per-node records (the file is opened on the first write);
+        # the entries of reused directories are not recorded.
+        self.records = None
+        if kwargs.get('records'):
+            self.records = RecordWriter(kwargs['records'])
+
+        # Time of the last checkpoint (if checkpointing)
+        self.checkpointed = None
+
+        # Provenance of the roots of a usage merged from dumps (mosaic.merge)
+        self.sources = None
 
         # Analysis metrics
         self.started  = None
@@ -124,6 +784,7 @@ class FileUsage(object):
         self.elapsed  = None
         self.status   = AWAITING
         self.options  = kwargs
+        self.version  = mosaic.get_version()
 
     def __iadd__(self, other):
         """
@@ -133,21 +794,193 @@ class FileUsage(object):
             >>> usage += other
 
         Not regular addition does not make sense because of the state tracking.
+        The merged analysis spans the earliest start to the latest finish and
+        is only finished if both analyses are; an awaiting usage is empty.
         """
-        self.nodes += other.nodes
-        self.mimes += other.mimes
-        self.store += other.store
+        # Counter.update adds counts and unlike += keeps zero byte mimetypes.
+        for key in self.COUNTERS:
+            getattr(self, key).update(getattr(other, key))
+
+        # Dedup the hard links the other usage counted against our own.
+        if self.inodes is not None and other.linked:
+            for dev, ino, mimetype, size in other.linked:
+                if self.inodes.add(dev, ino):
+                    if self.linked is not None:
+                        self.linked.append((dev, ino, mimetype, size))
+                else:
+                    self.unique[mimetype] -= size
+                    self.hardlinks['duplicates'] += 1
+
+        if other.histograms is not None:
+            if self.histograms is None:
+                self.histograms = SizeHistograms()
+            self.histograms += other.histograms
+
+        if other.sampler is not None:
+            if self.sampler is None:
+                self.sampler = Sampler(
+                    other.sampler.rate, other.sampler.seed, other.sampler.stratified,
+                    other.sampler.root
+                )
+            self.sampler += other.sampler
+
+        if other.largest is not None:
+            if self.largest is None:
+                self.largest = Largest(other.largest.n)
+            self.largest += other.largest
+
+        if other.ages is not None:
+            if self.ages is None:
+                self.ages = AgeHistograms(other.ages.now)
+            self.ages += other.ages
+
+        if other.profiler is not None:
+            if self.profiler is None:
+                self.profiler = Profiler()
+            self.profiler += other.profiler
+
+        if other.sources is not None:
+            if self.sources is None:
+                self.sources = []
+            self.sources.extend(other.sources)
+
+        if other.snapshot is not None:
+            if self.snapshot is None:
+                self.snapshot = Snapshot()
+            self.snapshot += other.snapshot
+
+        if other.tree is not None:
+            if self.tree is None:
+                self.tree = DirTree(self.root)
+            self.tree += other.tree
+
+        # Merge the analysis metrics
+        if self.status == AWAITING:
+            self.started  = other.started
+            self.finished = other.finished
+            self.elapsed  = other.elapsed
+            self.status   = other.status
+
+        elif other.status != AWAITING:
+            self.started = min(self.started, other.started)
+
+            if self.status == FINISHED and other.status == FINISHED:
+                self.finished = max(self.finished, other.finished)
+                self.elapsed  = self.finished - self.started
+            else:
+                self.finished = None
+                self.elapsed  = None
+                self.status   = UNDERWAY
+
+        return self
 
     def __str__(self):
         """
         Reports the usage and status of the analysis.
         """
         if self.status == FINISHED:
-            return (
+            output = (
                 "Discovered {:,d} files, {:,d} symlinks, and {:,d} directories in {:0.3f} seconds"
                 .format(self.nodes[FILE], self.nodes[LINK], self.nodes[DIRS], self.elapsed)
             )
 
+            if self.strategy != MAGIC or self.cache:
+                output += "\nClassified " + ", ".join(
+                    "{:0.1%} by {}".format(fraction, tier)
+                    for tier, fraction in sorted(self.classified.items())
+                )
+
+            if self.cache:
+                output += (
+                    "\nMimetype cache: {:,d} hits and {:,d} misses"
+                    .format(self.cache['hits'], self.cache['misses'])
+                )
+
+            output += (
+                "\nStorage: {} apparent and {} allocated ({:0.1%})"
+                .format(
+                    humanize_bytes(self.size), humanize_bytes(self.allocated_size),
+                    self.allocated_size / float(self.size) if self.size else 1.0,
+                )
+            )
+
+            if self.inodes is not None:
+                output += (
+                    "\nHard links: {:,d} linked files, {:,d} duplicates; {} apparent and {} unique"
+                    .format(
+                        self.hardlinks['linked'], self.hardlinks['duplicates'],
+                        humanize_bytes(self.size), humanize_bytes(self.unique_size),
+                    )
+                )
+
+            if self.incremental:
+                output += (
+                    "\nIncremental: reused {:,d} and rescanned {:,d} directories"
+                    .format(self.incremental['reused'], self.incremental['rescanned'])
+                )
+
+            output += (
+                "\nSystem calls: {:,d} scandir, {:,d} stat and {:,d} read"
+                .format(self.syscalls[SCANDIR], self.syscalls[STAT], self.syscalls[READ])
+            )
+
+            if self.profiler is not None:
+                output += "\nProfile:"
+                for name, phase in sorted(
+                    self.profiler.phases.items(), key=lambda item: item[1].seconds, reverse=True
+                ):
+                    output += "\n  {}: {:0.3f} seconds in {:,d} calls".format(
+                        name, phase.seconds, phase.calls
+                    )
+                    if phase.latencies:
+                        output += " (p50 {:0.1f}us, p99 {:0.1f}us)".format(
+                            phase.percentile(50) * 1e6, phase.percentile(99) * 1e6
+                        )
+
+            if self.ages is not None:
+                cold = self.ages.older(365 * DAY).values()
+                output += (
+                    "\nCold data: {} in {:,d} files not accessed for a year"
+                    .format(
+                        humanize_bytes(sum(nbytes for _, nbytes in cold)),
+                        sum(files for files, _ in cold),
+                    )
+                )
+
+            if self.sampler is not None:
+                total = self.estimate()[TOTAL]
+                output += (
+                    "\nEstimated from a {:0.2%} sample: {} ({} to {}) in {:,.0f} files ({:,.0f} to {:,.0f})"
+                    .format(
+                        self.sampler.rate,
+                        *[humanize_bytes(int(value)) for value in total['bytes']] +
+                        list(total['files'])
+                    )
+                )
+
+            if self.largest is not None:
+                output += "\nLargest files:"
+                for path, size in self.largest.files.items()[:5]:
+                    output += "\n  {}: {}".format(path, humanize_bytes(size))
+
+            if self.sources is not None:
+                output += (
+                    "\nMerged {:,d} roots from {:,d} dumps"
+                    .format(len(set(source['root'] for source in self.sources)), len(self.sources))
+                )
+
+            if self.tree is not None:
+                output += "\nBiggest subtrees:"
+                for path, files, size, mimes in self.tree.biggest(1, 5):
+                    output += (
+                        "\n  {}: {} in {:,d} files ({})"
+                        .format(path, humanize_bytes(size), files, ", ".join(
+                            mimetype for mimetype, _ in mimes
+                        ))
+                    )
+
+            return output
+
         return  "Performing analysis of {}".format(self.root)
 
     @property
@@ -157,6 +990,31 @@ class FileUsage(object):
         """
         return sum(val for val in self.store.values())
 
+    @property
+    def allocated_size(self):
+        """
+        Computes the allocated size (in bytes, from st_blocks) of the usage.
+        """
+        return sum(val for val in self.allocated.values())
+
+    @property
+    def sparseness(self):
+        """
+        Computes the ratio of allocated to apparent bytes of each mimetype:
+        below 1 for sparse files, above 1 for small files on large blocks.
+        """
+        return dict(
+            (mimetype, self.allocated[mimetype] / float(size))
+            for mimetype, size in self.store.items() if size > 0
+        )
+
+    @property
+    def unique_size(self):
+        """
+        Computes the size (in bytes) of the usage counting hard links once.
+        """
+        return sum(val for val in self.unique.values())
+
     @property
     def items(self):
         """
@@ -164,6 +1022,41 @@ class FileUsage(object):
         """
         return sum(val for val in self.nodes.values())
 
+    @property
+    def stratified(self):
+        """
+        If the files of the analysis are sampled by directory.
+        """
+        return self.sampler is not None and self.sampler.stratified
+
+    @property
+    def previous(self):
+        """
+        The directory snapshot of the previous analysis (if incremental).
+        """
+        if self._previous is None and self.options.get('incremental'):
+            root, options, snapshot = load_snapshot(self.options['incremental'])
+
+            # Local contributions are only comparable with the same options,
+            # including the sample (a sampled record only counts its sample).
+            for key, default in SNAPSHOT_OPTIONS:
+                if options.get(key, default) != self.options.get(key, default):
+                    raise ValueError(
+                        "Cannot reuse a snapshot made with a different {} option"
+                        .format(key)
+                    )
+
+            self._previous = snapshot
+        return self._previous
+
+    @property
+    def classified(self):
+        """
+        Computes the fraction of files resolved by each classification tier.
+        """
+        total = float(sum(self.tiers.values()))
+        return dict((tier, count / total) for tier, count in self.tiers.items())
+
     @property
     def types(self):
         """
@@ -177,6 +1070,7 @@ class FileUsage(object):
         """
         self.started = time.time()
         self.status  = UNDERWAY
+        self.checkpointed = self.started
 
     def finish(self):
         """
@@ -186,53 +1080,427 @@ class FileUsage(object):
         self.finished = time.time()
         self.elapsed  = self.finished - self.started
 
-    def update(self, path):
+        if self.mimecache is not None:
+            self.mimecache.close()
+
+        if self.records is not None:
+            self.records.close()
+
+    def due(self):
+        """
+        Returns True if the checkpoint option is set and its interval passed.
+        """
+        if not self.options.get('checkpoint') or self.checkpointed is None:
+            return False
+
+        interval = self.options.get('checkpoint_interval', CHECKPOINT_INTERVAL)
+        return time.time() - self.checkpointed >= interval
+
+    def checkpoint(self, frontier, *shards):
+        """
+        Saves the usage, merged with the usages of any shards that are still
+        underway, along with the frontier of directories pending a scan and
+        the size of the records file (once their records are written) to
+        the checkpoint path.
+        """
+        usage = self
+        if shards:
+            usage = FileUsage(self.root, **self.options)
+            for other in (self,) + shards:
+                usage += other
+
+        records = None
+        if self.records is not None:
+            for other in (self,) + shards:
+                other.records.flush()
+            path = self.records.path
+            records = os.path.getsize(path) if os.path.exists(path) else 0
+
+        usage.save(
+            self.options['checkpoint'], frontier, self.options.get('format', binary.JSON),
+            records=records,
+        )
+        self.checkpointed = time.time()
+
+    def restore(self, path, data=None):
         """
-        Updates the counters and usage statistics for a given path.
+        Adds the partial usage of the checkpoint at the path (or its data, if
+        it was already loaded) to this (not yet started) usage, cuts the
+        records back to the checkpoint and returns the frontier of pending
+        directories.
         """
+        if data is None:
+            with open(path, 'rb') as f:
+                data = binary.load(f)
+
+        if 'frontier' not in data:
+            raise ValueError("{} is not a checkpoint of an analysis".format(path))
+
+        if Path.literal(data['root']) != self.root:
+            raise ValueError(
+                "Cannot resume the analysis of {} from a checkpoint of {}"
+                .format(self.root, data['root'])
+            )
+
+        if self.records is not None:
+            truncate(self.records.path, data.get('records_size') or 0)
+
+        self += FileUsage.deserialize(data)
+        self.checkpointed = time.time()
+        return [Path.literal(dirpath) for dirpath in data['frontier']]
+
+    def classify(self, path):
+        """
+        Returns the mimetype of a file path according to the strategy. The
+        extension tier never opens the file; the hybrid strategy only falls
+        back to sniffing for unknown or ambiguous extensions.
+        """
+        if self.strategy != MAGIC:
+            mimetype = guess_type(path, ambiguous=self.strategy == EXTENSION)
+            if mimetype is not None:
+                self.tiers[EXTENSION] += 1
+                return mimetype
+
+            if self.strategy == EXTENSION:
+                self.tiers[EXTENSION] += 1
+                return UNKNOWN
+
+        return self.sniff(path)
+
+    def sniff(self, path):
+        """
+        Returns the mimetype of a file path from its contents, consulting the
+        mimetype cache (if any) so that only files whose metadata changed are
+        sniffed.
+        """
+        if self.mimecache is not None:
+            mimetype = self.mimecache.get(path.stat)
+            if mimetype is not None:
+                self.cache['hits'] += 1
+                self.tiers[CACHE]  += 1
+                return mimetype
+            self.cache['misses'] += 1
+
+        with self.io(nbytes=min(path.filesize, HEADER_SIZE)):
+            if self.profiler is None:
+                mimetype = path.mimetype
+            else:
+                with self.profiler.magic:
+                    mimetype = path.mimetype
+        self.tiers[MAGIC] += 1
+        self.syscalls[READ] += 1
+
+        if self.mimecache is not None:
+            self.mimecache.put(path.stat, mimetype)
+        return mimetype
+
+    def reuse(self, path, record):
+        """
+        Adds the local contribution of an unchanged directory from the
+        previous snapshot rather than scanning it again.
+        """
+        self.nodes.update(record.nodes)
+        self.mimes.update(record.mimes)
+        self.store.update(record.store)
+        self.allocated.update(record.alloc)
+
+        if self.inodes is not None:
+            self.unique.update(record.store)
+
+        if self.tree is not None:
+            self.tree.add(path, record)
+
+        if self.largest is not None:
+            self.largest.directory(path, sum(record.store.values()))
+
+        self.snapshot.records[str(path)] = record
+        self.incremental['reused'] += 1
+
+    def subtract(self, record):
+        """
+        Subtracts the local contribution of a directory record.
+        """
+        self.nodes.subtract(record.nodes)
+        self.mimes.subtract(record.mimes)
+        self.store.subtract(record.store)
+        self.allocated.subtract(record.alloc)
+
+        if self.inodes is not None:
+            self.unique.subtract(record.store)
+
+        # Drop the keys that no longer occur, as a fresh analysis would.
+        for node, count in self.nodes.items():
+            if count <= 0: del self.nodes[node]
+
+        for mimetype, count in self.mimes.items():
+            if count <= 0:
+                del self.mimes[mimetype]
+                self.store.pop(mimetype, None)
+                self.allocated.pop(mimetype, None)
+                self.unique.pop(mimetype, None)
+
+    def discard(self, path):
+        """
+        Removes a directory and all of its subdirectories from the snapshot,
+        subtracting their local contributions, e.g. when it has been deleted.
+        Returns the paths of the directories that were discarded.
+        """
+        removed = self.snapshot.remove(path)
+        for record in removed.values():
+            self.subtract(record)
+        return list(removed.keys())
+
+    def update(self, path, record=None):
+        """
+        Updates the counters and usage statistics for a given path. Scanned
+        nodes know their type from the directory entry, so only files are
+        stat'd (for their size) and directories and symlinks cost nothing.
+        If the directory record of the parent is passed in, the path is
+        added to its local contribution as well.
+        """
+        mimetype  = None
+        filesize  = 0
+        allocated = 0
+
+        # Files outside of the sample are only seen as directory entries.
+        if self.sampler is not None and path.is_file() and not self.sampler.selects(path):
+            return
+
         # Update the node types
         if path.is_dir():
-            self.nodes[DIRS] += 1
+            node = DIRS
 
         elif path.is_empty():
-            self.nodes[EMTY] += 1
+            node = EMTY
 
         elif path.is_file():
-            self.nodes[FILE] += 1
+            node = FILE
+
+            # Update the mimetype and storage (stat first so it is throttled)
+            with self.io():
+                if self.profiler is None:
+                    stat = path.stat
+                else:
+                    with self.profiler.stat:
+                        stat = path.stat
+
+            mimetype  = self.classify(path)
+            filesize  = stat.st_size
+            allocated = stat.st_blocks * BLOCK_SIZE
+            self.mimes[mimetype] += 1
+            self.store[mimetype] += filesize
+            self.allocated[mimetype] += allocated
+            self.syscalls[STAT]  += 1
+
+            if self.inodes is not None:
+                self.unique[mimetype] += self.deduplicate(path, mimetype, filesize)
+
+            if self.histograms is not None:
+                self.histograms.add(mimetype, filesize)
 
-            # Update the mimetype and storage
-            self.mimes[path.mimetype] += 1
-            self.store[path.mimetype] += path.filesize
+            if self.largest is not None:
+                self.largest.file(path, mimetype, filesize)
+
+            if self.sampler is not None:
+                self.sampler.file(mimetype, filesize)
+
+            if self.ages is not None:
+                self.ages.add(mimetype, filesize, stat.st_mtime, stat.st_atime)
 
         elif path.is_symlink():
-            self.nodes[LINK] += 1
+            node = LINK
+
+        else:
+            node = UNKN
+
+        if self.records is not None:
+            # Files were stat'd for their size, other nodes only for the record.
+            if node != FILE:
+                with self.io():
+                    path.stat
+                self.syscalls[STAT] += 1
+
+            self.records.write(
+                path, node, mimetype, filesize, path.inode, path.stat.st_mtime
+            )
+
+        self.nodes[node] += 1
+        if record is not None:
+            record.add(node, mimetype, filesize, allocated)
+
+    def io(self, ops=1, nbytes=0):
+        """
+        Returns the context of I/O operations (and the bytes they read) that
+        throttles and, if adaptive, times them when the usage is throttled.
+        """
+        if self.throttle is None:
+            return UNTHROTTLED
+        return self.throttle.io(ops, nbytes)
+
+    def deduplicate(self, path, mimetype, filesize):
+        """
+        Returns the unique bytes of a file: its size, unless it is a hard
+        link to an inode that has already been counted.
+        """
+        stat = path.stat
+        if stat.st_nlink < 2:
+            return filesize
+
+        self.hardlinks['linked'] += 1
+        if not self.inodes.add(stat.st_dev, stat.st_ino):
+            self.hardlinks['duplicates'] += 1
+            return 0
+
+        if self.linked is not None:
+            self.linked.append((stat.st_dev, stat.st_ino, mimetype, filesize))
+        return filesize
+
+    def estimate(self):
+        """
+        Returns the estimated files and bytes of every mimetype and in total
+        (under the '*' key) with the bounds of their 95% confidence interval
+        if the analysis is sampled, and the exact counts otherwise.
+        """
+        if self.sampler is None:
+            estimates = dict(
+                (mimetype, {
+                    'files': (count, count, count),
+                    'bytes': (self.store[mimetype],) * 3,
+                }) for mimetype, count in self.mimes.items()
+            )
+            estimates[TOTAL] = {
+                'files': (sum(self.mimes.values()),) * 3, 'bytes': (self.size,) * 3,
+            }
+            return estimates
+
+        return self.sampler.estimate(self.mimes, self.store)
+
+    def diff(self, other):
+        """
+        Returns the UsageDiff of the changes from this usage to the other.
+        """
+        from mosaic.diff import UsageDiff
+        return UsageDiff(self, other)
+
+    def source(self, path=None):
+        """
+        Returns the provenance of the usage: its root and the dump it was
+        loaded from with the totals and timing of its analysis.
+        """
+        return {
+            'root':    str(self.root),
+            'path':    path,
+            'files':   self.nodes[FILE],
+            'items':   self.items,
+            'size':    self.size,
+            'allocated_size': self.allocated_size,
+            'timer': {
+                'started':  utctime(self.started),
+                'finished': utctime(self.finished),
+                'elapsed':  self.elapsed,
+            },
+            'version': self.version,
+        }
+
+    def dump(self, fobj, fmt=binary.JSON, **kwargs):
+        """
+        Dump the file usage as JSON (or in the compact binary format) to the
+        file-like object, which should be opened in binary mode for the latter.
+        """
+        self.write(self.serialize(), fobj, fmt, **kwargs)
 
+    @staticmethod
+    def write(data, fobj, fmt=binary.JSON, **kwargs):
+        """
+        Writes serialized usage data to the file-like object in the format.
+        """
+        if fmt == binary.BINARY:
+            binary.dump(data, fobj)
+        elif fmt == binary.JSON:
+            json.dump(data, fobj, cls=MosaicEncoder, **kwargs)
         else:
-            self.nodes[UNKN] += 1
+            raise ValueError("Unknown dump format '{}'".format(fmt))
 
-    def dump(self, fobj, **kwargs):
+    def save(self, path, frontier=None, fmt=binary.JSON, records=None, **kwargs):
         """
-        Dump the file usage as JSON to the file-like object.
+        Atomically dumps the usage to the path by writing a temporary file and
+        renaming it, so readers never see a partial dump. The frontier of any
+        pending directories is included to make the dump a checkpoint, with
+        the size of the records file to resume them from.
         """
-        json.dump(self.serialize(), fobj, cls=MosaicEncoder, **kwargs)
+        data = self.serialize()
+        if frontier is not None:
+            data['frontier'] = [str(dirpath) for dirpath in frontier]
+        if records is not None:
+            data['records_size'] = records
+
+        tmppath = "{}.tmp".format(path)
+        with open(tmppath, 'wb') as f:
+            self.write(data, f, fmt, **kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmppath, path)
 
     def serialize(self):
         """
         Return a Python dictionary that represents the file usage.
         """
-        return {
+        data = {
             'nodes':  self.nodes,
             'mimes':  self.mimes,
             'store':  self.store,
+            'allocated': self.allocated,
+            'sparseness': self.sparseness,
+            'unique': self.unique,
+            'hardlinks': self.hardlinks,
+            'cache':  self.cache,
+            'tiers':  self.tiers,
+            'syscalls': self.syscalls,
+            'incremental': self.incremental,
+            'classified': self.classified,
             'root':   self.root,
             'size':   humanize_bytes(self.size),
+            'allocated_size': humanize_bytes(self.allocated_size),
             'items':  self.items,
             'types':  self.types,
             'timer': {
-                'started':  datetime.utcfromtimestamp(self.started),
-                'finished': datetime.utcfromtimestamp(self.finished),
+                'started':  utctime(self.started),
+                'finished': utctime(self.finished),
                 'elapsed':  self.elapsed,
             },
             'options': self.options,
             'version': mosaic.get_version(),
         }
+
+        if self.profiler is not None:
+            data['timer']['profile'] = self.profiler
+
+        if self.inodes is not None:
+            data['unique_size'] = humanize_bytes(self.unique_size)
+
+        if self.linked is not None:
+            data['linked'] = self.linked
+
+        if self.histograms is not None:
+            data['histograms'] = self.histograms
+
+        if self.ages is not None:
+            data['ages'] = self.ages
+
+        if self.largest is not None:
+            data['largest'] = self.largest.serialize(self.tree)
+
+        if self.sampler is not None:
+            data['sample'] = self.sampler
+            data['estimate'] = self.estimate()
+
+        if self.sources is not None:
+            data['sources'] = self.sources
+
+        if self.tree is not None:
+            data['tree'] = self.tree
+
+        if self.snapshot is not None:
+            data['dirs'] = self.snapshot
+
+        return data
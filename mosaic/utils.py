@@ -19,7 +19,9 @@ Utilities for the mosaic module.
 
 import json
 import time
+import calendar
 
+from datetime import datetime
 from functools import wraps
 
 ##########################################################################
@@ -48,6 +50,21 @@ def humanize_bytes(bytesize, precision=2):
     return '%.*f %s' % (precision, bytesize / float(factor), suffix)
 
 
+def epochtime(value):
+    """
+    Converts a UTC datetime (or its MosaicEncoder string) to an epoch time
+    in seconds. None and numeric timestamps are passed through untouched.
+    """
+    if value is None or isinstance(value, (int, long, float)):
+        return value
+
+    if not isinstance(value, datetime):
+        value = datetime.strptime(value, MosaicEncoder.JSON_DATETIME)
+
+    return calendar.timegm(value.utctimetuple()) + value.microsecond / 1e6
+
+
+
 ##########################################################################
 ## Memoization
 ##########################################################################
@@ -85,6 +102,9 @@ class MosaicEncoder(json.JSONEncoder):
     def encode_Path(self, obj):
         return str(obj)
 
+    def encode_Node(self, obj):
+        return str(obj)
+
     def default(self, obj):
         """
         Perform encoding of complex objects.
@@ -0,0 +1,374 @@
+# mosaic.watch
+# Keeps a file usage analysis current from Linux inotify events.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Wed Dec 09 15:22:48 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: watch.py [] benjamin@bengfort.com $
+
+"""
+Keeps a file usage analysis current from Linux inotify events.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import time
+import errno
+import ctypes
+import select
+import struct
+import ctypes.util
+
+from mosaic.path import Path
+from mosaic.snapshot import DirRecord
+from mosaic.usage import analyze, scan_directory, scan_tree
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+# inotify event masks (see inotify(7))
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR       = 0x40000000
+IN_NONBLOCK    = os.O_NONBLOCK
+IN_CLOEXEC     = 0o2000000
+
+# Events that change the usage of the watched directory. Modifications are
+# watched on close so that a file being written does not flood the queue.
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+    IN_DELETE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW
+)
+
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+READ_SIZE    = 1048576                # Read many queued events in one call
+MAX_WATCHES  = "/proc/sys/fs/inotify/max_user_watches"
+
+LATENCY     = 1.0    # Seconds to coalesce events before refreshing
+MAX_LATENCY = 10.0   # Seconds continuous events may delay a refresh at most
+CHECKPOINT  = 300.0  # Seconds between checkpoints of the usage
+
+##########################################################################
+## Inotify
+##########################################################################
+
+class Inotify(object):
+    """
+    A minimal ctypes wrapper around the Linux inotify API.
+    """
+
+    def __init__(self):
+        libc = ctypes.util.find_library('c')
+        self.libc = ctypes.CDLL(libc, use_errno=True)
+
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not supported on this platform")
+
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self.raise_errno()
+
+    def raise_errno(self, path=None):
+        code = ctypes.get_errno()
+        raise OSError(code, os.strerror(code), path)
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """
+        Adds (or updates) a watch on the path, returning the watch descriptor.
+        """
+        wd = self.libc.inotify_add_watch(self.fd, str(path), mask)
+        if wd < 0:
+            self.raise_errno(str(path))
+        return wd
+
+    def rm_watch(self, wd):
+        """
+        Removes a watch, ignoring watches the kernel has already removed.
+        """
+        if self.libc.inotify_rm_watch(self.fd, wd) < 0:
+            if ctypes.get_errno() != errno.EINVAL:
+                self.raise_errno()
+
+    def read(self, timeout=None):
+        """
+        Waits up to timeout seconds and returns all of the queued events as
+        (wd, mask, cookie, name) tuples.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except OSError as e:
+            if e.errno == errno.EAGAIN: return []
+            raise
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset+length].rstrip('\0')
+            offset += length
+            events.append((wd, mask, cookie, name))
+
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def max_user_watches():
+    """
+    Returns the kernel limit on inotify watches per user, if it is known.
+    """
+    try:
+        with open(MAX_WATCHES, 'r') as f:
+            return int(f.read().strip())
+    except (IOError, ValueError):
+        return None
+
+
+##########################################################################
+## Watcher
+##########################################################################
+
+class Watcher(object):
+    """
+    Performs an initial analysis with a per-directory snapshot and then
+    keeps the usage current from inotify events. Events only mark their
+    directory as dirty; once no events arrive for latency seconds (or at
+    least every max_latency seconds) the dirty directories are listed again
+    and their local contributions in the snapshot replaced, new subtrees
+    are scanned and watched and vanished subtrees discarded.
+
+    Watches are keyed by their descriptor. Since the kernel keeps the watch
+    of a moved directory (with the same descriptor), paired move events of
+    directories move their watches to the new paths rather than removing
+    watches that are still live.
+    The usage is checkpointed to the output path with FileUsage.dump and,
+    if the kernel event queue overflows, the tree is analyzed from scratch.
+
+    Note that refreshing a directory sniffs its files again, so the watcher
+    is best combined with a mimetype cache or the hybrid strategy.
+    """
+
+    def __init__(self, root, output=None, latency=LATENCY, checkpoint=CHECKPOINT,
+                 max_latency=MAX_LATENCY, **options):
+        self.root        = Path(root)
+        self.output      = output
+        self.latency     = latency
+        self.max_latency = max_latency
+        self.checkpoint  = checkpoint
+        self.options    = options
+        self.options['snapshot'] = True
+
+        self.usage   = None
+        self.inotify = None
+        self.watches = {}     # watch descriptor -> directory path
+        self.wds     = {}     # directory path -> watch descriptor
+        self.dirty   = set()  # directories with pending events
+        self.moves   = {}     # move cookie -> path the directory was moved from
+        self.saved   = None   # timestamp of the last checkpoint
+        self.refreshed = None  # timestamp of the last refresh
+
+    @property
+    def include_hidden(self):
+        return self.options.get('include_hidden', False)
+
+    def start(self):
+        """
+        Performs the initial analysis and watches every directory.
+        """
+        self.inotify = Inotify()
+        self.usage   = analyze(self.root, **self.options)
+
+        limit = max_user_watches()
+        if limit is not None and len(self.usage.snapshot) > limit:
+            raise OSError(errno.ENOSPC,
+                "{:,d} directories exceed the {:,d} inotify watches allowed by {}"
+                .format(len(self.usage.snapshot), limit, MAX_WATCHES)
+            )
+
+        self.watch(self.usage.snapshot.subtree(self.root))
+        self.refreshed = time.time()
+        self.save()
+        return self.usage
+
+    def watch(self, paths):
+        """
+        Adds watches for all of the directory paths in bulk.
+        """
+        for path in paths:
+            try:
+                wd = self.inotify.add_watch(path)
+            except OSError as e:
+                # The directory may have vanished since it was scanned.
+                if e.errno in (errno.ENOENT, errno.ENOTDIR): continue
+                raise
+
+            self.watches[wd] = path
+            self.wds[path] = wd
+
+    def unwatch(self, paths):
+        """
+        Removes the watches of all of the directory paths in bulk, unless the
+        watch of a path has since been added again for another path.
+        """
+        for path in paths:
+            wd = self.wds.pop(path, None)
+            if wd is not None and self.watches.get(wd) == path:
+                del self.watches[wd]
+                self.inotify.rm_watch(wd)
+
+    def move(self, source, target):
+        """
+        Moves the watches of a moved directory and its subdirectories.
+        """
+        prefix = source + os.sep
+        for path, wd in self.wds.items():
+            if path == source or path.startswith(prefix):
+                moved = target + path[len(source):]
+                del self.wds[path]
+                self.wds[moved] = wd
+                self.watches[wd] = moved
+
+    def run(self, until=None):
+        """
+        Processes events until interrupted (or until the timestamp passes),
+        checkpointing the usage periodically and when stopping.
+        """
+        if self.usage is None:
+            self.start()
+
+        try:
+            while until is None or time.time() < until:
+                self.process(self.inotify.read(self.latency))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.save()
+
+        return self.usage
+
+    def process(self, events):
+        """
+        Marks the directories of the events dirty and, once no more events
+        arrive within the latency or max_latency seconds after the last
+        refresh, refreshes them.
+        """
+        for wd, mask, cookie, name in events:
+            if mask & IN_Q_OVERFLOW:
+                return self.rescan()
+
+            path = self.watches.get(wd)
+            if path is None:
+                continue
+
+            if mask & IN_IGNORED:
+                # The kernel removed the watch (the directory was deleted).
+                self.watches.pop(wd, None)
+                self.wds.pop(path, None)
+                continue
+
+            if not self.include_hidden and name and name[0] in {'.', '~'}:
+                continue
+
+            # Pair the moves of directories to move their watches.
+            if mask & IN_ISDIR and mask & IN_MOVED_FROM:
+                self.moves[cookie] = os.path.join(path, name)
+            elif mask & IN_ISDIR and mask & IN_MOVED_TO and cookie in self.moves:
+                self.move(self.moves.pop(cookie), os.path.join(path, name))
+
+            if not mask & IN_DELETE_SELF:
+                self.dirty.add(path)
+
+        if not events or time.time() - self.refreshed >= self.max_latency:
+            self.refresh()
+
+        if self.output and time.time() - self.saved >= self.checkpoint:
+            self.save()
+
+    def refresh(self):
+        """
+        Lists every dirty directory again, replacing its local contribution,
+        and scans new subdirectories or discards vanished ones.
+        """
+        snapshot = self.usage.snapshot
+
+        # Parents first so that discarded subtrees are not refreshed.
+        for path in sorted(self.dirty, key=lambda path: path.count(os.sep)):
+            record = snapshot.get(path)
+            if record is None:
+                continue
+
+            before = set(snapshot.children(path))
+            self.usage.subtract(record)
+
+            try:
+                subdirs = scan_directory(self.usage, Path.literal(path), self.include_hidden)
+            except OSError:
+                # The directory itself vanished, its parent will be refreshed.
+                # Its contribution was already subtracted, so discard it empty.
+                snapshot.records[path] = DirRecord(record.mtime, record.ctime)
+                self.unwatch(self.usage.discard(path))
+                continue
+
+            after = set(str(subdir) for subdir in subdirs)
+
+            for gone in before - after:
+                self.unwatch(self.usage.discard(gone))
+
+            for added in after - before:
+                scan_tree(self.usage, Path.literal(added), self.include_hidden)
+                self.watch(snapshot.subtree(added))
+
+        self.dirty.clear()
+        self.moves.clear()
+        self.refreshed = time.time()
+
+    def rescan(self):
+        """
+        Falls back to analyzing the tree from scratch after events were lost.
+        """
+        self.close()
+        self.watches.clear()
+        self.wds.clear()
+        self.dirty.clear()
+        self.moves.clear()
+        self.start()
+
+    def save(self):
+        """
+        Atomically checkpoints the usage to the output path.
+        """
+        self.saved = time.time()
+        if not self.output or self.usage is None:
+            return
+
+        self.usage.save(self.output, indent=2)
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
@@ -45,6 +45,11 @@ with open('requirements.txt', 'r') as reqfile:
     for line in reqfile:
         requires.append(line.strip())
 
+## Optional requirements of some analyses (e.g. pip install mosaic[histograms])
+extras = {
+    'histograms': ['numpy>=1.10.1'],  # mosaic usage --histograms and --ages
+}
+
 ## Define the classifiers
 classifiers = (
     'Development Status :: 4 - Beta',
@@ -75,6 +80,7 @@ config = {
     "download_url": 'https://github.com/bbengfort/mosaic/tarball/v%s' % version,
     "packages": packages,
     "install_requires": requires,
+    "extras_require": extras,
     "classifiers": classifiers,
     "keywords": keywords,
     "zip_safe": True,
@@ -0,0 +1,103 @@
+# tests.binary_tests
+# Testing for the compact binary format of file usage dumps.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Tue Dec 15 16:40:13 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: binary_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the compact binary format of file usage dumps.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from StringIO import StringIO
+from mosaic.binary import *
+from mosaic.usage import FileUsage, analyze
+from usage_tests import make_tree
+
+##########################################################################
+## Binary TestCase
+##########################################################################
+
+class BinaryTests(unittest.TestCase):
+    """
+    Tests for binary dumps of the file usage.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="mosaic-")
+        make_tree(self.root)
+        self.usage = analyze(self.root, snapshot=True, tree=True, hardlinks=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def assertUsageEqual(self, first, second):
+        for key in FileUsage.COUNTERS + ('root', 'options', 'status', 'started', 'elapsed'):
+            self.assertEqual(getattr(first, key), getattr(second, key))
+
+        self.assertEqual(set(first.snapshot.records), set(second.snapshot.records))
+        for path, record in first.snapshot.records.items():
+            self.assertEqual(record.serialize(), second.snapshot.get(path).serialize())
+
+        self.assertEqual(first.tree.serialize(), second.tree.serialize())
+        self.assertEqual(first.tree.biggest(1), second.tree.biggest(1))
+
+    def test_roundtrip(self):
+        """
+        Test a usage is loaded from its binary dump
+        """
+        fobj = StringIO()
+        self.usage.dump(fobj, BINARY)
+        self.assertTrue(fobj.getvalue().startswith(MAGIC))
+
+        fobj.seek(0)
+        self.assertUsageEqual(FileUsage.load(fobj), self.usage)
+
+    def test_detect_json(self):
+        """
+        Test JSON dumps are still loaded
+        """
+        fobj = StringIO()
+        self.usage.dump(fobj)
+        fobj.seek(0)
+
+        self.assertUsageEqual(FileUsage.load(fobj), self.usage)
+
+    def test_incremental(self):
+        """
+        Test an incremental analysis reuses a binary snapshot
+        """
+        dump = os.path.join(self.root, ".mosaic")
+        self.usage.save(dump, fmt=BINARY)
+
+        # Only the root changed, by saving the dump into it.
+        usage = analyze(self.root, incremental=dump)
+        self.assertEqual(usage.incremental, {'reused': 39, 'rescanned': 1})
+        self.assertEqual(usage.store, self.usage.store)
+
+    def test_versions(self):
+        """
+        Test newer versions are refused and unknown sections skipped
+        """
+        data = dumps(self.usage.serialize())
+        offset = len(MAGIC) + HEADER.size
+
+        newer = MAGIC + HEADER.pack(VERSION + 1) + data[offset:]
+        with self.assertRaises(ValueError):
+            loads(newer)
+
+        extra = data + SECTION.pack("XTRA", 3) + "abc"
+        self.assertEqual(loads(extra)['nodes'], self.usage.nodes)
@@ -0,0 +1,130 @@
+# tests.cache_tests
+# Testing for the persistent mimetype cache.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Tue Dec 01 10:02:45 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: cache_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the persistent mimetype cache.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mosaic.cache import MimeCache
+from mosaic.usage import analyze, PROCESS
+from tests.usage_tests import make_tree
+
+##########################################################################
+## Cache TestCase
+##########################################################################
+
+class MimeCacheTests(unittest.TestCase):
+    """
+    Tests for the on-disk mimetype cache.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mosaic-")
+        self.dbpath = os.path.join(self.tmpdir, "cache", "mimetypes.db")
+        self.root   = os.path.join(self.tmpdir, "tree")
+
+        os.mkdir(self.root)
+        make_tree(self.root, depth=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_put(self):
+        """
+        Test that a mimetype is returned only for matching metadata
+        """
+        path  = os.path.join(self.root, "file0.txt")
+        cache = MimeCache(self.dbpath)
+        stat  = os.stat(path)
+
+        self.assertIsNone(cache.get(stat))
+        cache.put(stat, "text/plain")
+        cache.flush()
+        self.assertEqual(cache.get(stat), "text/plain")
+
+        # Modifying the file changes its size and invalidates the entry.
+        with open(path, 'a') as f:
+            f.write("more data")
+
+        self.assertIsNone(cache.get(os.stat(path)))
+        cache.close()
+
+    def test_rescan_hits(self):
+        """
+        Test that a re-scan is answered entirely from the cache
+        """
+        first  = analyze(self.root, cache=self.dbpath)
+        second = analyze(self.root, cache=self.dbpath)
+
+        self.assertEqual(first.cache['hits'], 0)
+        self.assertEqual(first.cache['misses'], first.nodes['files'])
+        self.assertEqual(second.cache['hits'], first.nodes['files'])
+        self.assertEqual(second.cache['misses'], 0)
+        self.assertEqual(first.mimes, second.mimes)
+        self.assertEqual(first.store, second.store)
+
+    def test_parallel_cache(self):
+        """
+        Test that parallel workers share the cache through their own handles
+        """
+        analyze(self.root, cache=self.dbpath)
+        for backend in ('thread', PROCESS):
+            usage = analyze(self.root, workers=3, backend=backend, cache=self.dbpath)
+            self.assertEqual(usage.cache['hits'], usage.nodes['files'])
+
+    def test_eviction(self):
+        """
+        Test that the least recently seen entries are evicted
+        """
+        analyze(self.root, cache=self.dbpath)
+
+        cache = MimeCache(self.dbpath, maxsize=5)
+        total = len(cache)
+
+        self.assertGreater(total, 5)
+        self.assertEqual(cache.evict(), total - 5)
+        self.assertEqual(len(cache), 5)
+        cache.close()
+
+    def test_evict_once(self):
+        """
+        Test that an analysis evicts the cache once and only if it grew
+        """
+        evictions = []
+        evict = MimeCache.evict
+
+        def counted(cache):
+            evictions.append(cache)
+            return evict(cache)
+
+        MimeCache.evict = counted
+        try:
+            for backend in ('thread', PROCESS):
+                dbpath = os.path.join(self.tmpdir, "{}.db".format(backend))
+                analyze(self.root, workers=3, backend=backend, cache=dbpath, cache_size=5)
+                self.assertEqual(len(MimeCache(dbpath)), 5)
+            self.assertEqual(len(evictions), 2)
+
+            # A re-scan of unchanged files only hits the cache.
+            analyze(self.root, cache=self.dbpath)
+            analyze(self.root, workers=3, cache=self.dbpath)
+            self.assertEqual(len(evictions), 3)
+        finally:
+            MimeCache.evict = evict
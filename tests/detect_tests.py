@@ -0,0 +1,97 @@
+# tests.detect_tests
+# Testing for the content based mimetype detector.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Thu Dec 03 14:30:19 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: detect_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the content based mimetype detector.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import magic
+import shutil
+import tempfile
+import unittest
+import threading
+
+from mosaic.detect import Detector, EMPTY_MIME
+
+##########################################################################
+## Detector TestCase
+##########################################################################
+
+class DetectorTests(unittest.TestCase):
+    """
+    Tests for the per-thread libmagic detector.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mosaic-")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_file(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_matches_magic(self):
+        """
+        Test the detector agrees with libmagic sniffing the whole file
+        """
+        fixtures = (
+            ("data.txt", "mosaic " * 100),
+            ("data.json", '{"mosaic": [1, 2, 3]}'),
+            ("data.gz", "\x1f\x8b\x08\x00" + "\x00" * 64),
+            ("data.png", "\x89PNG\r\n\x1a\n" + "\x00" * 64),
+            ("empty", ""),
+        )
+
+        detector = Detector()
+        for name, data in fixtures:
+            path = self.make_file(name, data)
+            self.assertEqual(detector.from_file(path), magic.from_file(path, mime=True))
+
+    def test_bounded_header(self):
+        """
+        Test that only the header is sniffed
+        """
+        path = self.make_file("data.txt", "mosaic\n" * 4 + "\x00\xff" * 4096)
+        self.assertEqual(Detector(header=16).from_file(path), "text/plain")
+        self.assertEqual(Detector().from_file(path), "application/octet-stream")
+
+    def test_empty(self):
+        """
+        Test empty files are detected without reading them
+        """
+        path = self.make_file("empty.txt", "")
+        self.assertEqual(Detector().from_file(path), EMPTY_MIME)
+
+    def test_thread_handles(self):
+        """
+        Test that every thread gets its own libmagic handle
+        """
+        detector = Detector()
+        handles  = []
+
+        def work():
+            handles.append(detector.magic)
+
+        threads = [threading.Thread(target=work) for _ in range(3)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+
+        self.assertEqual(len(set(map(id, handles))), 3)
+        self.assertNotIn(detector.magic, handles)
@@ -0,0 +1,106 @@
+# tests.diff_tests
+# Testing for the changes in usage between two analyses.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Thu Dec 17 12:05:44 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: diff_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the changes in usage between two analyses.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from mosaic.diff import *
+from mosaic.usage import analyze
+from mosaic.utils import MosaicEncoder
+from usage_tests import make_tree
+
+##########################################################################
+## Diff TestCase
+##########################################################################
+
+class UsageDiffTests(unittest.TestCase):
+    """
+    Tests for the diff of two usages.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="mosaic-")
+        make_tree(self.root, depth=2, width=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def change(self):
+        """
+        Grows dir0 by one 1000 byte file and removes dir1/dir0.
+        """
+        with open(os.path.join(self.root, "dir0", "dir1", "grown.txt"), 'w') as f:
+            f.write("x" * 1000)
+        shutil.rmtree(os.path.join(self.root, "dir1", "dir0"))
+
+    def test_delta(self):
+        """
+        Test the deltas of counts drop unchanged keys
+        """
+        self.assertEqual(delta({'a': 1, 'b': 2}, {'b': 5, 'c': 1}), {'a': -1, 'b': 3, 'c': 1})
+        self.assertEqual(signed_bytes(-2048), "-2.00 kB")
+        self.assertEqual(signed_bytes(0), "+0 bytes")
+
+    def test_diff(self):
+        """
+        Test the deltas of nodes, mimetypes and subtrees
+        """
+        for options in ({'tree': True}, {'snapshot': True}):
+            shutil.rmtree(self.root)
+            os.mkdir(self.root)
+            make_tree(self.root, depth=2, width=2)
+
+            old = analyze(self.root, **options)
+            self.change()
+            new = analyze(self.root, **options)
+            diff = old.diff(new)
+
+            # The removed subtree had 5 files (including an empty one).
+            self.assertEqual(diff.nodes, {'files': -4, 'dirs': -1, 'links': -1})
+            self.assertEqual(diff.size, new.size - old.size)
+            self.assertEqual(diff.store, {'text/plain': 1000 - 70})
+
+            self.assertEqual(
+                diff.growing(1), [(os.path.join(self.root, "dir0"), 1, 1000)]
+            )
+            self.assertEqual(
+                diff.growing(2), [(os.path.join(self.root, "dir0", "dir1"), 1, 1000)]
+            )
+            self.assertEqual(
+                diff.subtrees[os.path.join(self.root, "dir1", "dir0")][:2], (-5, -70)
+            )
+
+            data = json.loads(json.dumps(diff.serialize(), cls=MosaicEncoder))
+            self.assertEqual(data['growing'][0]['size'], 1000)
+            self.assertIn("Growing subtrees:", str(diff))
+
+    def test_diff_counts_only(self):
+        """
+        Test the diff without per-directory data has no subtrees
+        """
+        old  = analyze(self.root)
+        diff = old.diff(analyze(self.root, tree=True))
+
+        self.assertEqual(diff.nodes, {})
+        self.assertIsNone(diff.subtrees)
+        self.assertEqual(diff.growing(), [])
+        self.assertNotIn('growing', diff.serialize())
@@ -0,0 +1,135 @@
+# tests.histogram_tests
+# Testing for the log2 file size histograms.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Fri Dec 18 10:58:21 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: histogram_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the log2 file size histograms.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import json
+import unittest
+
+import mosaic.histogram
+
+from mosaic.histogram import *
+
+##########################################################################
+## SizeHistograms TestCase
+##########################################################################
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class SizeHistogramsTests(unittest.TestCase):
+    """
+    Tests for the batched size histograms.
+    """
+
+    def test_bins(self):
+        """
+        Test sizes are binned by powers of two
+        """
+        histograms = SizeHistograms()
+        for size in (0, 1, 2, 3, 4, 1023, 1024, (1 << 63) + 5):
+            histograms.add("text/plain", size)
+
+        self.assertEqual(histograms.histogram("text/plain"), [
+            (0, 0, 1), (1, 2, 1), (2, 4, 2), (4, 8, 1), (512, 1024, 1),
+            (1024, 2048, 1), (1 << 63, 1 << 64, 1),
+        ])
+        self.assertEqual(histograms.histogram("image/png"), [])
+
+    def test_batches(self):
+        """
+        Test full batches are binned as they are added
+        """
+        batch = mosaic.histogram.BATCH
+        mosaic.histogram.BATCH = 10
+        try:
+            histograms = SizeHistograms()
+            for size in xrange(25):
+                histograms.add("text/plain", size)
+
+            self.assertEqual(len(histograms.batches["text/plain"]), 5)
+            self.assertEqual(histograms.counts["text/plain"].sum(), 20)
+            self.assertEqual(sum(count for _, _, count in histograms.histogram("text/plain")), 25)
+        finally:
+            mosaic.histogram.BATCH = batch
+
+    def test_merge_serialize(self):
+        """
+        Test histograms are merged and serialized without trailing bins
+        """
+        first, second = SizeHistograms(), SizeHistograms()
+        first.add("text/plain", 3)
+        second.add("text/plain", 2)
+        second.add("image/png", 100)
+
+        first += second
+        data = json.loads(json.dumps(first.serialize()))
+        self.assertEqual(data, {
+            "text/plain": [0, 0, 2],
+            "image/png": [0, 0, 0, 0, 0, 0, 0, 1],
+        })
+
+        loaded = SizeHistograms.deserialize(data)
+        self.assertEqual(loaded.histogram("image/png"), [(64, 128, 1)])
+
+
+##########################################################################
+## AgeHistograms TestCase
+##########################################################################
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class AgeHistogramsTests(unittest.TestCase):
+    """
+    Tests for the batched age by size histograms.
+    """
+
+    NOW = 1450000000.0
+
+    def make_histograms(self):
+        histograms = AgeHistograms(self.NOW)
+        histograms.add("text/plain", 100, self.NOW - 10, self.NOW - 400 * DAY)
+        histograms.add("text/plain", 5000, self.NOW - 40 * DAY, self.NOW + 100)
+        histograms.add("image/png", 3, self.NOW - 2000 * DAY, self.NOW - 2000 * DAY)
+        return histograms
+
+    def test_older(self):
+        """
+        Test the files and bytes older than an age
+        """
+        histograms = self.make_histograms()
+
+        self.assertEqual(histograms.older(365 * DAY), {
+            "text/plain": (1, 100), "image/png": (1, 3),
+        })
+        self.assertEqual(histograms.older(30 * DAY, MTIME), {
+            "text/plain": (1, 5000), "image/png": (1, 3),
+        })
+        self.assertEqual(histograms.older(3000 * DAY), {})
+
+    def test_merge_serialize(self):
+        """
+        Test age histograms are merged and serialized as sparse cells
+        """
+        data = json.loads(json.dumps(self.make_histograms().serialize()))
+        self.assertEqual(data['now'], self.NOW)
+        self.assertEqual(data['mimes']['text/plain']['atime'], [
+            [0, 13, 1, 5000], [6, 7, 1, 100],
+        ])
+
+        loaded = AgeHistograms.deserialize(data)
+        loaded += self.make_histograms()
+        self.assertEqual(loaded.older(0), {
+            "text/plain": (4, 10200), "image/png": (2, 6),
+        })
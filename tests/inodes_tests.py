@@ -0,0 +1,101 @@
+# tests.inodes_tests
+# Testing for the compact set of hard linked inodes.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Fri Dec 11 12:10:44 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: inodes_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the compact set of hard linked inodes.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import random
+import unittest
+import mosaic.inodes
+
+from array import array
+from mosaic.inodes import InodeBlocks, InodeSet, BUFFER, TYPECODE, merge
+
+##########################################################################
+## Inode TestCase
+##########################################################################
+
+class InodeSetTests(unittest.TestCase):
+    """
+    Tests for the sorted block inode sets.
+    """
+
+    def test_blocks(self):
+        """
+        Test the blocks behave as a set and stay sorted and few
+        """
+        inodes = random.Random(42).sample(xrange(1, 2**40), BUFFER * 20)
+        blocks = InodeBlocks()
+
+        for ino in inodes:
+            self.assertTrue(blocks.add(ino))
+        for ino in inodes[::97]:
+            self.assertFalse(blocks.add(ino))
+            self.assertIn(ino, blocks)
+
+        self.assertNotIn(0, blocks)
+        self.assertNotIn(2**40, blocks)
+        self.assertEqual(len(blocks), len(inodes))
+        self.assertLessEqual(len(blocks.blocks), 5)
+        for block in blocks.blocks:
+            self.assertEqual(list(block), sorted(block))
+
+    def test_geometric_blocks(self):
+        """
+        Test every block is more than twice the next, so there are log2(n)
+        """
+        inodes = random.Random(42).sample(xrange(1, 2**40), 16 * 1000)
+        blocks = InodeBlocks()
+
+        # Compact every 16 inodes so that there are many blocks to merge.
+        try:
+            mosaic.inodes.BUFFER = 16
+            for ino in inodes:
+                blocks.add(ino)
+        finally:
+            mosaic.inodes.BUFFER = BUFFER
+
+        sizes = [len(block) for block in blocks.blocks]
+        self.assertEqual(sum(sizes), len(inodes))
+        self.assertLessEqual(len(sizes), 10)
+        for size, smaller in zip(sizes, sizes[1:]):
+            self.assertGreater(size, 2 * smaller)
+
+    def test_merge(self):
+        """
+        Test sorted arrays are merged a chunk at a time
+        """
+        rand = random.Random(42)
+        for sizes in ((0, 10), (10, 0), (1, 100), (100, 1), (257, 1000), (1000, 999)):
+            inodes = rand.sample(xrange(1, 2**40), sum(sizes))
+            first  = array(TYPECODE, sorted(inodes[:sizes[0]]))
+            second = array(TYPECODE, sorted(inodes[sizes[0]:]))
+
+            merged = merge(first, second, chunk=16)
+            self.assertEqual(merged.typecode, TYPECODE)
+            self.assertEqual(list(merged), sorted(inodes))
+
+    def test_devices(self):
+        """
+        Test the same inode on different devices are different links
+        """
+        inodes = InodeSet()
+        self.assertTrue(inodes.add(1, 42))
+        self.assertTrue(inodes.add(2, 42))
+        self.assertFalse(inodes.add(1, 42))
+        self.assertIn((2, 42), inodes)
+        self.assertNotIn((3, 42), inodes)
+        self.assertEqual(len(inodes), 2)
@@ -0,0 +1,71 @@
+# tests.largest_tests
+# Testing for the bounded heaps of the largest files and directories.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Sat Dec 19 11:17:45 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: largest_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the bounded heaps of the largest files and directories.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import json
+import random
+import unittest
+
+from mosaic.largest import *
+
+##########################################################################
+## Largest TestCase
+##########################################################################
+
+class LargestTests(unittest.TestCase):
+    """
+    Tests for the largest files and directories.
+    """
+
+    def test_topn(self):
+        """
+        Test the heap keeps only the n largest items
+        """
+        sizes = range(1000)
+        random.Random(42).shuffle(sizes)
+
+        top = TopN(3)
+        for size in sizes:
+            top.push(size, "/data/file{}".format(size))
+
+        self.assertEqual(len(top), 3)
+        self.assertEqual(top.items(), [
+            ("/data/file999", 999), ("/data/file998", 998), ("/data/file997", 997),
+        ])
+
+    def test_merge_serialize(self):
+        """
+        Test collectors are merged and serialized by mimetype
+        """
+        first, second = Largest(2), Largest(2)
+        first.file("/a/x.txt", "text/plain", 10)
+        first.file("/a/y.png", "image/png", 500)
+        first.directory("/a", 510)
+        second.file("/b/z.txt", "text/plain", 30)
+        second.file("/b/w.txt", "text/plain", 20)
+        second.directory("/b", 50)
+
+        first += second
+        data = json.loads(json.dumps(first.serialize()))
+        self.assertEqual(data['files'], [["/a/y.png", 500], ["/b/z.txt", 30]])
+        self.assertEqual(data['mimes']['text/plain'], [["/b/z.txt", 30], ["/b/w.txt", 20]])
+        self.assertEqual(data['dirs'], [["/a", 510], ["/b", 50]])
+        self.assertEqual(data['ranking'], LOCAL)
+
+        loaded = Largest.deserialize(data)
+        self.assertEqual(json.loads(json.dumps(loaded.serialize())), data)
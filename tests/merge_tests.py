@@ -0,0 +1,137 @@
+# tests.merge_tests
+# Testing for merging many usage dumps.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Wed Dec 16 12:31:05 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: merge_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for merging many usage dumps.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mosaic.merge import *
+from mosaic.binary import JSON, BINARY
+from mosaic.usage import analyze
+from usage_tests import make_tree
+
+##########################################################################
+## Merge TestCase
+##########################################################################
+
+class MergeTests(unittest.TestCase):
+    """
+    Tests for the tree reduction of usage dumps.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mosaic-")
+        self.roots  = []
+        self.dumps  = []
+
+        for idx in range(5):
+            root = os.path.join(self.tmpdir, "export", "host{}".format(idx))
+            os.makedirs(root)
+            make_tree(root, depth=1, width=2)
+
+            usage = analyze(root, snapshot=True, tree=True)
+            path  = os.path.join(self.tmpdir, "mosaic-{}.json".format(idx))
+            usage.save(path, fmt=BINARY if idx % 2 else JSON)
+
+            self.roots.append(root)
+            self.dumps.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_common_root(self):
+        """
+        Test the common root of several roots
+        """
+        self.assertEqual(common_root("/export/a", "/export/b/c"), "/export")
+        self.assertEqual(common_root("/export/a", "/exports"), "/")
+        self.assertEqual(common_root("/export/a/"), "/export/a")
+        self.assertTrue(overlaps("/export", "/export/a"))
+        self.assertFalse(overlaps("/export/a", "/export/ab"))
+
+    def test_merge(self):
+        """
+        Test dumps are merged in a tree reduction with their provenance
+        """
+        expected = analyze(os.path.join(self.tmpdir, "export"), snapshot=True, tree=True)
+
+        for workers in (1, 2):
+            usage = merge(self.dumps, workers=workers, fanout=2)
+
+            self.assertEqual(usage.root, os.path.join(self.tmpdir, "export"))
+            self.assertEqual(usage.store, expected.store)
+            self.assertEqual(usage.nodes['files'], expected.nodes['files'])
+            self.assertEqual(len(usage.snapshot), len(expected.snapshot) - 1)
+
+            self.assertEqual(
+                [source['root'] for source in usage.sources], self.roots
+            )
+            self.assertEqual(
+                [source['path'] for source in usage.sources], self.dumps
+            )
+
+            _, files, size, _ = usage.tree.subtree(self.roots[0])
+            self.assertEqual((files, size), expected.tree.subtree(self.roots[0])[1:3])
+            self.assertEqual(
+                set(subtree[0] for subtree in usage.tree.biggest(1)), set(self.roots)
+            )
+
+        self.assertIn("Merged 5 roots from 5 dumps", str(usage))
+
+    def test_merge_overlapping(self):
+        """
+        Test dumps with overlapping roots are not merged
+        """
+        nested = os.path.join(self.tmpdir, "nested.json")
+        analyze(os.path.join(self.roots[1], "dir0")).save(nested)
+
+        for paths in (self.dumps[:2] + self.dumps[:1], [nested] + self.dumps[:3]):
+            for workers in (1, 2):
+                with self.assertRaises(ValueError):
+                    merge(paths, workers=workers, fanout=2)
+
+    def test_merge_hardlinks(self):
+        """
+        Test unique bytes are not double counted across merged dumps
+        """
+        source = os.path.join(self.roots[0], "file0.txt")
+        os.link(source, os.path.join(self.roots[1], "linked.txt"))
+
+        dumps = []
+        for idx, root in enumerate(self.roots[:2]):
+            dumps.append(os.path.join(self.tmpdir, "linked-{}.json".format(idx)))
+            analyze(root, hardlinks=True).save(dumps[-1])
+
+        # Each dump counts the linked file as unique, so their sum would twice.
+        self.assertEqual(merge(dumps[:1], workers=1).unique, load(dumps[0]).unique)
+        self.assertEqual(merge(dumps, workers=1).unique, {})
+
+    def test_merge_roundtrip(self):
+        """
+        Test the provenance of a merged usage survives a dump
+        """
+        usage  = merge(self.dumps[:2], workers=1)
+        merged = os.path.join(self.tmpdir, "merged.json")
+        usage.save(merged)
+
+        again = merge([merged, self.dumps[2]], workers=1)
+        self.assertEqual(len(again.sources), 3)
+        self.assertEqual(again.nodes['files'], 3 * 15)
+        self.assertEqual(again.sources[0]['path'], self.dumps[0])
@@ -18,9 +18,12 @@ Testing for the path object wrapper that does most of the analysis.
 ##########################################################################
 
 import os
+import sys
+import shutil
+import tempfile
 import unittest
 
-from mosaic.path import Path
+from mosaic.path import Path, Node, scan, DFS, BFS
 from itertools import permutations
 
 ##########################################################################
@@ -104,6 +107,19 @@ class PathTests(unittest.TestCase):
         self.assertEqual(p1, p2)
         self.assertIsNot(p1, p2)
 
+    def test_literal(self):
+        """
+        Assert literal paths (and their copies) are not expanded.
+        """
+        os.environ['MOSAIC_TEST'] = 'expanded'
+        try:
+            self.assertEqual(Path('/data/$MOSAIC_TEST'), '/data/expanded')
+            self.assertEqual(Path.literal('/data/$MOSAIC_TEST'), '/data/$MOSAIC_TEST')
+            self.assertEqual(Path.literal('~x/y/'), '~x/y')
+            self.assertEqual(Path(Path.literal('/data/$MOSAIC_TEST')), '/data/$MOSAIC_TEST')
+        finally:
+            del os.environ['MOSAIC_TEST']
+
     def test_relative_depth(self):
         """
         Test the relative depth of two paths.
@@ -138,3 +154,113 @@ class PathTests(unittest.TestCase):
 
         for fname in visible:
             self.assertFalse(Path(fname).is_hidden(), '{} is hidden?'.format(fname))
+
+
+##########################################################################
+## Scan TestCase
+##########################################################################
+
+class ScanTests(unittest.TestCase):
+    """
+    Tests for the explicit stack directory scanner.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="mosaic-")
+
+        # Create a/b/c nested below the root with a file at every level.
+        dirpath = self.root
+        for name in ('a', 'b', 'c'):
+            open(os.path.join(dirpath, 'file.txt'), 'w').close()
+            dirpath = os.path.join(dirpath, name)
+            os.mkdir(dirpath)
+
+        os.mkdir(os.path.join(self.root, 'a', 'x'))
+        os.makedirs(os.path.join(self.root, 'y', 'z'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def relpaths(self, paths):
+        return [os.path.relpath(str(path), self.root) for path in paths]
+
+    def test_dfs(self):
+        """
+        Test depth first scanning finishes a subtree before its siblings
+        """
+        paths = self.relpaths(scan(Path(self.root), order=DFS))
+        self.assertEqual(len(paths), 9)
+
+        for subtree in ('a/', 'y/'):
+            idxs = [idx for idx, path in enumerate(paths) if path.startswith(subtree)]
+            self.assertEqual(idxs, range(idxs[0], idxs[-1] + 1))
+
+    def test_bfs(self):
+        """
+        Test breadth first scanning yields shallower paths first
+        """
+        paths = self.relpaths(scan(Path(self.root), order=BFS))
+        depths = [path.count(os.sep) for path in paths]
+        self.assertEqual(len(paths), 9)
+        self.assertEqual(depths, sorted(depths))
+
+    def test_deep_tree(self):
+        """
+        Test scanning a tree deeper than the recursion limit
+        """
+        dirpath = self.root
+        for _ in range(300):
+            dirpath = os.path.join(dirpath, 'd')
+            os.mkdir(dirpath)
+
+        limit = sys.getrecursionlimit()
+        try:
+            sys.setrecursionlimit(100)
+            count = sum(1 for _ in scan(Path(self.root)))
+        finally:
+            sys.setrecursionlimit(limit)
+
+        self.assertEqual(count, 309)
+
+    def test_onerror(self):
+        """
+        Test errors on subdirectories are passed to the handler
+        """
+        errors = []
+        for path in scan(Path(self.root), onerror=errors.append):
+            if path.is_dir() and os.path.basename(str(path)) == 'b':
+                shutil.rmtree(str(path))
+
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], OSError)
+
+    def test_top_level_error(self):
+        """
+        Test errors on the root directory are raised
+        """
+        with self.assertRaises(OSError):
+            list(scan(Path(os.path.join(self.root, 'missing'))))
+
+    def test_nodes(self):
+        """
+        Test scanning yields compact node records
+        """
+        for node in Path(self.root).list():
+            self.assertIsInstance(node, Node)
+            self.assertFalse(hasattr(node, '__dict__'))
+            self.assertIsNone(node._nodestat)
+
+            if node.is_file():
+                self.assertEqual(node.filesize, 0)
+                self.assertEqual(node.inode, os.stat(str(node)).st_ino)
+                self.assertEqual(node, Path(node))
+            else:
+                self.assertTrue(node.is_dir())
+                self.assertIsNone(node._nodestat)
+
+    def test_unknown_order(self):
+        """
+        Test an unknown traversal order raises a value error
+        """
+        with self.assertRaises(ValueError):
+            list(scan(Path(self.root), order='random'))
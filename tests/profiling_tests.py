@@ -0,0 +1,177 @@
+# tests.profiling_tests
+# Testing for the per-phase timing of the scan loop.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Wed Dec 23 10:41:03 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: profiling_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the per-phase timing of the scan loop.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from mosaic.profiling import *
+
+##########################################################################
+## Latency Bin Tests
+##########################################################################
+
+class LatencyBinTests(unittest.TestCase):
+
+    def test_bounds(self):
+        """
+        Test every latency falls within the bounds of its bin
+        """
+        for seconds in (1e-9, 3.7e-7, 1e-6, 1.3e-5, 0.002, 0.5, 0.99, 1.0, 42.0, 3600.0):
+            lower, upper = latency_bounds(latency_bin(seconds))
+            self.assertLessEqual(lower, seconds)
+            self.assertLess(seconds, upper)
+            self.assertLessEqual(upper / lower, 1 + 1.0 / SUBBINS)
+
+    def test_ordered(self):
+        """
+        Test the bins are ordered by latency
+        """
+        latencies = [2 ** (exponent / 3.0) for exponent in range(-80, 30)]
+        bins = [latency_bin(seconds) for seconds in latencies]
+        self.assertEqual(bins, sorted(bins))
+        self.assertLess(max(bins), LATENCY_BINS)
+
+    def test_tiny(self):
+        """
+        Test zero and negative latencies fall into the first bin
+        """
+        self.assertEqual(latency_bin(0), 0)
+        self.assertEqual(latency_bin(-0.001), 0)
+        self.assertEqual(latency_bin(MIN_LATENCY), 0)
+
+
+##########################################################################
+## Phase Tests
+##########################################################################
+
+class PhaseTests(unittest.TestCase):
+
+    def test_timer(self):
+        """
+        Test a phase accumulates the blocks it times
+        """
+        phase = Phase()
+        for _ in range(3):
+            with phase:
+                pass
+
+        self.assertEqual(phase.calls, 3)
+        self.assertGreaterEqual(phase.seconds, 0)
+        self.assertIsNone(phase.latencies)
+        self.assertEqual(phase.serialize(), {'calls': 3, 'seconds': phase.seconds})
+
+    def test_percentiles(self):
+        """
+        Test the percentiles of the latencies
+        """
+        phase = Phase(latencies=True)
+        for idx in range(1, 1001):
+            phase.add(idx * 1e-6)
+
+        self.assertEqual(phase.calls, 1000)
+        self.assertAlmostEqual(phase.seconds, 0.5005)
+        for q, expected in ((50, 500e-6), (90, 900e-6), (99, 990e-6)):
+            latency = phase.percentile(q)
+            self.assertGreaterEqual(latency, expected)
+            self.assertLess(latency, expected * (1 + 1.0 / SUBBINS))
+
+        self.assertIsNone(Phase(latencies=True).percentile(50))
+
+    def test_merge(self):
+        """
+        Test merging phases adds their calls, seconds and latencies
+        """
+        phase, other = Phase(latencies=True), Phase(latencies=True)
+        phase.add(1e-6)
+        other.add(1e-6)
+        other.add(1e-3)
+
+        phase += other
+        self.assertEqual(phase.calls, 3)
+        self.assertEqual(sum(phase.latencies), 3)
+        self.assertEqual(phase.latencies[latency_bin(1e-6)], 2)
+
+
+##########################################################################
+## Profiler Tests
+##########################################################################
+
+class ProfilerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for name in ("a.txt", "b.txt", "c"):
+            with open(os.path.join(self.root, name), 'w') as f:
+                f.write(name)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_list(self):
+        """
+        Test listing a directory times the listing, its nodes and the loop
+        """
+        profiler = Profiler()
+        nodes = profiler.list(self.root)
+        self.assertEqual(profiler.scandir.calls, 0)
+
+        self.assertEqual(sorted(os.path.basename(str(node)) for node in nodes), ["a.txt", "b.txt", "c"])
+        self.assertEqual(profiler.scandir.calls, 1)
+        self.assertEqual(profiler.nodes.calls, 3)
+        self.assertEqual(profiler.loop.calls, 1)
+        self.assertGreaterEqual(
+            profiler.loop.seconds, profiler.scandir.seconds + profiler.nodes.seconds
+        )
+
+    def test_count(self):
+        """
+        Test the count phase is the loop less the other phases
+        """
+        profiler = Profiler()
+        profiler.loop.add(1.0)
+        profiler.scandir.add(0.125)
+        profiler.stat.add(0.25)
+        profiler.magic.add(0.5)
+        self.assertEqual(profiler.count.seconds, 0.125)
+        self.assertEqual(profiler.count.calls, 1)
+        self.assertEqual(sorted(profiler.phases), sorted(PHASES))
+
+    def test_serialize(self):
+        """
+        Test a profiler survives a JSON roundtrip and merges
+        """
+        profiler = Profiler()
+        list(profiler.list(self.root))
+        profiler.loop.add(0.01)
+        profiler.stat.add(1e-5)
+        profiler.magic.add(1e-3)
+
+        data = json.loads(json.dumps(profiler.serialize()))
+        self.assertEqual(set(data[STAT]['latency']), {'p50', 'p90', 'p99', 'p99.9', 'bins'})
+
+        loaded = Profiler.deserialize(data)
+        self.assertEqual(loaded.serialize(), json.loads(json.dumps(profiler.serialize())))
+
+        loaded += profiler
+        self.assertEqual(loaded.nodes.calls, 6)
+        self.assertEqual(loaded.stat.calls, 2)
+        self.assertAlmostEqual(loaded.loop.seconds, 2 * profiler.loop.seconds)
@@ -0,0 +1,180 @@
+# tests.progress_tests
+# Testing for the periodic progress reports of an analysis.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Tue Dec 22 11:05:12 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: progress_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the periodic progress reports of an analysis.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import time
+import unittest
+import threading
+
+from StringIO import StringIO
+from mosaic.progress import *
+
+##########################################################################
+## Fixtures
+##########################################################################
+
+class Clock(object):
+    """
+    A fake clock that counts how often it is checked.
+    """
+
+    def __init__(self):
+        self.now    = 1000.0
+        self.checks = 0
+
+    def __call__(self):
+        self.checks += 1
+        return self.now
+
+
+class Usage(object):
+    """
+    A stand in for the entries and bytes of a FileUsage.
+    """
+
+    def __init__(self, items=0, size=0):
+        self.items = items
+        self.size  = size
+
+
+##########################################################################
+## Progress Tests
+##########################################################################
+
+class ProgressTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock    = Clock()
+        self.reports  = []
+        self.progress = Progress(self.reports.append, interval=1.0, clock=self.clock)
+
+    def test_report(self):
+        """
+        Test the stats of a progress report
+        """
+        usages = Usage(300, 4096), Usage(100, 1024)
+        self.progress.start("/data", lambda: 30)
+        self.progress.track(*usages)
+        self.progress.scanned("/data/a/b/c", 10)
+
+        self.clock.now += 2.0
+        stats = self.progress.finish()
+        self.assertEqual(self.reports, [stats])
+        self.assertEqual(stats['elapsed'], 2.0)
+        self.assertEqual(stats['dirs'], 10)
+        self.assertEqual(stats['pending'], 30)
+        self.assertEqual(stats['depth'], 3)
+        self.assertEqual(stats['entries'], 400)
+        self.assertEqual(stats['entries_per_sec'], 200)
+        self.assertEqual(stats['bytes'], 5120)
+        self.assertEqual(stats['bytes_per_sec'], 2560)
+        self.assertEqual(stats['eta'], 6.0)
+
+    def test_no_eta(self):
+        """
+        Test the ETA is unknown before a directory is scanned
+        """
+        self.progress.start("/data")
+        self.clock.now += 1.0
+        stats = self.progress.finish()
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['depth'], 0)
+        self.assertIsNone(stats['eta'])
+
+    def test_interval(self):
+        """
+        Test reports are made once every interval
+        """
+        self.progress.start("/data")
+        for _ in range(100):
+            self.clock.now += 0.05
+            self.progress.scanned("/data/dir")
+        self.assertEqual(len(self.reports), 4)
+
+    def test_sampled_clock(self):
+        """
+        Test the clock is checked about CHECKS times per interval
+        """
+        self.progress.start("/data")
+        for _ in range(150000):
+            self.clock.now += 1e-5
+            self.progress.scanned("/data/dir")
+
+        # 1.5 seconds of scans, checked every 0.1s once the stride adapts.
+        self.assertLess(self.clock.checks, 3 * CHECKS)
+        self.assertEqual(len(self.reports), 1)
+
+    def test_slowdown(self):
+        """
+        Test a slow part of the tree is reported within an interval
+        """
+        self.progress.start("/data")
+        for _ in range(150000):
+            self.clock.now += 1e-5
+            self.progress.scanned("/data/dir")
+        reports = len(self.reports)
+
+        # The stride is now thousands of directories, each taking a second.
+        for _ in range(12):
+            time.sleep(0.25)
+            self.clock.now += 1.0
+            self.progress.scanned("/data/slow")
+
+        # At least two reports while they are scanned, and the final one.
+        self.progress.finish()
+        self.assertGreaterEqual(len(self.reports) - reports, 3)
+
+    def test_threads(self):
+        """
+        Test directories scanned by many threads are all counted
+        """
+        def scan():
+            for _ in range(20000):
+                self.progress.scanned("/data/dir")
+
+        self.progress.start("/data")
+        threads = [threading.Thread(target=scan) for _ in range(4)]
+
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        self.assertEqual(self.progress.finish()['dirs'], 80000)
+
+    def test_write_report(self):
+        """
+        Test the line written by the default callback
+        """
+        stream = StringIO()
+        write_report({
+            'elapsed': 3725, 'dirs': 1200, 'pending': 80, 'depth': 4,
+            'entries': 36000, 'entries_per_sec': 9.7, 'bytes': 1048576,
+            'bytes_per_sec': 281.5, 'eta': None,
+        }, stream)
+
+        self.assertEqual(stream.getvalue(), (
+            "[1:02:05] 1,200 dirs (80 pending, depth 4), 36,000 entries at 10/s, "
+            "1.00 MB at 281 bytes/s, ETA unknown\n"
+        ))
+
+    def test_humanize_seconds(self):
+        """
+        Test the formatting of durations
+        """
+        self.assertEqual(humanize_seconds(0), "0:00:00")
+        self.assertEqual(humanize_seconds(59.9), "0:00:59")
+        self.assertEqual(humanize_seconds(86399), "23:59:59")
+        self.assertEqual(humanize_seconds(None), "unknown")
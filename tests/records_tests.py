@@ -0,0 +1,130 @@
+# tests.records_tests
+# Testing for the streaming newline delimited JSON record writer.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Thu Dec 10 10:02:51 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: records_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the streaming newline delimited JSON record writer.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+
+from mosaic.records import RecordWriter, truncate, spool
+from mosaic.path import unescape_path
+
+##########################################################################
+## RecordWriter TestCase
+##########################################################################
+
+class RecordWriterTests(unittest.TestCase):
+    """
+    Tests for the buffered record writer.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="mosaic-")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, writer, count):
+        for idx in range(count):
+            writer.write("/data/file{}".format(idx), "files", "text/plain", idx, idx, 0)
+
+    def test_buffered(self):
+        """
+        Test records are only written once the buffer is full
+        """
+        path   = os.path.join(self.tmpdir, "records.ndjson")
+        writer = RecordWriter(path, buffer_size=1024)
+
+        self.write(writer, 5)
+        self.assertFalse(os.path.exists(path))
+
+        self.write(writer, 95)
+        self.assertLess(writer.size, 1024)
+        self.assertGreater(os.path.getsize(path), 0)
+
+        writer.close()
+        with open(path, 'r') as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual(len(records), 100)
+        self.assertEqual(records[47], {
+            'path': '/data/file42', 'type': 'files', 'mime': 'text/plain',
+            'size': 42, 'inode': 42, 'mtime': 0,
+        })
+
+    def test_gzip_members(self):
+        """
+        Test gzip chunks from several writers read back as one stream
+        """
+        path = os.path.join(self.tmpdir, "records.ndjson.gz")
+        truncate(path)
+
+        writers = [RecordWriter(path, buffer_size=512) for _ in range(3)]
+        for writer in writers:
+            self.write(writer, 50)
+        for writer in writers:
+            writer.close()
+
+        with gzip.open(path, 'rb') as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual(len(records), 150)
+
+    def test_append_spool(self):
+        """
+        Test a spooled records file is appended in chunks and removed
+        """
+        path    = os.path.join(self.tmpdir, "records.ndjson.gz")
+        spooled = spool(path)
+        self.assertTrue(spooled.endswith(".gz"))
+        self.assertEqual(os.path.dirname(spooled), self.tmpdir)
+
+        shard = RecordWriter(spooled, buffer_size=512)
+        self.write(shard, 50)
+        shard.close()
+
+        writer = RecordWriter(path, buffer_size=512)
+        self.write(writer, 10)
+        writer.append(spooled)
+        writer.close()
+
+        with gzip.open(path, 'rb') as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual(len(records), 60)
+        self.assertFalse(os.path.exists(spooled))
+
+    def test_undecodable_paths(self):
+        """
+        Test paths that are not valid UTF-8 are written losslessly
+        """
+        path   = os.path.join(self.tmpdir, "records.ndjson")
+        writer = RecordWriter(path)
+
+        names = ["/data/\xff", "/data/caf\xc3\xa9", "/data/\xc3\xa9\xe9.txt"]
+        for name in names:
+            writer.write(name, "files", "text/plain", 0, 0, 0)
+        writer.close()
+
+        with open(path, 'r') as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual([unescape_path(record['path']) for record in records], names)
@@ -0,0 +1,140 @@
+# tests.sampling_tests
+# Testing for the reproducible sampling of files.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Sun Dec 20 16:03:32 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: sampling_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the reproducible sampling of files.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import unittest
+
+from collections import Counter
+from mosaic.sampling import *
+from mosaic.snapshot import DirRecord
+
+##########################################################################
+## Sampler TestCase
+##########################################################################
+
+class SamplerTests(unittest.TestCase):
+    """
+    Tests for the sampler and its estimates.
+    """
+
+    def test_rate(self):
+        """
+        Test the sample is reproducible and close to the rate
+        """
+        paths = ["/data/file{}.txt".format(idx) for idx in range(10000)]
+
+        sampler = Sampler(0.1, seed=7)
+        sample  = [path for path in paths if sampler.selects(path)]
+
+        self.assertEqual(sample, [path for path in paths if Sampler(0.1, seed=7).includes(path)])
+        self.assertNotEqual(sample, [path for path in paths if Sampler(0.1).includes(path)])
+        self.assertAlmostEqual(len(sample) / 10000.0, 0.1, delta=0.01)
+        self.assertEqual(sampler.units, {'sampled': len(sample), 'skipped': 10000 - len(sample)})
+
+        self.assertTrue(all(Sampler(1.0).includes(path) for path in paths))
+        with self.assertRaises(ValueError):
+            Sampler(0)
+
+    def test_root(self):
+        """
+        Test the sample only depends on the paths relative to the root
+        """
+        names   = ["file{}.txt".format(idx) for idx in range(1000)]
+        samples = [
+            [name for name in names if Sampler(0.5, root=root).includes(os.path.join(root, name))]
+            for root in ("/data", "/mnt/data/", "/")
+        ]
+
+        self.assertEqual(samples[0], samples[1])
+        self.assertEqual(samples[0], samples[2])
+        self.assertNotEqual(samples[0], [
+            name for name in names if Sampler(0.5).includes(os.path.join("/data", name))
+        ])
+
+        # The root itself is a unit of a stratified sample as well.
+        self.assertEqual(Sampler(0.5, root="/data").includes("/data"), Sampler(0.5, root="/").includes("/"))
+
+    def test_seeds(self):
+        """
+        Test the samples of different seeds are independent
+        """
+        paths = ["/data/file{:05d}.txt".format(idx) for idx in range(10000)]
+
+        samples = [
+            set(path for path in paths if Sampler(0.5, seed=seed).includes(path))
+            for seed in range(4)
+        ]
+
+        for idx, sample in enumerate(samples):
+            for other in samples[idx + 1:]:
+                # Independent halves overlap on a quarter of the paths.
+                self.assertAlmostEqual(len(sample & other) / 10000.0, 0.25, delta=0.02)
+
+    def test_estimate(self):
+        """
+        Test the estimates and intervals of a file sample
+        """
+        sampler = Sampler(0.5)
+        for size in (10, 20, 30):
+            sampler.file("text/plain", size)
+
+        estimate = sampler.estimate(Counter({"text/plain": 3}), Counter({"text/plain": 60}))
+        files, low, high = estimate["text/plain"]['files']
+        self.assertEqual(files, 6)
+        self.assertAlmostEqual(high - files, Z95 * (0.5 / 0.25 * 3) ** 0.5)
+        self.assertEqual(low, 3)
+
+        self.assertEqual(estimate[TOTAL]['bytes'][0], 120)
+        self.assertAlmostEqual(
+            estimate[TOTAL]['bytes'][2] - 120, Z95 * (0.5 / 0.25 * 1400) ** 0.5
+        )
+
+    def test_stratified(self):
+        """
+        Test directories are the units of a stratified sample
+        """
+        sampler = Sampler(0.5, stratified=True)
+        record  = DirRecord(None, None)
+        record.add("files", "text/plain", 10)
+        record.add("files", "text/plain", 20)
+
+        dirpath = next(path for path in ("/a", "/b", "/c", "/d") if sampler.includes(path))
+        sampler.enter(dirpath)
+        self.assertTrue(sampler.selects("/anything"))
+        sampler.directory(record)
+
+        self.assertEqual(sampler.files, {"text/plain": 4, TOTAL: 4})
+        self.assertEqual(sampler.bytes, {"text/plain": 900, TOTAL: 900})
+
+    def test_merge_serialize(self):
+        """
+        Test samplers are merged and serialized
+        """
+        first, second = Sampler(0.25, 3), Sampler(0.25, 3)
+        first.file("text/plain", 3)
+        second.file("image/png", 4)
+
+        first += second
+        data = json.loads(json.dumps(first.serialize()))
+        self.assertEqual(data['squares']['bytes'], {"text/plain": 9, "image/png": 16, TOTAL: 25})
+        self.assertEqual(Sampler.deserialize(data).serialize(), first.serialize())
+
+        with self.assertRaises(ValueError):
+            first += Sampler(0.5, 3)
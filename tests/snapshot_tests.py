@@ -0,0 +1,56 @@
+# tests.snapshot_tests
+# Testing for the per-directory snapshot of an analysis.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Mon Dec 14 12:40:05 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: snapshot_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the per-directory snapshot of an analysis.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import unittest
+
+from mosaic.snapshot import Snapshot, DirRecord
+
+##########################################################################
+## Snapshot TestCase
+##########################################################################
+
+class SnapshotTests(unittest.TestCase):
+    """
+    Tests for the directory records of a snapshot.
+    """
+
+    def test_subtree(self):
+        """
+        Test the subtree of a directory walks its recorded subdirectories
+        """
+        snapshot = Snapshot(
+            (path, DirRecord(0, 0)) for path in ("/data", "/data/a", "/data/a/b", "/other")
+        )
+
+        self.assertEqual(snapshot.children("/data"), ["/data/a"])
+        self.assertEqual(sorted(snapshot.subtree("/data")), ["/data", "/data/a", "/data/a/b"])
+        self.assertEqual(list(snapshot.subtree("/missing")), [])
+
+    def test_filesystem_root(self):
+        """
+        Test the file system root is not its own child
+        """
+        snapshot = Snapshot((path, DirRecord(0, 0)) for path in ("/", "/a", "/a/b"))
+        self.assertEqual(snapshot.children("/"), ["/a"])
+        self.assertEqual(sorted(snapshot.subtree("/")), ["/", "/a", "/a/b"])
+
+        # Recording the root again (after the index is built) keeps it out too.
+        snapshot.record("/", os.lstat("/"))
+        self.assertEqual(snapshot.children("/"), ["/a"])
@@ -0,0 +1,125 @@
+# tests.throttle_tests
+# Testing for the token bucket throttling of the I/O.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Mon Dec 21 11:32:50 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: throttle_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the token bucket throttling of the I/O.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import unittest
+
+from mosaic.throttle import *
+
+##########################################################################
+## Fixtures
+##########################################################################
+
+class Clock(object):
+    """
+    A fake clock whose sleeps advance it immediately.
+    """
+
+    def __init__(self):
+        self.now   = 1000.0
+        self.slept = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now   += seconds
+
+
+##########################################################################
+## Throttle TestCase
+##########################################################################
+
+class ThrottleTests(unittest.TestCase):
+    """
+    Tests for the token buckets and the adaptive throttle.
+    """
+
+    def test_bucket(self):
+        """
+        Test the bucket allows a burst and then the rate
+        """
+        clock  = Clock()
+        bucket = TokenBucket(10, clock)
+
+        self.assertEqual(sum(bucket.acquire() for _ in range(10)), 0)
+        self.assertAlmostEqual(bucket.acquire(), 0.1)
+        self.assertAlmostEqual(bucket.acquire(5), 0.6)
+
+        clock.now += 10
+        self.assertEqual(bucket.acquire(10), 0)
+        self.assertAlmostEqual(bucket.acquire(1), 0.1)
+
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+    def test_throttle(self):
+        """
+        Test operations and bytes are limited to their rates
+        """
+        clock    = Clock()
+        throttle = Throttle(100, 1000, clock=clock, sleep=clock.sleep)
+
+        for _ in range(300):
+            with throttle.io(nbytes=10):
+                pass
+
+        # 200 operations and 2000 bytes above the bursts at 100/s and 1000/s
+        self.assertAlmostEqual(clock.slept, 2.0)
+        self.assertAlmostEqual(throttle.stats['waited'], clock.slept)
+
+        with self.assertRaises(ValueError):
+            Throttle()
+
+    def test_adaptive(self):
+        """
+        Test the adaptive throttle backs off and recovers with the latency
+        """
+        clock    = Clock()
+        throttle = Throttle(1000, adaptive=True, clock=clock, sleep=clock.sleep)
+
+        def window(latency):
+            for _ in range(10):
+                throttle.observe(latency)
+            clock.now += WINDOW
+            throttle.observe(latency)
+
+        for _ in range(3):
+            window(0.001)
+        self.assertEqual(throttle.scale, 1.0)
+
+        window(0.1)
+        self.assertEqual(throttle.scale, BACKOFF)
+        self.assertEqual(throttle.ops.scale, BACKOFF)
+        self.assertEqual(throttle.stats['backoffs'], 1)
+
+        for _ in range(30):
+            window(0.001)
+        self.assertEqual(throttle.scale, 1.0)
+
+    def test_unthrottled(self):
+        """
+        Test the unthrottled context does nothing
+        """
+        with UNTHROTTLED:
+            pass
+
+        with self.assertRaises(KeyError):
+            with UNTHROTTLED:
+                raise KeyError("not swallowed")
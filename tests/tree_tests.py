@@ -0,0 +1,114 @@
+# tests.tree_tests
+# Testing for the per-directory usage tree.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Mon Dec 14 11:52:17 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: tree_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the per-directory usage tree.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import json
+import unittest
+
+from mosaic.tree import DirTree
+from mosaic.snapshot import DirRecord
+
+##########################################################################
+## Fixtures
+##########################################################################
+
+def record(**store):
+    """
+    Creates a directory record with one file of every size in the store.
+    """
+    record = DirRecord(None, None)
+    for mimetype, size in store.items():
+        record.add("files", mimetype.replace("_", "/"), size)
+    return record
+
+
+##########################################################################
+## DirTree TestCase
+##########################################################################
+
+class DirTreeTests(unittest.TestCase):
+    """
+    Tests for the rolled up directory tree.
+    """
+
+    def make_tree(self):
+        tree = DirTree("/data")
+        tree.add("/data", record(text_plain=10))
+        tree.add("/data/a", record(text_plain=5, image_png=100))
+        tree.add("/data/a/x", record(video_mp4=1000, text_csv=1, text_html=2))
+        tree.add("/data/b", record(text_plain=50))
+        return tree
+
+    def test_rollup(self):
+        """
+        Test subtrees are rolled up to their ancestors
+        """
+        tree = self.make_tree()
+
+        self.assertEqual(tree.subtree("/data"), (
+            "/data", 7, 1168,
+            [("video/mp4", 1000), ("image/png", 100), ("text/plain", 65)],
+        ))
+        self.assertEqual(tree.subtree("/data/a")[1:3], (5, 1108))
+        self.assertEqual(tree.subtree("/data/b")[1:3], (1, 50))
+
+    def test_biggest(self):
+        """
+        Test the biggest subtrees at a depth
+        """
+        tree = self.make_tree()
+
+        self.assertEqual([usage[0] for usage in tree.biggest(1)], ["/data/a", "/data/b"])
+        self.assertEqual([usage[0] for usage in tree.biggest(1, 1)], ["/data/a"])
+        self.assertEqual([usage[0] for usage in tree.biggest(2)], ["/data/a/x"])
+        self.assertEqual(tree.biggest(3), [])
+
+    def test_filesystem_root(self):
+        """
+        Test a tree of the file system root is not its own parent
+        """
+        tree = DirTree("/")
+        tree.add("/", record(text_plain=1))
+        tree.add("/a", record(text_plain=5, image_png=100))
+        tree.add("/a/b", record(text_plain=50))
+
+        self.assertEqual([tree.depth(path) for path in tree.paths], [0, 1, 2])
+        self.assertEqual(tree.subtree("/"), (
+            "/", 4, 156, [("image/png", 100), ("text/plain", 56)],
+        ))
+        self.assertEqual([usage[0] for usage in tree.biggest(1)], ["/a"])
+        self.assertEqual([usage[0] for usage in tree.biggest(2)], ["/a/b"])
+
+    def test_merge(self):
+        """
+        Test shard trees are merged and their parents resolved by path
+        """
+        shard = DirTree("/data/a")
+        shard.add("/data/a/x", record(video_mp4=1000, text_csv=1, text_html=2))
+        shard.add("/data/a/x/y", record(text_csv=7))
+
+        tree = DirTree("/data")
+        tree.add("/data", record(text_plain=10))
+        tree.add("/data/a", record(text_plain=5, image_png=100))
+        tree.biggest(1)
+
+        tree += DirTree.deserialize(json.loads(json.dumps(shard.serialize())))
+
+        self.assertEqual(len(tree), 4)
+        self.assertEqual(tree.subtree("/data")[1:3], (7, 1125))
+        self.assertEqual(tree.biggest(2)[0][:3], ("/data/a/x", 4, 1010))
@@ -0,0 +1,806 @@
+# tests.usage_tests
+# Testing for the file usage analysis and its parallel backends.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Sun Nov 29 10:12:31 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: usage_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for the file usage analysis and its parallel backends.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+
+import mosaic.usage
+import mosaic.histogram
+
+from collections import Counter
+from mosaic.usage import *
+from mosaic.progress import Progress
+from mosaic.largest import SUBTREE
+from mosaic.classify import HYBRID
+from mosaic.path import unescape_path
+from mosaic.snapshot import Snapshot, DirRecord
+
+##########################################################################
+## Module Constants
+##########################################################################
+
+# Workers and backend of the sequential and both parallel analyses
+BACKENDS = ((None, THREAD), (3, THREAD), (2, PROCESS))
+PARALLEL = BACKENDS[1:]
+
+##########################################################################
+## Fixtures
+##########################################################################
+
+def make_tree(root, depth=3, width=3, files=4):
+    """
+    Creates a synthetic directory tree with text files, empty files, hidden
+    files and symlinks at every level of the tree.
+    """
+    for idx in range(files):
+        with open(os.path.join(root, "file{}.txt".format(idx)), 'w') as f:
+            f.write("mosaic " * (idx + 1))
+
+    open(os.path.join(root, "empty.txt"), 'w').close()
+    open(os.path.join(root, ".hidden"), 'w').close()
+    os.symlink(os.path.join(root, "file0.txt"), os.path.join(root, "link"))
+
+    if depth > 0:
+        for idx in range(width):
+            subdir = os.path.join(root, "dir{}".format(idx))
+            os.mkdir(subdir)
+            make_tree(subdir, depth - 1, width, files)
+
+
+##########################################################################
+## Usage TestCase
+##########################################################################
+
+class AnalyzeTests(unittest.TestCase):
+    """
+    Tests for the analysis of a directory tree.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="mosaic-")
+        make_tree(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def assertUsageEqual(self, first, second):
+        for key in ('nodes', 'mimes', 'store', 'syscalls'):
+            self.assertEqual(getattr(first, key), getattr(second, key))
+
+    def test_sequential(self):
+        """
+        Test the sequential analysis counts the synthetic tree
+        """
+        usage = analyze(self.root)
+
+        self.assertEqual(usage.status, FINISHED)
+        self.assertEqual(usage.nodes[DIRS], 39)
+        self.assertEqual(usage.nodes[FILE], 200)
+        self.assertEqual(usage.nodes[LINK], 40)
+
+        # Only files are stat'd, every directory is listed once.
+        self.assertEqual(usage.syscalls, {SCANDIR: 40, STAT: 200, READ: 200})
+
+    def test_threaded(self):
+        """
+        Test the threaded analysis matches the sequential analysis
+        """
+        expected = analyze(self.root)
+        for workers in (2, 4, 8):
+            usage = analyze(self.root, workers=workers)
+            self.assertEqual(usage.status, FINISHED)
+            self.assertUsageEqual(usage, expected)
+
+    def test_threaded_hidden(self):
+        """
+        Test the threaded analysis matches when including hidden files
+        """
+        expected = analyze(self.root, include_hidden=True)
+        usage = analyze(self.root, include_hidden=True, workers=4)
+        self.assertUsageEqual(usage, expected)
+        self.assertEqual(usage.nodes[FILE], 240)
+
+    def test_process(self):
+        """
+        Test the process pool analysis matches the sequential analysis
+        """
+        expected = analyze(self.root)
+        usage = analyze(self.root, workers=3, backend=PROCESS)
+        self.assertEqual(usage.status, FINISHED)
+        self.assertUsageEqual(usage, expected)
+
+    def test_process_split(self):
+        """
+        Test big shards are split and redistributed by the process pool
+        """
+        expected = analyze(self.root)
+        usage = process_analyze(self.root, workers=2, split=2)
+        self.assertUsageEqual(usage, expected)
+
+    def test_records(self):
+        """
+        Test a record of every node is streamed by each backend
+        """
+        tmpdir = tempfile.mkdtemp(prefix="mosaic-")
+        try:
+            for workers, backend in BACKENDS:
+                path  = os.path.join(tmpdir, "records.ndjson")
+                usage = analyze(self.root, workers=workers, backend=backend, records=path)
+
+                with open(path, 'r') as f:
+                    records = [json.loads(line) for line in f]
+
+                self.assertEqual(len(records), usage.items)
+                self.assertEqual(len(set(r['path'] for r in records)), usage.items)
+                self.assertEqual(
+                    Counter(r['type'] for r in records), usage.nodes
+                )
+                self.assertEqual(sum(r['size'] for r in records), usage.size)
+                self.assertEqual(usage.syscalls[STAT], 279)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_undecodable_records(self):
+        """
+        Test records of paths that are not valid UTF-8 do not abort the scan
+        """
+        name = os.path.join(self.root, "dir0", "\xff.txt")
+        with open(name, 'w') as f:
+            f.write("mosaic")
+
+        tmpdir = tempfile.mkdtemp(prefix="mosaic-")
+        try:
+            path  = os.path.join(tmpdir, "records.ndjson")
+            usage = analyze(self.root, records=path)
+
+            with open(path, 'r') as f:
+                paths = [unescape_path(json.loads(line)['path']) for line in f]
+
+            self.assertEqual(len(paths), usage.items)
+            self.assertIn(name, paths)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_allocated(self):
+        """
+        Test allocated bytes are counted alongside the apparent size
+        """
+        with open(os.path.join(self.root, "sparse.img"), 'wb') as f:
+            f.seek(64 * 1048576)
+            f.write("\0")
+
+        usage = analyze(self.root, strategy=EXTENSION)
+        ratio = usage.sparseness
+
+        self.assertGreater(usage.size, 64 * 1048576)
+        self.assertLess(usage.allocated_size, 1048576)
+        self.assertLess(ratio['application/octet-stream'], 0.01)
+        self.assertGreaterEqual(ratio['text/plain'], 1.0)
+        self.assertNotIn('inode/x-empty', ratio)
+        self.assertEqual(usage.serialize()['sparseness'], ratio)
+
+    def test_tree(self):
+        """
+        Test the directory tree rolls subtrees up the same on every backend
+        """
+        with open(os.path.join(self.root, "dir1", "dir0", "big.txt"), 'w') as f:
+            f.write("mosaic " * 1000)
+
+        subtrees = {}
+        for name in ("dir0", "dir1", "dir2"):
+            path = os.path.join(self.root, name)
+            subtrees[path] = analyze(path)
+
+        for workers, backend in BACKENDS:
+            usage = analyze(self.root, workers=workers, backend=backend, split=2, tree=True)
+            tree  = usage.tree
+
+            self.assertEqual(len(tree), 40)
+            self.assertEqual(tree.subtree(self.root)[1:3], (usage.nodes[FILE], usage.size))
+
+            biggest = tree.biggest(1, 2)
+            self.assertEqual(biggest[0][0], os.path.join(self.root, "dir1"))
+            self.assertEqual(biggest[0][3][0][0], 'text/plain')
+            for path, files, size, _ in tree.biggest(1):
+                self.assertEqual(files, subtrees[path].nodes[FILE])
+                self.assertEqual(size, subtrees[path].size)
+
+    @unittest.skipIf(mosaic.histogram.np is None, "NumPy is not installed")
+    def test_histograms(self):
+        """
+        Test the size histograms are the same on every backend
+        """
+        for workers, backend in BACKENDS:
+            usage = analyze(self.root, workers=workers, backend=backend, split=2, histograms=True)
+
+            # The text files are 7, 14, 21 and 28 bytes in every directory.
+            self.assertEqual(usage.histograms.histogram('text/plain'), [
+                (4, 8, 40), (8, 16, 40), (16, 32, 80),
+            ])
+
+            data = json.loads(json.dumps(usage.serialize(), cls=MosaicEncoder))
+            self.assertEqual(data['histograms']['text/plain'], [0, 0, 0, 40, 40, 80])
+
+            loaded = FileUsage.deserialize(data)
+            self.assertEqual(loaded.histograms.serialize(), data['histograms'])
+
+    @unittest.skipIf(mosaic.histogram.np is None, "NumPy is not installed")
+    def test_ages(self):
+        """
+        Test the age histograms are the same on every backend
+        """
+        old = time.time() - 400 * 86400
+        for idx in range(3):
+            path = os.path.join(self.root, "dir{}".format(idx), "file0.txt")
+            os.utime(path, (old, old))
+
+        for workers, backend in BACKENDS:
+            usage = analyze(self.root, workers=workers, backend=backend, split=2, ages=True)
+
+            self.assertEqual(usage.ages.older(365 * 86400), {'text/plain': (3, 21)})
+            self.assertEqual(usage.ages.older(0, 'mtime')['text/plain'], (160, 2800))
+            self.assertIn("Cold data: 21 bytes in 3 files", str(usage))
+
+            data = json.loads(json.dumps(usage.serialize(), cls=MosaicEncoder))
+            loaded = FileUsage.deserialize(data)
+            self.assertEqual(loaded.ages.serialize(), data['ages'])
+
+    def test_ages_now(self):
+        """
+        Test every shard measures ages against the same reference time
+        """
+        now = time.time() + 400 * 86400
+        for workers, backend in BACKENDS:
+            usage = analyze(self.root, workers=workers, backend=backend, split=2, ages=True, now=now)
+            self.assertEqual(usage.ages.now, now)
+            self.assertEqual(usage.ages.older(365 * 86400)['text/plain'], (160, 2800))
+
+            usage = analyze(self.root, workers=workers, backend=backend, split=2, ages=True)
+            self.assertEqual(usage.ages.now, usage.options['now'])
+
+    def test_largest(self):
+        """
+        Test the largest files and directories are the same on every backend
+        """
+        big = os.path.join(self.root, "dir1", "dir2", "big.txt")
+        with open(big, 'w') as f:
+            f.write("mosaic " * 1000)
+
+        for workers, backend in BACKENDS:
+            usage = analyze(self.root, workers=workers, backend=backend, split=2, largest=3)
+            files = usage.largest.files.items()
+
+            self.assertEqual(files[0], (big, 7000))
+            self.assertEqual([size for _, size in files], [7000, 28, 28])
+            self.assertEqual(usage.largest.dirs.items()[0], (os.path.dirname(big), 7070))
+            self.assertEqual(usage.largest.mimes['text/plain'].items(), files)
+
+            data = json.loads(json.dumps(usage.serialize(), cls=MosaicEncoder))
+            self.assertEqual(len(data['largest']['dirs']), 3)
+            loaded = FileUsage.deserialize(data)
+            self.assertEqual(loaded.largest.files.items(), files)
+
+    def test_largest_subtrees(self):
+        """
+        Test the largest directories are ranked by subtree with a tree
+        """
+        big = os.path.join(self.root, "dir1", "dir2", "big.txt")
+        with open(big, 'w') as f:
+            f.write("mosaic " * 1000)
+
+        for workers, backend in BACKENDS:
+            usage = analyze(
+                self.root, workers=workers, backend=backend, split=2, largest=3, tree=True
+            )
+
+            data  = json.loads(json.dumps(usage.serialize(), cls=MosaicEncoder))
+            paths = [os.path.join(self.root, "dir1"), os.path.dirname(big)]
+            self.assertEqual(data['largest']['ranking'], SUBTREE)
+            self.assertEqual(data['largest']['dirs'][:2], [
+                [path, usage.tree.subtree(path)[2]] for path in paths
+            ])
+
+    def test_sample(self):
+        """
+        Test the sample is the same on every backend and extrapolated
+        """
+        expected = analyze(self.root)
+        samples  = []
+
+        for workers, backend in BACKENDS:
+            usage = analyze(self.root, workers=workers, backend=backend, split=2, sample=0.5, seed=1)
+            samples.append(usage.store)
+
+            estimate = usage.estimate()[TOTAL]
+            self.assertLess(usage.nodes[FILE], expected.nodes[FILE])
+            self.assertEqual(estimate['files'][0], usage.nodes[FILE] * 2)
+            self.assertTrue(estimate['files'][1] <= expected.nodes[FILE] <= estimate['files'][2])
+            self.assertTrue(estimate['bytes'][1] <= expected.size <= estimate['bytes'][2])
+
+            data = json.loads(json.dumps(usage.serialize(), cls=MosaicEncoder))
+            self.assertEqual(data['estimate'][TOTAL]['files'][0], estimate['files'][0])
+            self.assertIn("Estimated from a 50.00% sample", str(usage))
+
+        self.assertEqual(samples[0], samples[1])
+        self.assertEqual(samples[0], samples[2])
+
+        # The same tree elsewhere has the same sample.
+        copy = tempfile.mkdtemp(prefix="mosaic-")
+        try:
+            shutil.copytree(self.root, os.path.join(copy, "tree"), symlinks=True)
+            usage = analyze(os.path.join(copy, "tree"), workers=3, sample=0.5, seed=1)
+            self.assertEqual(usage.store, samples[0])
+        finally:
+            shutil.rmtree(copy)
+
+        # The whole tree is an exact sample.
+        usage = analyze(self.root, sample=1.0, stratified=True)
+        self.assertEqual(usage.estimate(), expected.estimate())
+
+    def test_literal_paths(self):
+        """
+        Test directories named like variables are scanned where they are
+        """
+        literal = os.path.join(self.root, "dir0", "$HOME")
+        os.mkdir(literal)
+        make_tree(literal, depth=1)
+
+        expected = analyze(self.root)
+        self.assertEqual(expected.nodes[FILE], 220)
+        for workers, backend in PARALLEL:
+            usage = analyze(self.root, workers=workers, backend=backend, split=1)
+            self.assertUsageEqual(usage, expected)
+
+    def test_worker_errors(self):
+        """
+        Test I/O errors are skipped and other errors raised by every backend
+        """
+        update = FileUsage.update
+
+        def failing(error):
+            def patched(usage, path, record=None):
+                if str(path).endswith("file1.txt"):
+                    raise error
+                return update(usage, path, record)
+            return patched
+
+        try:
+            # IOError is not an OSError on Python 2, but is skipped all the same.
+            FileUsage.update = failing(IOError(5, "Input/output error"))
+            expected = analyze(self.root)
+            self.assertEqual(expected.nodes[FILE], 160)
+            for workers in (2, 3):
+                usage = analyze(self.root, workers=workers, backend=THREAD)
+                self.assertUsageEqual(usage, expected)
+
+            FileUsage.update = failing(ValueError("not an I/O error"))
+            for workers in (None, 2, 3):
+                with self.assertRaises(ValueError):
+                    analyze(self.root, workers=workers, backend=THREAD)
+        finally:
+            FileUsage.update = update
+
+    def test_throttle(self):
+        """
+        Test the I/O of every backend is throttled to the same result
+        """
+        expected = analyze(self.root)
+        for workers, backend in BACKENDS:
+            usage = analyze(
+                self.root, workers=workers, backend=backend, split=2,
+                max_iops=100000, max_read_bps=1e9, adaptive=True,
+            )
+            self.assertUsageEqual(usage, expected)
+
+        # 200 stats and 40 listings with a burst of 100 take at least 1.4s.
+        started = time.time()
+        analyze(self.root, strategy=EXTENSION, max_iops=100)
+        self.assertGreater(time.time() - started, 1.3)
+
+        with self.assertRaises(ValueError):
+            analyze(self.root, adaptive=True)
+
+    def test_progress(self):
+        """
+        Test the final progress report of every backend counts the analysis
+        """
+        for workers, backend in BACKENDS:
+            reports  = []
+            progress = Progress(reports.append, interval=0)
+            usage = analyze(
+                self.root, workers=workers, backend=backend, split=2, progress=progress
+            )
+
+            stats = reports[-1]
+            self.assertGreater(len(reports), 1)
+            self.assertEqual(stats['dirs'], usage.syscalls[SCANDIR])
+            self.assertEqual(stats['entries'], usage.items)
+            self.assertEqual(stats['bytes'], usage.size)
+            self.assertEqual(stats['pending'], 0)
+            self.assertEqual(stats['eta'], 0)
+            self.assertNotIn('progress', usage.serialize()['options'])
+
+    def test_profile(self):
+        """
+        Test the phases of the scan loop are profiled by every backend
+        """
+        expected = analyze(self.root)
+        for workers, backend in BACKENDS:
+            usage = analyze(self.root, workers=workers, backend=backend, split=2, profile=True)
+            self.assertUsageEqual(usage, expected)
+
+            data = json.loads(json.dumps(usage.serialize(), cls=MosaicEncoder))
+            profile = data['timer']['profile']
+            self.assertEqual(profile['scandir']['calls'], usage.syscalls[SCANDIR])
+            self.assertEqual(profile['stat']['calls'], usage.syscalls[STAT])
+            self.assertEqual(profile['magic']['calls'], usage.syscalls[READ])
+            self.assertEqual(profile['count']['calls'], usage.syscalls[SCANDIR])
+            self.assertGreater(profile['magic']['latency']['p99'], 0)
+
+            loaded = FileUsage.deserialize(data)
+            self.assertEqual(loaded.profiler.stat.calls, usage.syscalls[STAT])
+            self.assertIn("Profile:", str(usage))
+
+        self.assertNotIn('profile', expected.serialize()['timer'])
+
+    def test_hardlinks(self):
+        """
+        Test hard links are counted once in the unique bytes by each backend
+        """
+        source = os.path.join(self.root, "dir0", "file3.txt")
+        for idx in range(3):
+            os.link(source, os.path.join(self.root, "dir{}".format(idx), "dir1", "linked.txt"))
+
+        expected = analyze(self.root)
+        for workers, backend in BACKENDS:
+            usage = analyze(self.root, workers=workers, backend=backend, split=2, hardlinks=True)
+
+            self.assertEqual(usage.store, expected.store)
+            self.assertEqual(usage.size - usage.unique_size, 3 * os.path.getsize(source))
+            self.assertEqual(usage.hardlinks, {'linked': 4, 'duplicates': 3})
+            self.assertNotIn('linked', usage.serialize())
+
+    def test_extension_strategy(self):
+        """
+        Test the extension strategy resolves every file without sniffing
+        """
+        usage = analyze(self.root, strategy=EXTENSION)
+
+        self.assertEqual(usage.tiers, {EXTENSION: 200})
+        self.assertEqual(usage.classified, {EXTENSION: 1.0})
+        self.assertEqual(usage.mimes, {'text/plain': 160, 'inode/x-empty': 40})
+        self.assertEqual(usage.syscalls[READ], 0)
+
+    def test_hybrid_strategy(self):
+        """
+        Test the hybrid strategy only sniffs unknown extensions
+        """
+        for name in ("README", "data.dat"):
+            with open(os.path.join(self.root, name), 'w') as f:
+                f.write("mosaic analysis")
+
+        usage = analyze(self.root, strategy=HYBRID)
+
+        self.assertEqual(usage.tiers, {EXTENSION: 200, MAGIC: 2})
+        self.assertEqual(usage.mimes['text/plain'], 162)
+        self.assertAlmostEqual(usage.classified[MAGIC], 2 / 202.0)
+
+    def test_unknown_strategy(self):
+        """
+        Test that an unknown classification strategy raises a value error
+        """
+        with self.assertRaises(ValueError):
+            analyze(self.root, strategy="guess")
+
+    def test_incremental(self):
+        """
+        Test an incremental re-scan only lists the changed directories
+        """
+        dump = os.path.join(self.root, ".mosaic.json")
+        with open(dump, 'w') as f:
+            analyze(self.root, snapshot=True).dump(f)
+
+        # Add a file to one directory and remove another directory.
+        with open(os.path.join(self.root, "dir1", "dir2", "new.txt"), 'w') as f:
+            f.write("mosaic " * 10)
+        shutil.rmtree(os.path.join(self.root, "dir2", "dir0"))
+
+        expected = analyze(self.root)
+        for workers, backend in BACKENDS:
+            usage = analyze(self.root, workers=workers, backend=backend, incremental=dump)
+            for key in ('nodes', 'mimes', 'store', 'allocated'):
+                self.assertEqual(getattr(usage, key), getattr(expected, key))
+
+            # Only dir1/dir2 and dir2 changed; dir2/dir0 and its children are gone.
+            self.assertEqual(usage.incremental, {'rescanned': 2, 'reused': 34})
+            self.assertEqual(len(usage.snapshot), 36)
+
+    def test_undecodable_snapshot(self):
+        """
+        Test snapshots of paths that are not valid UTF-8 dump and load exactly
+        """
+        undecodable = os.path.join(self.root, "dir0", "\xff")
+        os.mkdir(undecodable)
+        with open(os.path.join(undecodable, "caf\xe9.txt"), 'w') as f:
+            f.write("mosaic")
+
+        dump = os.path.join(self.root, ".mosaic.json")
+        with open(dump, 'w') as f:
+            analyze(self.root, snapshot=True).dump(f)
+
+        with open(dump, 'r') as f:
+            loaded = FileUsage.load(f)
+        self.assertIn(undecodable, loaded.snapshot.records)
+
+        usage = analyze(self.root, incremental=dump)
+        self.assertEqual(usage.incremental, {'reused': 41})
+        self.assertEqual(usage.nodes, analyze(self.root).nodes)
+
+    def test_literal_snapshot(self):
+        """
+        Test reused directories named like variables are not expanded
+        """
+        literal = os.path.join(self.root, "dir0", "$MOSAIC_TEST")
+        os.mkdir(literal)
+        make_tree(literal, depth=1)
+
+        dump = os.path.join(self.root, ".mosaic.json")
+        with open(dump, 'w') as f:
+            analyze(self.root, snapshot=True).dump(f)
+
+        os.environ['MOSAIC_TEST'] = os.path.join(self.root, "dir1")
+        try:
+            usage = analyze(self.root, incremental=dump)
+        finally:
+            del os.environ['MOSAIC_TEST']
+
+        self.assertEqual(usage.incremental, {'reused': 44})
+        self.assertEqual(usage.nodes, analyze(self.root).nodes)
+
+    def test_undecodable_tree(self):
+        """
+        Test trees of paths that are not valid UTF-8 dump and load exactly
+        """
+        undecodable = os.path.join(self.root, "dir0", "\xff")
+        os.mkdir(undecodable)
+        with open(os.path.join(undecodable, "file.txt"), 'w') as f:
+            f.write("mosaic")
+
+        usage = analyze(self.root, tree=True)
+        data  = json.loads(json.dumps(usage.serialize(), cls=MosaicEncoder))
+        tree  = FileUsage.deserialize(data).tree
+
+        self.assertEqual(tree.paths, usage.tree.paths)
+        self.assertEqual(tree.subtree(undecodable)[1:3], (1, 6))
+
+    def test_undecodable_largest(self):
+        """
+        Test the largest paths that are not valid UTF-8 dump and load exactly
+        """
+        undecodable = os.path.join(self.root, "dir0", "\xff")
+        os.mkdir(undecodable)
+        with open(os.path.join(undecodable, "\xfe.txt"), 'w') as f:
+            f.write("mosaic " * 10000)
+
+        usage = analyze(self.root, largest=3)
+        data  = json.loads(json.dumps(usage.serialize(), cls=MosaicEncoder))
+        largest = FileUsage.deserialize(data).largest
+
+        self.assertEqual(largest.files.items()[0], (os.path.join(undecodable, "\xfe.txt"), 70000))
+        self.assertEqual(largest.serialize(), usage.largest.serialize())
+
+    def test_incremental_options(self):
+        """
+        Test a snapshot is not reused with different options
+        """
+        dump = os.path.join(self.root, ".mosaic.json")
+        with open(dump, 'w') as f:
+            analyze(self.root, snapshot=True).dump(f)
+
+        with self.assertRaises(ValueError):
+            analyze(self.root, include_hidden=True, incremental=dump)
+
+        # Sampled and full snapshots only count different files.
+        sampled = os.path.join(self.root, ".mosaic-sampled.json")
+        with open(sampled, 'w') as f:
+            analyze(self.root, snapshot=True, sample=0.25).dump(f)
+
+        with self.assertRaises(ValueError):
+            analyze(self.root, incremental=sampled)
+
+        # Reused directories do not replay their files to per-file collectors.
+        for key in ('largest', 'histograms', 'ages', 'sample'):
+            with self.assertRaises(ValueError):
+                analyze(self.root, incremental=dump, **{key: 0.25})
+
+    def test_unknown_backend(self):
+        """
+        Test that an unknown backend raises a value error
+        """
+        with self.assertRaises(ValueError):
+            analyze(self.root, workers=2, backend="cluster")
+
+    def test_resume(self):
+        """
+        Test an interrupted analysis resumes from its checkpoint
+        """
+        tmpdir   = tempfile.mkdtemp(prefix="mosaic-")
+        scandir  = mosaic.usage.scan_directory
+
+        def interrupted(usage, dirpath, include_hidden=False):
+            if usage.syscalls[SCANDIR] >= 20:
+                raise KeyboardInterrupt()
+            return scandir(usage, dirpath, include_hidden)
+
+        try:
+            checkpoint = os.path.join(tmpdir, "checkpoint.json")
+            records    = os.path.join(tmpdir, "records.ndjson")
+            expected   = analyze(self.root, records=records)
+            with open(records, 'r') as f:
+                expected_records = sorted(f)
+
+            mosaic.usage.scan_directory = interrupted
+            with self.assertRaises(KeyboardInterrupt):
+                analyze(
+                    self.root, checkpoint=checkpoint, checkpoint_interval=0, records=records
+                )
+            mosaic.usage.scan_directory = scandir
+
+            with open(checkpoint, 'r') as f:
+                data = json.load(f)
+            self.assertEqual(data['syscalls'][SCANDIR], 20)
+            self.assertEqual(data['timer']['finished'], None)
+
+            for workers, backend in BACKENDS:
+                usage = resume(checkpoint, workers, backend)
+                self.assertEqual(usage.status, FINISHED)
+                self.assertUsageEqual(usage, expected)
+
+                # Records after the checkpoint are dropped rather than duplicated.
+                with open(records, 'r') as f:
+                    self.assertEqual(sorted(f), expected_records)
+        finally:
+            mosaic.usage.scan_directory = scandir
+            shutil.rmtree(tmpdir)
+
+    def test_parallel_checkpoints(self):
+        """
+        Test the parallel backends save consistent checkpoints
+        """
+        tmpdir   = tempfile.mkdtemp(prefix="mosaic-")
+        records  = os.path.join(tmpdir, "records.ndjson")
+        expected = analyze(self.root, records=records)
+        with open(records, 'r') as f:
+            expected_records = sorted(f)
+
+        try:
+            for backend in (THREAD, PROCESS):
+                checkpoint = os.path.join(tmpdir, "{}.json".format(backend))
+                analyze(
+                    self.root, workers=2, backend=backend, split=2,
+                    checkpoint=checkpoint, checkpoint_interval=0, records=records,
+                )
+
+                self.assertUsageEqual(resume(checkpoint), expected)
+                with open(records, 'r') as f:
+                    self.assertEqual(sorted(f), expected_records)
+
+                # The records spooled by process shards are appended and removed.
+                self.assertFalse([name for name in os.listdir(tmpdir) if name.startswith(".records-")])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_resume_not_checkpoint(self):
+        """
+        Test that resuming from a finished dump raises a value error
+        """
+        with tempfile.NamedTemporaryFile(suffix=".json") as f:
+            analyze(self.root).dump(f)
+            f.flush()
+
+            with self.assertRaises(ValueError):
+                resume(f.name)
+
+
+##########################################################################
+## FileUsage TestCase
+##########################################################################
+
+class FileUsageTests(unittest.TestCase):
+    """
+    Tests for the file usage data structure.
+    """
+
+    def make_usage(self, started, finished=None, **counts):
+        usage = FileUsage('/tmp')
+        usage.nodes.update(counts)
+        usage.start()
+        usage.started = started
+        if finished is not None:
+            usage.finish()
+            usage.finished = finished
+            usage.elapsed  = finished - started
+        return usage
+
+    def test_iadd_finished(self):
+        """
+        Test merging two finished usages spans both timers
+        """
+        usage = self.make_usage(10.0, 20.0, files=1)
+        usage += self.make_usage(5.0, 15.0, files=2, dirs=1)
+
+        self.assertEqual(usage.nodes, {FILE: 3, DIRS: 1})
+        self.assertEqual(usage.status, FINISHED)
+        self.assertEqual(usage.started, 5.0)
+        self.assertEqual(usage.finished, 20.0)
+        self.assertEqual(usage.elapsed, 15.0)
+
+    def test_iadd_underway(self):
+        """
+        Test merging with an unfinished usage leaves it underway
+        """
+        usage = self.make_usage(10.0, 20.0)
+        usage += self.make_usage(5.0)
+
+        self.assertEqual(usage.status, UNDERWAY)
+        self.assertEqual(usage.started, 5.0)
+        self.assertIsNone(usage.finished)
+        self.assertIsNone(usage.elapsed)
+
+    def test_iadd_awaiting(self):
+        """
+        Test that an awaiting usage takes the timer of the merged usage
+        """
+        usage = FileUsage('/tmp')
+        usage += self.make_usage(5.0, 15.0, files=2)
+
+        self.assertEqual(usage.status, FINISHED)
+        self.assertEqual(usage.elapsed, 10.0)
+        self.assertEqual(usage.nodes[FILE], 2)
+
+    def test_reuse_filesystem_root(self):
+        """
+        Test an unchanged file system root is not reused as its own child
+        """
+        stat  = os.lstat("/")
+        usage = FileUsage("/", snapshot=True)
+        usage._previous = Snapshot([
+            ("/", DirRecord(stat.st_mtime, stat.st_ctime)), ("/data", DirRecord(0, 0)),
+        ])
+
+        self.assertEqual(scan_directory(usage, Path("/")), ["/data"])
+        self.assertEqual(usage.incremental, {'reused': 1})
+
+    def test_serialize_roundtrip(self):
+        """
+        Test that a usage can be rebuilt from its serialization
+        """
+        usage = self.make_usage(time.time() - 3, time.time(), files=3)
+        usage.mimes['text/plain'] = 3
+        usage.store['text/plain'] = 42
+
+        other = FileUsage.deserialize(usage.serialize())
+        self.assertEqual(other.status, FINISHED)
+        self.assertEqual(other.mimes, usage.mimes)
+        self.assertEqual(other.store, usage.store)
+        self.assertAlmostEqual(other.started, usage.started, places=5)
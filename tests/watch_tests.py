@@ -0,0 +1,138 @@
+# tests.watch_tests
+# Testing for keeping a usage analysis current from inotify events.
+#
+# Author:   Benjamin Bengfort <bengfort@cs.umd.edu>
+# Created:  Wed Dec 09 16:31:07 2015 -0500
+#
+# Copyright (C) 2015 University of Maryland
+# For license information, see LICENSE.txt
+#
+# ID: watch_tests.py [] benjamin@bengfort.com $
+
+"""
+Testing for keeping a usage analysis current from inotify events.
+"""
+
+##########################################################################
+## Imports
+##########################################################################
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from mosaic.watch import *
+from mosaic.usage import analyze
+from usage_tests import make_tree
+
+##########################################################################
+## Watcher TestCase
+##########################################################################
+
+class WatcherTests(unittest.TestCase):
+    """
+    Tests for the inotify watcher.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="mosaic-")
+        make_tree(self.root)
+
+        self.output  = os.path.join(self.root, ".usage.json")
+        self.watcher = Watcher(self.root, self.output, latency=0.05)
+        self.watcher.start()
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.root)
+
+    def settle(self):
+        """
+        Processes events until the watcher has applied all of them.
+        """
+        while True:
+            events = self.watcher.inotify.read(self.watcher.latency)
+            self.watcher.process(events)
+            if not events: break
+
+    def assertCurrent(self):
+        usage = analyze(self.root, snapshot=True)
+        for key in ('nodes', 'mimes', 'store'):
+            self.assertEqual(getattr(self.watcher.usage, key), getattr(usage, key))
+        self.assertEqual(len(self.watcher.usage.snapshot), len(usage.snapshot))
+        self.assertEqual(len(self.watcher.wds), len(usage.snapshot))
+
+    def test_watches(self):
+        """
+        Test every directory is watched and the usage checkpointed
+        """
+        self.assertEqual(len(self.watcher.wds), 40)
+        with open(self.output, 'r') as f:
+            self.assertEqual(json.load(f)['nodes']['dirs'], 39)
+
+    def test_create_modify(self):
+        """
+        Test created and modified files are applied
+        """
+        with open(os.path.join(self.root, "dir0", "new.txt"), 'w') as f:
+            f.write("mosaic")
+        with open(os.path.join(self.root, "dir1", "dir2", "file0.txt"), 'a') as f:
+            f.write("mosaic " * 1000)
+
+        self.settle()
+        self.assertCurrent()
+
+    def test_directories(self):
+        """
+        Test created, deleted and renamed directories are applied
+        """
+        shutil.rmtree(os.path.join(self.root, "dir0"))
+        os.rename(
+            os.path.join(self.root, "dir1", "dir0"),
+            os.path.join(self.root, "dir2", "moved"),
+        )
+        os.mkdir(os.path.join(self.root, "dir2", "dir0", "fresh"))
+        make_tree(os.path.join(self.root, "dir2", "dir0", "fresh"), depth=1)
+
+        self.settle()
+        self.assertCurrent()
+
+    def test_move_shallower(self):
+        """
+        Test files created in a directory moved closer to the root are applied
+        """
+        moved = os.path.join(self.root, "moved")
+        os.rename(os.path.join(self.root, "dir1", "dir2", "dir0"), moved)
+        self.settle()
+        self.assertCurrent()
+
+        with open(os.path.join(moved, "new.txt"), 'w') as f:
+            f.write("mosaic")
+
+        self.settle()
+        self.assertCurrent()
+
+    def test_max_latency(self):
+        """
+        Test continuous events do not delay refreshes past the max latency
+        """
+        self.watcher.max_latency = 0.0
+        with open(os.path.join(self.root, "dir0", "new.txt"), 'w') as f:
+            f.write("mosaic")
+
+        # A batch of events is applied even though more events keep arriving.
+        events = self.watcher.inotify.read(self.watcher.latency)
+        self.assertTrue(events)
+        self.watcher.process(events)
+        self.assertFalse(self.watcher.dirty)
+        self.assertCurrent()
+
+    def test_rescan(self):
+        """
+        Test the watcher analyzes the tree again when events were lost
+        """
+        os.remove(os.path.join(self.root, "file0.txt"))
+        self.watcher.process([(-1, IN_Q_OVERFLOW, 0, '')])
+        self.assertCurrent()